@@ -0,0 +1,74 @@
+"""Measures a selective AND query: a rare term intersected with terms of growing document frequency.
+
+Compares the list intersection of fully decoded postings with the cursor intersection of AndQuery, which
+gallops over the skip entries of the common term. The cursor time should grow sub-linearly with its df.
+
+    python -m benchmarks.bench_and [--rare 20] [--repeat 5]
+"""
+from engine.indexing import Posting, get_codec
+from engine.indexing.postingscursor import DiskPostingsCursor
+from engine.indexing.spimi import SPIMI
+from engine.querying import AndQuery, TermLiteral
+import argparse
+import random
+import time
+
+
+class RecordIndex:
+    """Serves postings and cursors from encoded records kept in memory, so the benchmark measures decoding."""
+
+    def __init__(self, records, codec):
+        self.records = records
+        self.codec = codec
+
+    def getCursor(self, term):
+        return DiskPostingsCursor([self.records[term]], self.codec)
+
+    def getPostings(self, term):
+        cursor = self.getCursor(term)
+        postings = []
+        while cursor.doc_id is not None:
+            postings.append(Posting(cursor.doc_id, 0))
+            cursor.next()
+        return postings
+
+
+def encode(term, doc_ids, codec, rng):
+    postings = [{"doc_id": doc_id, "positions": sorted(rng.sample(range(1, 600), 2))} for doc_id in doc_ids]
+    return SPIMI._encode_postings(term, postings, codec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rare", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    codec = get_codec("vbyte")
+    print(f"{'common df':>10}{'list (ms)':>12}{'cursor (ms)':>13}{'speedup':>9}")
+    for common_df in (10_000, 40_000, 160_000, 640_000):
+        num_docs = 2 * common_df
+        records = {
+            "rare": encode("rare", sorted(rng.sample(range(num_docs), args.rare)), codec, rng),
+            "common": encode("common", sorted(rng.sample(range(num_docs), common_df)), codec, rng),
+        }
+        index = RecordIndex(records, codec)
+        query = AndQuery([TermLiteral("common"), TermLiteral("rare")])
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            expected = query._and_op(index.getPostings("common"), index.getPostings("rare"), False)
+        list_time = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result = query.getPostings(index)
+        cursor_time = (time.perf_counter() - start) / args.repeat
+
+        assert [posting.doc_id for posting in result] == [posting.doc_id for posting in expected]
+        print(f"{common_df:>10}{list_time * 1000:>12.2f}{cursor_time * 1000:>13.2f}{list_time / cursor_time:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Measures boolean queries over frequent terms: list merging against bitmap AND, OR and ANDNOT.
+
+The same postings are written twice, once without bitmaps and once with a bitmap for every term of at least
+--min-df documents. Each query is timed on cold postings caches, so the list side decodes the postings it
+merges while the bitmap side reads the bitmaps of the frequent terms.
+
+    python -m benchmarks.bench_bitmaps [--terms 400] [--docs 200000] [--min-df 4096] [--repeat 3]
+"""
+from benchmarks.bench_codecs import synthetic_postings
+from benchmarks.bench_maxscore import timed
+from benchmarks.bench_postings import write_index
+from engine.indexing import DiskPositionalIndex, get_codec
+from engine.querying import AndQuery, NotQuery, OrQuery, TermLiteral
+import argparse
+import os
+import tempfile
+
+QUERIES = [
+    ("term0 AND term1", lambda t: AndQuery([t(0), t(1)])),
+    ("term2 AND term5 AND term9", lambda t: AndQuery([t(2), t(5), t(9)])),
+    ("term0 AND NOT term3", lambda t: AndQuery([t(0), NotQuery(t(3))])),
+    ("term1 OR term4 OR term8", lambda t: OrQuery([t(1), t(4), t(8)])),
+    ("term300 AND term0", lambda t: AndQuery([t(300), t(0)])),
+    ("NOT term2", lambda t: NotQuery(t(2))),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=400)
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--min-df", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(args.terms, args.docs)
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "lists"))
+        os.makedirs(os.path.join(directory, "bitmaps"))
+        codec = get_codec("vbyte")
+        lists = DiskPositionalIndex(write_index(os.path.join(directory, "lists"), postings, codec, args.docs, bitmap_min_df=0))
+        bitmaps = DiskPositionalIndex(
+            write_index(os.path.join(directory, "bitmaps"), postings, codec, args.docs, bitmap_min_df=args.min_df)
+        )
+        term = lambda rank: TermLiteral(f"term{rank}")
+
+        print(f"{'query':>28}{'results':>9}{'lists (ms)':>12}{'bitmaps (ms)':>14}{'speedup':>9}")
+        for name, build in QUERIES:
+            query = build(term)
+            result = [posting.doc_id for posting in query.getPostings(bitmaps)]
+            assert result == [posting.doc_id for posting in query.getPostings(lists)]
+
+            def run(index):
+                index.cache.clear()
+                query.getPostings(index)
+
+            list_time = timed(lambda: run(lists), args.repeat)
+            bitmap_time = timed(lambda: run(bitmaps), args.repeat)
+            print(
+                f"{name:>28}{len(result):>9}{list_time * 1000:>12.1f}{bitmap_time * 1000:>14.1f}"
+                f"{list_time / bitmap_time:>9.1f}"
+            )
+        lists.close()
+        bitmaps.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Measures the recall and the latency of champion list ranking against full evaluation, for several champion
+list sizes r.
+
+Recall is the fraction of the exact top k that champion list ranking returns. Full evaluation scores every
+posting of every term, with the object-based path and, when NumPy is installed, the array-based one.
+
+    python -m benchmarks.bench_champions [--terms 400] [--docs 36803] [--k 10] [--repeat 3]
+"""
+from benchmarks.bench_codecs import synthetic_postings
+from benchmarks.bench_maxscore import QUERIES, timed
+from benchmarks.bench_postings import write_index
+from engine.indexing import DiskPositionalIndex, get_codec
+from engine.indexing.postingarrays import HAS_NUMPY
+from engine.querying import RankedQuery
+import argparse
+import os
+import tempfile
+
+SIZES = (10, 50, 200, 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=400)
+    parser.add_argument("--docs", type=int, default=36803)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(args.terms, args.docs)
+    queries = [" ".join(f"term{rank}" for rank in ranks) for ranks in QUERIES]
+    with tempfile.TemporaryDirectory() as directory:
+        indexes = {}
+        for size in SIZES:
+            os.makedirs(os.path.join(directory, str(size)))
+            db_path = write_index(os.path.join(directory, str(size)), postings, get_codec("vbyte"), args.docs, size)
+            indexes[size] = DiskPositionalIndex(db_path)
+
+        full = RankedQuery(indexes[SIZES[0]], vectorized=False, pruned=False)
+        vectorized = RankedQuery(indexes[SIZES[0]], vectorized=True, pruned=False) if HAS_NUMPY else None
+        for use_okapi in (False, True):
+            expected = {query: {doc_id for doc_id, _ in full.rank_documents(query, use_okapi, args.k)} for query in queries}
+            object_time = sum(timed(lambda: full.rank_documents(query, use_okapi, args.k), args.repeat) for query in queries)
+            print(f"okapi={use_okapi}: full evaluation {object_time / len(queries) * 1000:.1f} ms per query", end="")
+            if vectorized:
+                numpy_time = sum(
+                    timed(lambda: vectorized.rank_documents(query, use_okapi, args.k), args.repeat) for query in queries
+                )
+                print(f", {numpy_time / len(queries) * 1000:.1f} ms with NumPy", end="")
+            print()
+
+            print(f"{'r':>6}{'recall':>8}{'scored':>8}{'champions (ms)':>16}")
+            for size in SIZES:
+                champions = RankedQuery(indexes[size], champions=True)
+                recall = 0
+                scored = 0
+                for query in queries:
+                    found = {doc_id for doc_id, _ in champions.rank_documents(query, use_okapi, args.k)}
+                    recall += len(found & expected[query]) / len(expected[query])
+                    scored += champions.scored_postings
+                champion_time = sum(
+                    timed(lambda: champions.rank_documents(query, use_okapi, args.k), args.repeat) for query in queries
+                )
+                print(
+                    f"{size:>6}{recall / len(queries):>8.0%}{scored // len(queries):>8}"
+                    f"{champion_time / len(queries) * 1000:>16.1f}"
+                )
+        for index in indexes.values():
+            index.close()
+
+
+if __name__ == "__main__":
+    main()
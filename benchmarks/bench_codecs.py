@@ -0,0 +1,78 @@
+"""Compares the postings codecs on a synthetic, Zipf-distributed collection.
+
+Reports the encoded size of the postings, the part of it that boolean and ranked queries read (the
+postings file without positions), and the time needed to encode and decode them.
+
+    python -m benchmarks.bench_codecs [--terms 500] [--docs 36803]
+"""
+from engine.indexing.codecs import CODECS
+from engine.indexing.postingsfile import encode_record
+from engine.indexing.spimi import SPIMI
+import argparse
+import random
+import time
+
+
+def synthetic_postings(num_terms, num_docs, seed=42):
+    """Builds postings lists whose document frequencies follow Zipf's law."""
+    rng = random.Random(seed)
+    postings = {}
+    for rank in range(num_terms):
+        df = max(1, int(num_docs / (rank + 1) ** 0.9))
+        doc_ids = sorted(rng.sample(range(num_docs), min(df, num_docs)))
+        term_postings = []
+        for doc_id in doc_ids:
+            tf = 1
+            while rng.random() < 0.4:
+                tf += 1
+            positions = sorted(rng.sample(range(1, 600), tf))
+            term_postings.append({"doc_id": doc_id, "positions": positions})
+        postings[f"term{rank}"] = term_postings
+    return postings
+
+
+def decode_record(codec, record):
+    """Decodes a term record the way DiskPositionalIndex.positionPostings does."""
+    offset = 0
+    positions_offset = 0
+    last_doc_id = 0
+    for _ in range(record.df):
+        (doc_gap, tftd), offset = codec.decode(record.payload, offset, 2)
+        last_doc_id += doc_gap
+        _, positions_offset = codec.decode(record.positions, positions_offset, tftd)
+    return last_doc_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=500)
+    parser.add_argument("--docs", type=int, default=36803)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(args.terms, args.docs)
+    num_postings = sum(len(term_postings) for term_postings in postings.values())
+    print(f"{args.terms} terms, {num_postings} postings\n")
+    print(f"{'codec':<14}{'size (KB)':>12}{'docs (KB)':>12}{'ratio':>8}{'encode (s)':>12}{'decode (s)':>12}")
+
+    raw_size = None
+    for name, codec in CODECS.items():
+        start = time.perf_counter()
+        records = [SPIMI._encode_postings(term, term_postings, codec) for term, term_postings in postings.items()]
+        encode_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for record in records:
+            decode_record(codec, record)
+        decode_time = time.perf_counter() - start
+
+        docs_size = sum(len(encode_record(record)) for record in records)
+        size = docs_size + sum(len(record.positions) for record in records)
+        raw_size = raw_size or size
+        print(
+            f"{name:<14}{size / 1024:>12.1f}{docs_size / 1024:>12.1f}{raw_size / size:>8.2f}"
+            f"{encode_time:>12.3f}{decode_time:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Measures looking up the titles of a results page.
+
+Compares the previous lookup, one SELECT on document_metadata per result, with one batch lookup in the
+segment's document store, for every result and for the first chunk of rows the results frame renders.
+
+    python -m benchmarks.bench_documents [--docs 36803] [--results 5000] [--chunk 15] [--repeat 5]
+"""
+from benchmarks.bench_codecs import synthetic_postings
+from benchmarks.bench_postings import write_index
+from engine.indexing import DiskPositionalIndex, get_codec
+import argparse
+import random
+import tempfile
+import time
+
+
+def titles_with_queries(index, doc_ids):
+    """The previous SearchManager.get_document_title, called once per result."""
+    titles = []
+    for doc_id in doc_ids:
+        index.db_cursor.execute("SELECT title FROM document_metadata WHERE doc_id = ?", (doc_id,))
+        titles.append(index.db_cursor.fetchone()[0])
+    return titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=36803)
+    parser.add_argument("--results", type=int, default=5000)
+    parser.add_argument("--chunk", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(10, args.docs)
+    doc_ids = random.Random(0).sample(range(args.docs), args.results)
+    with tempfile.TemporaryDirectory() as directory:
+        index = DiskPositionalIndex(write_index(directory, postings, get_codec("vbyte"), args.docs))
+        assert index.get_document_titles(doc_ids) == titles_with_queries(index, doc_ids)
+
+        print(f"{'rows':>8}{'queries (ms)':>14}{'store (ms)':>12}{'speedup':>9}")
+        for rows in (args.results, args.chunk):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                titles_with_queries(index, doc_ids[:rows])
+            query_time = (time.perf_counter() - start) / args.repeat
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                index.get_document_titles(doc_ids[:rows])
+            store_time = (time.perf_counter() - start) / args.repeat
+
+            print(f"{rows:>8}{query_time * 1000:>14.2f}{store_time * 1000:>12.3f}{query_time / store_time:>9.1f}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
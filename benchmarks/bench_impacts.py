@@ -0,0 +1,51 @@
+"""Measures score-at-a-time ranking over impact-ordered postings against exhaustive document-at-a-time scoring.
+
+For each query and postings budget, prints the latency, the postings scored and how many of the exact top k
+the impact-ordered evaluator returns. Without a budget it stops once the top k cannot change.
+
+    python -m benchmarks.bench_impacts [--terms 400] [--docs 36803] [--k 10] [--repeat 3]
+"""
+from benchmarks.bench_codecs import synthetic_postings
+from benchmarks.bench_maxscore import QUERIES, timed
+from benchmarks.bench_postings import write_index
+from engine.indexing import DiskPositionalIndex, get_codec
+from engine.querying import RankedQuery
+import argparse
+import tempfile
+
+BUDGETS = (None, 20000, 5000, 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=400)
+    parser.add_argument("--docs", type=int, default=36803)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(args.terms, args.docs)
+    with tempfile.TemporaryDirectory() as directory:
+        index = DiskPositionalIndex(write_index(directory, postings, get_codec("vbyte"), args.docs))
+        exhaustive = RankedQuery(index, vectorized=False, pruned=False)
+        print(f"{'query':>16}{'okapi':>7}{'budget':>8}{'postings':>10}{'scored':>8}{'recall':>8}{'exhaustive (ms)':>17}{'impacts (ms)':>14}")
+        for ranks in QUERIES:
+            query = " ".join(f"term{rank}" for rank in ranks)
+            total = sum(len(postings[term]) for term in query.split())
+            for use_okapi in (False, True):
+                expected = {doc_id for doc_id, _ in exhaustive.rank_documents(query, use_okapi, args.k)}
+                exhaustive_time = timed(lambda: exhaustive.rank_documents(query, use_okapi, args.k), args.repeat)
+                for budget in BUDGETS:
+                    impact_ordered = RankedQuery(index, impact_ordered=True, postings_budget=budget)
+                    found = {doc_id for doc_id, _ in impact_ordered.rank_documents(query, use_okapi, args.k)}
+                    impact_time = timed(lambda: impact_ordered.rank_documents(query, use_okapi, args.k), args.repeat)
+                    print(
+                        f"{','.join(map(str, ranks)):>16}{str(use_okapi):>7}{str(budget or '-'):>8}{total:>10}"
+                        f"{impact_ordered.scored_postings:>8}{len(found & expected) / len(expected):>8.0%}"
+                        f"{exhaustive_time * 1000:>17.1f}{impact_time * 1000:>14.1f}"
+                    )
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
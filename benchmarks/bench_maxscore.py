@@ -0,0 +1,68 @@
+"""Measures how many postings MaxScore top-k retrieval skips, and its latency against exhaustive scoring.
+
+Each query mixes a frequent term with rarer ones, as typed queries do. Exhaustive scoring (object-based and,
+when NumPy is installed, array-based) scores every posting of every term; the document-at-a-time MaxScore
+evaluator stops looking at the postings of terms that can no longer lift a document into the top k.
+
+    python -m benchmarks.bench_maxscore [--terms 400] [--docs 36803] [--k 10] [--repeat 3]
+"""
+from benchmarks.bench_codecs import synthetic_postings
+from benchmarks.bench_postings import write_index
+from engine.indexing import DiskPositionalIndex, get_codec
+from engine.indexing.postingarrays import HAS_NUMPY
+from engine.querying import RankedQuery
+import argparse
+import tempfile
+import time
+
+QUERIES = [(0, 50, 200), (1, 30), (2, 10, 100, 300), (5, 80), (0, 1, 150)]
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=400)
+    parser.add_argument("--docs", type=int, default=36803)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(args.terms, args.docs)
+    with tempfile.TemporaryDirectory() as directory:
+        index = DiskPositionalIndex(write_index(directory, postings, get_codec("vbyte"), args.docs))
+        exhaustive = RankedQuery(index, vectorized=False, pruned=False)
+        vectorized = RankedQuery(index, vectorized=True, pruned=False) if HAS_NUMPY else None
+        pruned = RankedQuery(index, pruned=True)
+        print(
+            f"{'query':>16}{'okapi':>7}{'postings':>10}{'scored':>8}{'skipped':>9}"
+            f"{'objects (ms)':>14}{'numpy (ms)':>12}{'maxscore (ms)':>15}"
+        )
+        for ranks in QUERIES:
+            query = " ".join(f"term{rank}" for rank in ranks)
+            total = sum(len(postings[term]) for term in query.split())
+            for use_okapi in (False, True):
+                expected = exhaustive.rank_documents(query, use_okapi, args.k)
+                assert pruned.rank_documents(query, use_okapi, args.k) == expected
+                scored = pruned.scored_postings
+
+                object_time = timed(lambda: exhaustive.rank_documents(query, use_okapi, args.k), args.repeat)
+                numpy_time = (
+                    timed(lambda: vectorized.rank_documents(query, use_okapi, args.k), args.repeat) if vectorized else None
+                )
+                pruned_time = timed(lambda: pruned.rank_documents(query, use_okapi, args.k), args.repeat)
+                numpy_column = f"{numpy_time * 1000:>12.1f}" if numpy_time is not None else f"{'-':>12}"
+                print(
+                    f"{','.join(map(str, ranks)):>16}{str(use_okapi):>7}{total:>10}{scored:>8}{1 - scored / total:>9.1%}"
+                    f"{object_time * 1000:>14.1f}{numpy_column}{pruned_time * 1000:>15.1f}"
+                )
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measures wide OR queries: the former set-based union against the heap merge of postings cursors.
+
+The set-based union materializes every postings list and keeps the postings in arrival order, so it is sorted
+here to give the same doc ID order; OrQuery merges the cursors of the terms lazily in doc ID order.
+
+    python -m benchmarks.bench_or [--terms 400] [--docs 36803] [--repeat 3]
+"""
+from benchmarks.bench_codecs import synthetic_postings
+from benchmarks.bench_maxscore import timed
+from benchmarks.bench_postings import write_index
+from engine.indexing import DiskPositionalIndex, get_codec
+from engine.querying import OrQuery, TermLiteral
+import argparse
+import tempfile
+
+
+def set_union(index, terms):
+    """The former OrQuery.getPostings, followed by the sort a parent AND query needs."""
+    document_ids = set()
+    postings = []
+    for term in terms:
+        for posting in index.getPostings(term):
+            if posting.doc_id not in document_ids:
+                postings.append(posting)
+                document_ids.add(posting.doc_id)
+    return sorted(postings, key=lambda posting: posting.doc_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=400)
+    parser.add_argument("--docs", type=int, default=36803)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(args.terms, args.docs)
+    with tempfile.TemporaryDirectory() as directory:
+        index = DiskPositionalIndex(write_index(directory, postings, get_codec("vbyte"), args.docs))
+        print(f"{'terms':>6}{'first rank':>12}{'postings':>10}{'set (ms)':>10}{'heap (ms)':>11}")
+        for width, first_rank in ((2, 0), (10, 20), (50, 50), (200, 150)):
+            terms = [f"term{rank}" for rank in range(first_rank, first_rank + width)]
+            query = OrQuery([TermLiteral(term) for term in terms])
+            result = query.getPostings(index)
+            assert [p.doc_id for p in result] == [p.doc_id for p in set_union(index, terms)]
+
+            # The postings cache is cleared before each run, so both sides decode every list
+            def run_set():
+                index.cache.clear()
+                set_union(index, terms)
+
+            def run_heap():
+                index.cache.clear()
+                query.getPostings(index)
+
+            total = sum(len(postings[term]) for term in terms)
+            print(
+                f"{width:>6}{first_rank:>12}{total:>10}{timed(run_set, args.repeat) * 1000:>10.1f}"
+                f"{timed(run_heap, args.repeat) * 1000:>11.1f}"
+            )
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Measures time to the first page of boolean results: the whole result list against a lazily pulled page.
+
+Before, SearchManager evaluated getPostings for the whole query before the results page showed anything; now it
+pulls the first page of results from the cursor of the query tree, and the rest as the user scrolls.
+
+    python -m benchmarks.bench_paging [--terms 400] [--docs 36803] [--page 15] [--repeat 3]
+"""
+from benchmarks.bench_codecs import synthetic_postings
+from benchmarks.bench_maxscore import timed
+from benchmarks.bench_postings import write_index
+from engine.indexing import DiskPositionalIndex, get_codec
+from engine.querying import AndQuery, NotQuery, OrQuery, PagedResults, QueryPlanner, TermLiteral
+import argparse
+import tempfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=400)
+    parser.add_argument("--docs", type=int, default=36803)
+    parser.add_argument("--page", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(args.terms, args.docs)
+    queries = {
+        "term0 OR ... term9": OrQuery([TermLiteral(f"term{rank}") for rank in range(10)]),
+        "term0 OR ... term49": OrQuery([TermLiteral(f"term{rank}") for rank in range(50)]),
+        "term0 term1": AndQuery([TermLiteral("term0"), TermLiteral("term1")]),
+        "term0 -term1": AndQuery([TermLiteral("term0"), NotQuery(TermLiteral("term1"))]),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        # Without bitmaps, so every query runs on postings cursors
+        index = DiskPositionalIndex(write_index(directory, postings, get_codec("vbyte"), args.docs, bitmap_min_df=0))
+        planner = QueryPlanner(index)
+        print(f"{'query':<22}{'results':>9}{'all (ms)':>10}{'first page (ms)':>17}")
+        for name, query in queries.items():
+            query = planner.plan(query)
+            expected = [(posting.doc_id, 0) for posting in query.getPostings(index)]
+            assert PagedResults(query.getCursor(index))[: args.page] == expected[: args.page]
+
+            # The postings cache is cleared before each run, so both sides decode the postings they read
+            def run_all():
+                index.cache.clear()
+                query.getPostings(index)
+
+            def run_page():
+                index.cache.clear()
+                PagedResults(query.getCursor(index))[: args.page]
+
+            print(
+                f"{name:<22}{len(expected):>9}{timed(run_all, args.repeat) * 1000:>10.1f}"
+                f"{timed(run_page, args.repeat) * 1000:>17.1f}"
+            )
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
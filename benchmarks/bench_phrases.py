@@ -0,0 +1,99 @@
+"""Measures phrase queries over common words: the pairwise list intersection against the n-term phrase merge.
+
+Documents draw their tokens from a Zipf-like vocabulary, so "w0" and "w1" occur many times in nearly every
+document. The pairwise intersection decodes every postings list with its positions and checks each position
+of one list against the positions of the next with a list lookup; PhraseLiteral drives all the terms from the
+rarest one and merges the position arrays with offsets.
+
+    python -m benchmarks.bench_phrases [--docs 3000] [--length 400] [--repeat 3]
+"""
+from benchmarks.bench_and import RecordIndex
+from benchmarks.bench_maxscore import timed
+from engine.indexing import Posting, get_codec
+from engine.indexing.postingscursor import DiskPostingsCursor
+from engine.indexing.spimi import SPIMI
+from engine.querying import PhraseLiteral, TermLiteral
+import argparse
+import random
+
+PHRASES = [("w0", "w1"), ("w0", "w1", "w0"), ("w2", "w0", "w1", "w3"), ("w40", "w0"), ("w0", "w1", "w150")]
+
+
+class PositionalRecordIndex(RecordIndex):
+    """A RecordIndex whose cursors and postings carry positions."""
+
+    def getCursor(self, term):
+        return DiskPostingsCursor([self.records[term]] if term in self.records else [], self.codec, with_positions=True)
+
+    def getPostings(self, term):
+        cursor = self.getCursor(term)
+        postings = []
+        while cursor.doc_id is not None:
+            postings.append(cursor.posting())
+            cursor.next()
+        return postings
+
+
+def pairwise_intersect(p1, p2):
+    """The former pairwise phrase step, which looks each position + 1 up in the list of the next term."""
+    answer = []
+    i, j = 0, 0
+    while i < len(p1) and j < len(p2):
+        if p1[i].doc_id == p2[j].doc_id:
+            positions = [pos + 1 for pos in p1[i].positions if (pos + 1) in p2[j].positions]
+            if positions:
+                answer.append(Posting(p1[i].doc_id, positions))
+            i += 1
+            j += 1
+        elif p1[i].doc_id < p2[j].doc_id:
+            i += 1
+        else:
+            j += 1
+    return answer
+
+
+def pairwise_phrase(index, terms):
+    result = index.getPostings(terms[0])
+    for term in terms[1:]:
+        result = pairwise_intersect(result, index.getPostings(term))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=3000)
+    parser.add_argument("--length", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    codec = get_codec("vbyte")
+    vocabulary = [f"w{rank}" for rank in range(2000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    positions = {}
+    for doc_id in range(args.docs):
+        for position, token in enumerate(rng.choices(vocabulary, weights, k=args.length)):
+            positions.setdefault(token, {}).setdefault(doc_id, []).append(position)
+    records = {
+        term: SPIMI._encode_postings(term, [{"doc_id": d, "positions": p} for d, p in sorted(postings.items())], codec)
+        for term, postings in positions.items()
+    }
+    index = PositionalRecordIndex(records, codec)
+
+    print(f"{'phrase':>22}{'matches':>9}{'pairwise (ms)':>15}{'merge (ms)':>12}{'speedup':>9}")
+    for terms in PHRASES:
+        query = PhraseLiteral([TermLiteral(term) for term in terms])
+        expected = pairwise_phrase(index, terms)
+        result = query.getPostings(index)
+        assert [(p.doc_id, p.positions) for p in result] == [(p.doc_id, p.positions) for p in expected]
+
+        pairwise_time = timed(lambda: pairwise_phrase(index, terms), args.repeat)
+        merge_time = timed(lambda: query.getPostings(index), args.repeat)
+        print(
+            f"{' '.join(terms):>22}{len(result):>9}{pairwise_time * 1000:>15.1f}{merge_time * 1000:>12.1f}"
+            f"{pairwise_time / merge_time:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Measures the per-term latency of reading and decoding postings from a segment on disk.
+
+Compares the previous read path, which opened postings.bin and positions.bin and read each record with a few
+small reads on every call, then decoded it one posting at a time, with DiskPositionalIndex, which maps the
+files once and decodes each record's payload and positions with one codec call.
+
+    python -m benchmarks.bench_postings [--terms 500] [--docs 36803] [--codec vbyte]
+"""
+from benchmarks.bench_codecs import synthetic_postings
+from config import BITMAP_MIN_DF, CHAMPION_LIST_SIZE
+from engine.indexing import DiskPositionalIndex, Posting, get_codec
+from engine.indexing.docstats import pack_doc_stats
+from engine.indexing.documentstore import DocumentStoreWriter
+from engine.indexing.postingscursor import DiskPostingsCursor
+from engine.indexing.postingsfile import RECORD_HEADER, SKIP_ENTRY, TERM_LENGTH, RecordWriter, parse_record
+from engine.indexing.spimi import SPIMI, document_weight, score_bounds, term_writers
+from engine.indexing.termdictionary import TermDictionaryWriter, TermEntry
+from array import array
+from contextlib import ExitStack
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+
+def write_index(directory, postings, codec, num_docs, champion_list_size=CHAMPION_LIST_SIZE, bitmap_min_df=BITMAP_MIN_DF):
+    """Writes the postings as the single segment of an index, with its document metadata, weights, store,
+    impact-ordered postings, champion lists, bitmaps and k-gram index, and returns the path of its database."""
+    segment_dir = os.path.join(directory, "segment_0")
+    os.makedirs(segment_dir)
+    term_frequencies = [{} for _ in range(num_docs)]
+    for term in postings:
+        for posting in postings[term]:
+            term_frequencies[posting["doc_id"]][term] = len(posting["positions"])
+    doc_stats = array("d")
+    with open(os.path.join(segment_dir, "docStats.bin"), "wb") as doc_stats_file:
+        for frequencies in term_frequencies:
+            doc_stats.frombytes(pack_doc_stats(document_weight(frequencies), sum(frequencies.values())))
+        doc_stats.tofile(doc_stats_file)
+    with RecordWriter(os.path.join(segment_dir, "postings.bin"), os.path.join(segment_dir, "positions.bin")) as writer, \
+            TermDictionaryWriter(os.path.join(segment_dir, "terms.bin")) as dictionary, ExitStack() as stages:
+        # The same per-term structures SPIMI writes; bitmap_min_df 0 means no bitmaps
+        writers = term_writers(segment_dir, doc_stats, 0, True, champion_list_size, bitmap_min_df)
+        term_stages = [stages.enter_context(term_writer) for term_writer in writers]
+        for term in sorted(postings):
+            record = SPIMI._encode_postings(term, postings[term], codec)
+            position, positions_position = writer.write_record(record)
+            doc_ids = [posting["doc_id"] for posting in postings[term]]
+            frequencies = [len(posting["positions"]) for posting in postings[term]]
+            bounds = score_bounds(doc_ids, frequencies, doc_stats, 0)
+            dictionary.add(term, TermEntry(position, positions_position, record.df, record.cf, *bounds))
+            for term_stage in term_stages:
+                term_stage.add(term, doc_ids, frequencies, record.cf)
+    with DocumentStoreWriter(os.path.join(segment_dir, "documents.bin")) as document_store:
+        for doc_id in range(num_docs):
+            document_store.add(f"doc{doc_id}", f"corpus/doc{doc_id}.txt")
+
+    db_path = os.path.join(directory, "index.db")
+    db_conn = sqlite3.connect(db_path)
+    db_conn.execute("CREATE TABLE segments (segment_id INTEGER, directory TEXT, first_doc_id INTEGER, doc_count INTEGER)")
+    db_conn.execute("CREATE TABLE document_metadata (doc_id INTEGER PRIMARY KEY, title TEXT, doc_length INTEGER)")
+    db_conn.execute("CREATE TABLE corpus_stats (stat_name TEXT, value INTEGER)")
+    db_conn.execute("CREATE TABLE index_settings (name TEXT, value TEXT)")
+    db_conn.execute("INSERT INTO segments VALUES (0, ?, 0, ?)", (segment_dir, num_docs))
+    db_conn.executemany(
+        "INSERT INTO document_metadata VALUES (?, ?, ?)",
+        ((doc_id, f"doc{doc_id}", sum(frequencies.values())) for doc_id, frequencies in enumerate(term_frequencies)),
+    )
+    total_tokens = sum(sum(frequencies.values()) for frequencies in term_frequencies)
+    db_conn.execute("INSERT INTO corpus_stats VALUES ('total_tokens', ?)", (total_tokens,))
+    db_conn.execute("INSERT INTO index_settings VALUES ('codec', ?)", (codec.name,))
+    db_conn.commit()
+    db_conn.close()
+    return db_path
+
+
+def read_record_with_syscalls(segment, term, with_positions):
+    """The previous Segment.read_postings_record: opens the files and reads the record piece by piece."""
+    entry = segment.dictionary.lookup(term)
+    with open(segment.postings_file_path, "rb") as postings_file:
+        postings_file.seek(entry.postings_offset)
+        term_length = TERM_LENGTH.unpack(postings_file.read(TERM_LENGTH.size))[0]
+        head = TERM_LENGTH.pack(term_length) + postings_file.read(term_length + RECORD_HEADER.size)
+        _, _, _, skip_count, payload_length, positions_length = RECORD_HEADER.unpack_from(
+            head, TERM_LENGTH.size + term_length
+        )
+        data = head + postings_file.read(skip_count * SKIP_ENTRY.size + payload_length)
+    positions = b""
+    if with_positions:
+        with open(segment.positions_file_path, "rb") as positions_file:
+            positions_file.seek(entry.positions_offset)
+            positions = positions_file.read(positions_length)
+    return parse_record(data, positions=positions)
+
+
+def previous_postings(index, term, with_positions):
+    records = [read_record_with_syscalls(segment, term, with_positions) for segment in index.segments]
+    cursor = DiskPostingsCursor(records, index.codec, index.live_docs, with_positions)
+    postings = []
+    while cursor.doc_id is not None:
+        postings.append(cursor.posting() if with_positions else Posting(cursor.doc_id, 0))
+        cursor.next()
+    return postings
+
+
+def previous_term_frequency(index, term, doc_id):
+    record = read_record_with_syscalls(index.segments[0], term, False)
+    cursor = DiskPostingsCursor([record], index.codec)
+    return cursor.tftd if cursor.advance(doc_id) == doc_id else 0
+
+
+def time_terms(read, terms):
+    start = time.perf_counter()
+    for term in terms:
+        read(term)
+    return (time.perf_counter() - start) / len(terms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=500)
+    parser.add_argument("--docs", type=int, default=36803)
+    parser.add_argument("--codec", default="vbyte")
+    args = parser.parse_args()
+
+    codec = get_codec(args.codec)
+    postings = synthetic_postings(args.terms, args.docs)
+    # Most of a real vocabulary is made of rare terms, whose cost is mostly the read itself
+    rng = random.Random(7)
+    rare_terms = [f"rare{i}" for i in range(args.terms)]
+    for term in rare_terms:
+        doc_ids = sorted(rng.sample(range(args.docs), rng.randint(1, 20)))
+        postings[term] = [{"doc_id": doc_id, "positions": sorted(rng.sample(range(1, 600), 2))} for doc_id in doc_ids]
+    common_terms = [term for term in postings if term not in rare_terms]
+    with tempfile.TemporaryDirectory() as directory:
+        index = DiskPositionalIndex(write_index(directory, postings, codec, args.docs))
+        print(f"{'terms':>8}{'positions':>11}{'previous (us)':>15}{'mapped (us)':>13}{'speedup':>9}")
+        for label, terms in (("common", common_terms), ("rare", rare_terms)):
+            for with_positions in (False, True):
+                read_mapped = index.positionPostings if with_positions else index.skipPostings
+                for term in terms[:20]:
+                    expected = [(p.doc_id, p.positions) for p in previous_postings(index, term, with_positions)]
+                    assert [(p.doc_id, p.positions) for p in read_mapped(term)] == expected
+                previous_time = time_terms(lambda term: previous_postings(index, term, with_positions), terms)
+                mapped_time = time_terms(read_mapped, terms)
+                print(
+                    f"{label:>8}{str(with_positions):>11}{previous_time * 1e6:>15.1f}{mapped_time * 1e6:>13.1f}"
+                    f"{previous_time / mapped_time:>9.1f}"
+                )
+
+        # A ranked query looks up the term frequency of every matching document
+        lookups = [(term, posting["doc_id"]) for term in common_terms[:50] for posting in postings[term][::50]]
+        for term, doc_id in lookups[:100]:
+            assert previous_term_frequency(index, term, doc_id) == index.get_term_frequency(term, doc_id)
+        previous_time = time_terms(lambda lookup: previous_term_frequency(index, *lookup), lookups)
+        mapped_time = time_terms(lambda lookup: index.get_term_frequency(*lookup), lookups)
+        print(f"{'tf':>8}{'-':>11}{previous_time * 1e6:>15.1f}{mapped_time * 1e6:>13.1f}{previous_time / mapped_time:>9.1f}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
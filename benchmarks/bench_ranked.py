@@ -0,0 +1,59 @@
+"""Measures ranked queries over high-df terms with the object-based and the NumPy scoring paths.
+
+The object-based path scores one Posting at a time, looking up each term frequency and document length; the
+NumPy path decodes each term into doc ID and tf arrays and scores them into a dense accumulator.
+
+    python -m benchmarks.bench_ranked [--terms 200] [--docs 36803] [--k 10] [--repeat 3]
+"""
+from benchmarks.bench_codecs import synthetic_postings
+from benchmarks.bench_postings import write_index
+from engine.indexing import DiskPositionalIndex, get_codec
+from engine.querying import RankedQuery
+import argparse
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=200)
+    parser.add_argument("--docs", type=int, default=36803)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    codec = get_codec("vbyte")
+    postings = synthetic_postings(args.terms, args.docs)
+    with tempfile.TemporaryDirectory() as directory:
+        index = DiskPositionalIndex(write_index(directory, postings, codec, args.docs))
+        scalar = RankedQuery(index, vectorized=False, pruned=False)
+        vectorized = RankedQuery(index, vectorized=True)
+        print(f"{'query df':>10}{'okapi':>7}{'objects (ms)':>14}{'numpy (ms)':>12}{'speedup':>9}")
+        for first_rank in (0, 5, 20):
+            query = " ".join(f"term{rank}" for rank in range(first_rank, first_rank + 3))
+            query_df = sum(len(postings[term]) for term in query.split())
+            for use_okapi in (False, True):
+                expected = scalar.rank_documents(query, use_okapi, args.k)
+                # Ties may be ordered differently, but the scores must agree
+                for (_, score), (_, expected_score) in zip(vectorized.rank_documents(query, use_okapi, args.k), expected):
+                    assert abs(score - expected_score) < 1e-9
+
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    scalar.rank_documents(query, use_okapi, args.k)
+                scalar_time = (time.perf_counter() - start) / args.repeat
+
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    vectorized.rank_documents(query, use_okapi, args.k)
+                vectorized_time = (time.perf_counter() - start) / args.repeat
+
+                print(
+                    f"{query_df:>10}{str(use_okapi):>7}{scalar_time * 1000:>14.1f}{vectorized_time * 1000:>12.2f}"
+                    f"{scalar_time / vectorized_time:>9.1f}"
+                )
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
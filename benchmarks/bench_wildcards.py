@@ -0,0 +1,67 @@
+"""Measures wildcard expansion: a scan of the whole vocabulary against the k-gram index of the segment.
+
+The scan checks every term of terms.bin against the pattern; the k-gram index intersects the terms of the
+pattern's k-grams and only checks those candidates.
+
+    python -m benchmarks.bench_wildcards [--terms 200000] [--repeat 3]
+"""
+from benchmarks.bench_maxscore import timed
+from engine.indexing.kgramindex import KGramIndex, KGramIndexWriter, wildcard_kgrams, wildcard_regex
+from engine.indexing.termdictionary import TermDictionary, TermDictionaryWriter, TermEntry
+import argparse
+import os
+import random
+import tempfile
+
+# Letters weighted roughly like English text, so k-grams are as unevenly shared as in a real vocabulary
+LETTERS = "eeeeeeeeeeeetttttttttaaaaaaaaoooooooiiiiiiinnnnnnnsssssshhhhhhrrrrrrddddlllluuucccmmmwwffggyyppbbvkjxqz"
+
+
+def synthetic_vocabulary(num_terms, seed=42):
+    rng = random.Random(seed)
+    terms = set()
+    while len(terms) < num_terms:
+        terms.add("".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 12))))
+    return sorted(terms)
+
+
+def scan(dictionary, pattern):
+    regex = wildcard_regex(pattern)
+    return [term for term in dictionary.terms() if regex.fullmatch(term)]
+
+
+def expand(dictionary, kgrams, pattern):
+    regex = wildcard_regex(pattern)
+    return [term for term in dictionary.terms_at(kgrams.candidates(wildcard_kgrams(pattern))) if regex.fullmatch(term)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        with TermDictionaryWriter(os.path.join(directory, "terms.bin")) as dictionary, KGramIndexWriter(directory) as kgrams:
+            for term in synthetic_vocabulary(args.terms):
+                dictionary.add(term, TermEntry(0, 0, 1, 1))
+                kgrams.add(term, [0], [1], 1)
+        dictionary = TermDictionary(os.path.join(directory, "terms.bin"))
+        kgrams = KGramIndex(directory)
+
+        print(f"{'pattern':<12}{'matches':>9}{'candidates':>12}{'scan (ms)':>11}{'k-grams (ms)':>14}")
+        for pattern in ("qu*", "zeb*", "*tion", "*ing", "c*t", "th*e*", "str*ng", "*eet*"):
+            matches = scan(dictionary, pattern)
+            assert expand(dictionary, kgrams, pattern) == matches
+            candidates = len(kgrams.candidates(wildcard_kgrams(pattern)))
+            print(
+                f"{pattern:<12}{len(matches):>9}{candidates:>12}"
+                f"{timed(lambda: scan(dictionary, pattern), args.repeat) * 1000:>11.1f}"
+                f"{timed(lambda: expand(dictionary, kgrams, pattern), args.repeat) * 1000:>14.1f}"
+            )
+        dictionary.close()
+        kgrams.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,45 @@ import os
 LANGUAGE: Optional[str] = None
 TOTAL_DOCS = 0
 
+# Number of worker processes used to build the index, and documents per worker batch
+INDEX_WORKERS = os.cpu_count() or 1
+INDEX_BATCH_SIZE = 500
+
+# Bytes of postings SPIMI buffers in memory before flushing a bucket (shared by all workers)
+SPIMI_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Codec used for postings.bin and the SPIMI buckets: "raw", "vbyte" or "group_varint"
+POSTINGS_CODEC = "vbyte"
+
+# Whether the index also stores each term's postings sorted by impact, for score-at-a-time ranking
+BUILD_IMPACT_INDEX = True
+
+# Doc IDs in the champion list of each term for champion list ranking, or 0 for no champion lists
+CHAMPION_LIST_SIZE = 100
+
+# Terms in at least this many documents of a segment also get a compressed bitmap of their doc IDs, which
+# boolean queries intersect with word-level operations, or 0 for no bitmaps
+BITMAP_MIN_DF = 4096
+
+# Most terms a wildcard query term such as comput* expands to; the most frequent matching terms are kept
+WILDCARD_MAX_TERMS = 200
+
+# Approximate bytes of decoded postings the disk index keeps in its LRU cache
+POSTINGS_CACHE_BYTES = 64 * 1024 * 1024
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 DB_DIR = os.path.join(DATA_DIR, "db")
-POSTINGS_DIR = os.path.join(DATA_DIR, "postings")
-WEIGHTS_DIR = os.path.join(DATA_DIR, "weights")
+SEGMENTS_DIR = os.path.join(DATA_DIR, "segments")
 BUCKET_DIR = os.path.join(DATA_DIR, "bucket")
 
 DB_PATH = os.path.join(DB_DIR, "index.db")
-POSTINGS_FILE_PATH = os.path.join(POSTINGS_DIR, "postings.bin")
-DOC_WEIGHTS_FILE_PATH = os.path.join(WEIGHTS_DIR, "docWeights.bin")
 BUCKET_FILE_PATH = os.path.join(BUCKET_DIR, "bucket.bin")
 
+# Each segment directory holds a postings.bin and a docStats.bin. Appends create new segments, and
+# compaction merges them once there are more than MAX_SEGMENTS
+MAX_SEGMENTS = 8
+
 # Ensure directories exist
 os.makedirs(DB_DIR, exist_ok=True)
-os.makedirs(POSTINGS_DIR, exist_ok=True)
-os.makedirs(WEIGHTS_DIR, exist_ok=True)
+os.makedirs(SEGMENTS_DIR, exist_ok=True)
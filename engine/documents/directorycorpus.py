@@ -66,18 +66,29 @@ class DirectoryCorpus:
         next_id = 0
         for f in Path(self.corpus_path).rglob("*"):
             if f.suffix in self.factories and self.file_filter(f):
-                if f.suffix == ".json":
-                    with open(f, "r", encoding="utf-8") as json_file:
-                        data = json.load(json_file)
-                    title = data.get("title", "")
-                    content = data.get("body", "")
-                    yield self.factories[f.suffix](next_id, title, content)
-                else:
-                    yield self.factories[f.suffix](f, next_id)
+                yield self._load_file(f, next_id)
                 next_id += 1
         global TOTAL_DOCS
         TOTAL_DOCS = next_id
 
+    def load_document(self, file_path: Path, doc_id: int = 0) -> Document:
+        """Loads a single file with the factory of its extension, without walking the directory."""
+        file_path = Path(file_path)
+        if not file_path.is_file():
+            raise FileNotFoundError(f"No such document: {file_path}")
+        if file_path.suffix not in self.factories:
+            raise ValueError(f"Unsupported file type: {file_path.suffix or file_path.name}")
+        return self._load_file(file_path, doc_id)
+
+    def _load_file(self, f: Path, doc_id: int) -> Document:
+        if f.suffix == ".json":
+            with open(f, "r", encoding="utf-8") as json_file:
+                data = json.load(json_file)
+            title = data.get("title", "")
+            content = data.get("body", "")
+            return self.factories[f.suffix](doc_id, title, content)
+        return self.factories[f.suffix](f, doc_id)
+
     @staticmethod
     def load_directory(
         path: Path, extensionFactories: Dict[str, Callable[[Path, int], Document]]
@@ -1,6 +1,8 @@
 from .index import Index
 from .postings import Posting
 from .postionalinvertedindex import PositionalInvertedIndex
+from .codecs import PostingsCodec, get_codec
+from .livedocs import LiveDocs
 from .diskindexwriter import DiskIndexWriter
 from .diskpositionalindex import DiskPositionalIndex
 from .spimi import SPIMI
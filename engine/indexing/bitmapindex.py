@@ -0,0 +1,42 @@
+from .roaringbitmap import RoaringBitmap
+from .segmentfile import SegmentFile, SegmentFileWriter
+from typing import Optional
+import os
+
+# bitmaps.bin holds a RoaringBitmap of the doc IDs of each term found in at least the bitmap df threshold of
+# documents of the segment, for bitmap boolean operators. Rarer terms have no bitmap: their postings lists are
+# short enough to be merged as lists. bitmapTerms.bin is a term dictionary whose postings offsets point at the
+# bitmaps in bitmaps.bin.
+
+
+def bitmap_paths(directory) -> tuple[str, str]:
+    return os.path.join(directory, "bitmaps.bin"), os.path.join(directory, "bitmapTerms.bin")
+
+
+class BitmapIndexWriter(SegmentFileWriter):
+    """Writes the doc ID bitmaps of the terms of a segment with a df of at least min_df. Terms must be added
+    in sorted order."""
+
+    paths = staticmethod(bitmap_paths)
+
+    def __init__(self, directory, min_df):
+        super().__init__(directory)
+        self.min_df = min_df
+
+    def add(self, term: str, doc_ids, frequencies, cf: int):
+        if len(doc_ids) < self.min_df:
+            return
+        self.write_record(term, RoaringBitmap.from_sorted(doc_ids).to_bytes(), len(doc_ids), cf)
+
+
+class BitmapIndex(SegmentFile):
+    """The read-only, memory-mapped doc ID bitmaps of a segment."""
+
+    paths = staticmethod(bitmap_paths)
+
+    def bitmap(self, term: str) -> Optional[RoaringBitmap]:
+        """Returns the bitmap of a term, or None if the term is below the df threshold in the segment."""
+        entry = self.lookup(term)
+        if entry is None:
+            return None
+        return RoaringBitmap.from_bytes(self.data, entry.postings_offset)
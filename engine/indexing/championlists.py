@@ -0,0 +1,57 @@
+from .codecs import VariableByteCodec
+from .segmentfile import SegmentFile, SegmentFileWriter
+from itertools import accumulate
+from typing import Optional
+import heapq
+import math
+import os
+
+# champions.bin holds the champion list of each term with more postings than the champion list size: the doc
+# IDs of its postings with the highest (1 + log tf) / L_d, as <count><doc gaps> variable-byte integers. Terms
+# with fewer postings have no champion list, since their whole postings list is as short. championTerms.bin is
+# a term dictionary whose postings offsets point at the lists in champions.bin.
+
+_vbyte = VariableByteCodec()
+
+
+def champion_paths(directory) -> tuple[str, str]:
+    return os.path.join(directory, "champions.bin"), os.path.join(directory, "championTerms.bin")
+
+
+class ChampionListWriter(SegmentFileWriter):
+    """Writes the champion lists of a segment, of at most size doc IDs. Terms must be added in sorted order.
+
+    doc_stats holds the L_d and length of each document of the segment, from first_doc_id on."""
+
+    paths = staticmethod(champion_paths)
+
+    def __init__(self, directory, doc_stats, first_doc_id, size):
+        super().__init__(directory)
+        self.doc_stats = doc_stats
+        self.first_doc_id = first_doc_id
+        self.size = size
+
+    def add(self, term: str, doc_ids, frequencies, cf: int):
+        if len(doc_ids) <= self.size:
+            return
+        weights = (
+            (1 + math.log(tf)) / self.doc_stats[2 * (doc_id - self.first_doc_id)] for doc_id, tf in zip(doc_ids, frequencies)
+        )
+        champions = sorted(doc_id for _, doc_id in heapq.nlargest(self.size, zip(weights, doc_ids)))
+        record = _vbyte.encode([len(champions)] + [b - a for a, b in zip([0] + champions, champions)])
+        self.write_record(term, record, len(champions), cf)
+
+
+class ChampionLists(SegmentFile):
+    """The read-only, memory-mapped champion lists of a segment."""
+
+    paths = staticmethod(champion_paths)
+
+    def doc_ids(self, term: str) -> Optional[list[int]]:
+        """Returns the champion list of a term, in doc ID order, or None if its whole postings list is short."""
+        entry = self.lookup(term)
+        if entry is None:
+            return None
+        (count,), offset = _vbyte.decode(self.data, entry.postings_offset, 1)
+        gaps, _ = _vbyte.decode(self.data, offset, count)
+        return list(accumulate(gaps))
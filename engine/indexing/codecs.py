@@ -0,0 +1,170 @@
+from abc import ABC, abstractmethod
+from typing import Iterable
+import struct
+
+
+class PostingsCodec(ABC):
+    """A PostingsCodec turns sequences of non-negative integers (gaps, frequencies) into bytes and back.
+
+    Encoded values are not self-describing: the reader must know how many values to decode, which the
+    postings format always does (two values for the doc gap and tftd, then tftd position gaps)."""
+
+    name = ""
+
+    # True if encoding a sequence gives the same bytes as encoding its values one by one, so runs that were
+    # encoded separately (one per posting) can still be decoded with a single call
+    streamable = True
+
+    @abstractmethod
+    def encode(self, values: Iterable[int]) -> bytes:
+        """Encodes the values into bytes."""
+        pass
+
+    @abstractmethod
+    def decode(self, data, offset: int, count: int) -> tuple[list[int], int]:
+        """Decodes count values from data starting at offset. Returns the values and the offset after them."""
+        pass
+
+    def skip(self, data, offset: int, count: int) -> int:
+        """Returns the offset after count encoded values, without building them."""
+        return self.decode(data, offset, count)[1]
+
+    def decode_all(self, data) -> list[int]:
+        """Decodes every value in data. Streamable codecs can decode runs that were encoded separately this way."""
+        raise NotImplementedError(f"The {self.name} codec cannot decode without a value count")
+
+
+class RawCodec(PostingsCodec):
+    """Stores every value as a fixed 4-byte unsigned integer (the original postings.bin format)."""
+
+    name = "raw"
+
+    def encode(self, values: Iterable[int]) -> bytes:
+        values = list(values)
+        return struct.pack(f"{len(values)}I", *values)
+
+    def decode(self, data, offset: int, count: int) -> tuple[list[int], int]:
+        values = list(struct.unpack_from(f"{count}I", data, offset))
+        return values, offset + 4 * count
+
+    def skip(self, data, offset: int, count: int) -> int:
+        return offset + 4 * count
+
+    def decode_all(self, data) -> list[int]:
+        return list(struct.unpack(f"{len(data) // 4}I", data))
+
+
+_CLEAR_HIGH_BIT = bytes(byte & 0x7F for byte in range(256))
+
+
+class VariableByteCodec(PostingsCodec):
+    """Stores every value in 7-bit groups, most significant first. The high bit marks the last byte."""
+
+    name = "vbyte"
+
+    def encode(self, values: Iterable[int]) -> bytes:
+        encoded = bytearray()
+        for value in values:
+            if value < 0x80:
+                encoded.append(value | 0x80)
+                continue
+            groups = []
+            while True:
+                groups.append(value & 0x7F)
+                if value < 0x80:
+                    break
+                value >>= 7
+            groups[0] |= 0x80
+            groups.reverse()
+            encoded.extend(groups)
+        return bytes(encoded)
+
+    def decode(self, data, offset: int, count: int) -> tuple[list[int], int]:
+        values = []
+        number = 0
+        while count:
+            byte = data[offset]
+            offset += 1
+            if byte < 0x80:
+                number = (number << 7) | byte
+            else:
+                values.append((number << 7) | (byte & 0x7F))
+                number = 0
+                count -= 1
+        return values, offset
+
+    def decode_all(self, data) -> list[int]:
+        data = bytes(data)
+        # When every value fits in one byte, clearing the high bits decodes the whole run at once
+        if min(data, default=0x80) >= 0x80:
+            return list(data.translate(_CLEAR_HIGH_BIT))
+        values = []
+        number = 0
+        for byte in data:
+            if byte < 0x80:
+                number = (number << 7) | byte
+            else:
+                values.append((number << 7) | (byte & 0x7F))
+                number = 0
+        return values
+
+    def skip(self, data, offset: int, count: int) -> int:
+        while count:
+            if data[offset] >= 0x80:
+                count -= 1
+            offset += 1
+        return offset
+
+
+class GroupVarintCodec(PostingsCodec):
+    """Stores values in groups of four behind one control byte holding the byte length of each value.
+
+    The last group of a sequence may be partial; its unused length fields are zero and take no data bytes."""
+
+    name = "group_varint"
+    streamable = False
+
+    def encode(self, values: Iterable[int]) -> bytes:
+        values = list(values)
+        encoded = bytearray()
+        for start in range(0, len(values), 4):
+            group = values[start : start + 4]
+            control = 0
+            data = bytearray()
+            for i, value in enumerate(group):
+                length = max(1, (value.bit_length() + 7) // 8)
+                control |= (length - 1) << (2 * i)
+                data += value.to_bytes(length, "little")
+            encoded.append(control)
+            encoded += data
+        return bytes(encoded)
+
+    def decode(self, data, offset: int, count: int) -> tuple[list[int], int]:
+        values = []
+        while len(values) < count:
+            control = data[offset]
+            offset += 1
+            for i in range(min(4, count - len(values))):
+                length = ((control >> (2 * i)) & 3) + 1
+                values.append(int.from_bytes(data[offset : offset + length], "little"))
+                offset += length
+        return values, offset
+
+    def skip(self, data, offset: int, count: int) -> int:
+        while count > 0:
+            control = data[offset]
+            offset += 1
+            for i in range(min(4, count)):
+                offset += ((control >> (2 * i)) & 3) + 1
+            count -= 4
+        return offset
+
+
+CODECS = {codec.name: codec for codec in (RawCodec(), VariableByteCodec(), GroupVarintCodec())}
+
+
+def get_codec(name: str) -> PostingsCodec:
+    """Returns the codec registered under the given name."""
+    if name not in CODECS:
+        raise ValueError(f"Unknown postings codec: {name}")
+    return CODECS[name]
@@ -1,46 +1,120 @@
-from typing import Iterable
+from typing import Iterable, NamedTuple, Optional
 from .postings import Posting
-from config import DOC_WEIGHTS_FILE_PATH
-import struct
+from .codecs import PostingsCodec, get_codec
+from .segment import Segment
+from .livedocs import LiveDocs, live_docs_path
+from .docstats import DocStats
+from .documentstore import DocumentInfo
+from .impactindex import ImpactBlock
+from .kgramindex import wildcard_kgrams, wildcard_regex
+from .postingscursor import DiskPostingsCursor
+from .postingarrays import HAS_NUMPY, record_arrays
+from .postingscache import PostingsCache, postings_size
+from .roaringbitmap import RoaringBitmap
+from config import POSTINGS_CACHE_BYTES
+from itertools import accumulate
+import bisect
+import heapq
 import sqlite3
-import os
+import threading
+
+
+class IndexState(NamedTuple):
+    """The segments of the index with the live docs, codec and document stats that go with them. reload()
+    replaces them together, so a query never sees the segments of one version with the stats of another."""
+
+    segments: list[Segment]
+    live_docs: LiveDocs
+    codec: PostingsCodec
+    doc_stats: DocStats
 
 
 class DiskPositionalIndex:
-    def __init__(self, db_path, postings_file_path):
-        """Initialize the DiskPositionalIndex. Connects to the SQLite database and loads term start positions from it."""
-        self.postings_file_path = postings_file_path
+    def __init__(self, db_path, cache_bytes=POSTINGS_CACHE_BYTES):
+        """Initialize the DiskPositionalIndex. Connects to the SQLite database and loads the live segments from it.
+
+        Postings, weights and term frequencies of deleted documents are filtered out with the live docs bitmap;
+        postings only until compaction has purged them, after which reads skip the filtering.
+        Decoded postings are kept in an LRU cache of about cache_bytes, which reload() empties."""
+        self.db_path = db_path
         self.db_conn = sqlite3.connect(db_path, check_same_thread=False)
         self.db_cursor = self.db_conn.cursor()
-        self.term_start_positions = self._start_positions()
+        self.reload_lock = threading.Lock()
+        self.state = self._load_state(self.db_cursor)
+        self.cache = PostingsCache(cache_bytes)
         self.is_phrase_query = False 
 
+    @property
+    def segments(self) -> list[Segment]:
+        return self.state.segments
+
+    @property
+    def live_docs(self) -> LiveDocs:
+        return self.state.live_docs
+
+    @property
+    def codec(self) -> PostingsCodec:
+        return self.state.codec
+
+    @property
+    def doc_stats(self) -> DocStats:
+        return self.state.doc_stats
+
     def set_phrase_query(self, is_phrase_query):
         """Sets the flag indicating whether the current query is a phrase query."""
         self.is_phrase_query = is_phrase_query
 
-    def _start_positions(self):
-        """Retrieves the start positions of each term from the database."""
-        term_start_positions = {}
-        self.db_cursor.execute("SELECT term, position FROM term_positions")
-        for term, position in self.db_cursor.fetchall():
-            term_start_positions[term] = position
-        return term_start_positions
-
-    def _start_position(self, term: str):
-        """Retrieves the start position of a given term."""
-        return self.term_start_positions.get(term, None)
-
-    def _read_positions(self, postings_file, tftd):
-        """Reads the positions of terms in a document from the postings file."""
-        last_position = 0
-        positions = []
-        for _ in range(tftd):
-            position_gap = struct.unpack("I", postings_file.read(4))[0]
-            position = last_position + position_gap
-            positions.append(position)
-            last_position = position
-        return positions
+    def _load_state(self, db_cursor) -> IndexState:
+        """Opens the live segments, in doc ID order, with the live docs, codec and document stats of the index.
+
+        The live docs are read first: compaction marks deletions purged only once their segment is replaced, so
+        segments read afterwards are never older than the purged bitmap."""
+        live_docs = LiveDocs(live_docs_path(self.db_path))
+        db_cursor.execute("SELECT segment_id, directory, first_doc_id, doc_count FROM segments ORDER BY first_doc_id")
+        segments = [
+            Segment(segment_id, directory, first_doc_id, doc_count)
+            for segment_id, directory, first_doc_id, doc_count in db_cursor.fetchall()
+        ]
+        codec = self._load_codec(db_cursor)
+        return IndexState(segments, live_docs, codec, DocStats(segments, self._average_doc_length(db_cursor)))
+
+    def _close_segments(self):
+        for segment in self.segments:
+            segment.close()
+
+    def reload(self):
+        """Reloads the segments and the live docs after documents were appended, deleted or compacted, or the
+        index was rebuilt. It may be called from any thread, such as the one compacting the segments.
+
+        The new state is read over a connection of the calling thread and published in one assignment. The old
+        segments are not closed, since queries running in other threads may still read them; their maps are
+        released once the last of those queries is done."""
+        with self.reload_lock:
+            db_conn = sqlite3.connect(self.db_path)
+            try:
+                state = self._load_state(db_conn.cursor())
+            finally:
+                db_conn.close()
+            self.state = state
+            self.cache.clear()
+
+    @staticmethod
+    def _load_codec(db_cursor):
+        """Retrieves the codec the postings file was written with."""
+        db_cursor.execute("SELECT value FROM index_settings WHERE name = 'codec'")
+        result = db_cursor.fetchone()
+        return get_codec(result[0] if result else "raw")
+
+    def _read_postings_records(self, term: str, with_positions=False):
+        """Returns the records of a term in every segment that has it, with positions only if asked for.
+
+        Segments are in doc ID order, so the postings of the records are too."""
+        records = []
+        for segment in self.segments:
+            record = segment.read_postings_record(term, with_positions)
+            if record:
+                records.append(record)
+        return records
 
     def getPostings(self, term: str) -> Iterable[Posting]:
         """Retrieves postings for a given term, either with positions (for phrase queries) or without (for non-phrase queries)."""
@@ -50,100 +124,267 @@ class DiskPositionalIndex:
             return self.skipPostings(term)
     
     def getVocabulary(self):
-        """Retrieves the full list of indexed terms (vocabulary) from the database."""
-        self.db_cursor.execute("SELECT DISTINCT term FROM term_positions ORDER BY term")
-        return [row[0] for row in self.db_cursor.fetchall()]
+        """Retrieves the full list of indexed terms (vocabulary), merged from the term dictionaries of the segments."""
+        vocabulary = []
+        for term in heapq.merge(*(segment.dictionary.terms() for segment in self.segments)):
+            if not vocabulary or vocabulary[-1] != term:
+                vocabulary.append(term)
+        return vocabulary
 
-    def positionPostings(self, term: str) -> Iterable[Posting]:
-        """Retrieves postings with positions for a given term."""
-        start_position = self._start_position(term)
-        if start_position is None:
-            return []
+    def expand_wildcard(self, pattern: str) -> list[str]:
+        """Returns the terms of the vocabulary that match a wildcard pattern, in sorted order.
+
+        In each segment, the terms that have every k-gram of the pattern are looked up in its k-gram index and
+        then checked against the pattern, so the work grows with the number of candidates rather than with the
+        vocabulary. The terms of segments without a k-gram index, or of patterns without a k-gram such as "*",
+        are all checked."""
+        grams = wildcard_kgrams(pattern)
+        regex = wildcard_regex(pattern)
+        matches = set()
+        for segment in self.segments:
+            candidates = segment.kgrams.candidates(grams) if segment.kgrams else None
+            terms = segment.dictionary.terms() if candidates is None else segment.dictionary.terms_at(candidates)
+            matches.update(term for term in terms if regex.fullmatch(term))
+        return sorted(matches)
+
+    def get_document_frequency(self, term: str) -> int:
+        """Returns the number of live documents that contain a term.
+
+        The df of each segment is read from its term dictionary; the postings are only counted when some
+        documents are deleted but not purged yet."""
+        if self.live_docs.pending_count:
+            return len(self.skipPostings(term))
+        return self.estimate_document_frequency(term)
+
+    def estimate_document_frequency(self, term: str) -> int:
+        """Returns the df of a term summed over the term dictionaries of the segments, without decoding any
+        postings. Deleted documents are counted until compaction purges them."""
+        entries = (segment.dictionary.lookup(term) for segment in self.segments)
+        return sum(entry.df for entry in entries if entry)
+
+    def get_score_bounds(self, term: str) -> Optional[tuple[int, float, float]]:
+        """Returns the largest tf, the largest (1 + log tf) / L_d and the smallest doc length / tf of the
+        postings of a term in any segment, or None if no segment has the term. Deleted documents may still
+        count, so these are bounds rather than exact values."""
+        entries = [entry for entry in (segment.dictionary.lookup(term) for segment in self.segments) if entry]
+        if not entries:
+            return None
+        return (
+            max(entry.max_tf for entry in entries),
+            max(entry.max_weight for entry in entries),
+            min(entry.min_length_ratio for entry in entries),
+        )
+
+    def has_impacts(self) -> bool:
+        """Returns True if every segment has impact-ordered postings."""
+        return all(segment.impacts for segment in self.segments)
+
+    def get_impact_blocks(self, term: str, use_okapi: bool) -> list[ImpactBlock]:
+        """Returns the Okapi or tf-idf impact blocks of a term in every segment, highest impact first. The
+        blocks still list deleted documents."""
+        blocks = [block for segment in self.segments for block in segment.read_impact_blocks(term, use_okapi)]
+        blocks.sort(key=lambda block: block.impact, reverse=True)
+        return blocks
+
+    def has_champions(self) -> bool:
+        """Returns True if every segment has champion lists."""
+        return all(segment.champions for segment in self.segments)
+
+    def get_champion_doc_ids(self, term: str) -> list[int]:
+        """Returns the live doc IDs of a term's champion lists, in doc ID order. In segments where the term has
+        no champion list, its whole postings list, which is no longer than one, stands in for it."""
+        doc_ids = []
+        for segment in self.segments:
+            champions = segment.champions.doc_ids(term)
+            if champions is not None:
+                doc_ids.extend(doc_id for doc_id in champions if self.live_docs.is_live(doc_id))
+                continue
+            record = segment.read_postings_record(term)
+            if record:
+                doc_ids.extend(posting.doc_id for posting in self._decode_records([record]))
+        return doc_ids
 
+    def get_bitmap(self, term: str) -> Optional[RoaringBitmap]:
+        """Returns the live doc IDs of a term as a bitmap, or None if no segment stores a bitmap for it, as its
+        postings lists are short enough to be merged as lists. Segments where the term is below the bitmap df
+        threshold contribute the doc IDs of its postings."""
+        if not self.segments or not all(segment.bitmaps for segment in self.segments):
+            return None
+        bitmaps = [segment.bitmaps.bitmap(term) for segment in self.segments]
+        if not any(bitmaps):
+            return None
+
+        result = RoaringBitmap()
+        for segment, bitmap in zip(self.segments, bitmaps):
+            if bitmap is None:
+                record = segment.read_postings_record(term)
+                if not record:
+                    continue
+                bitmap = RoaringBitmap.from_sorted(posting.doc_id for posting in self._decode_records([record]))
+            result |= bitmap
+        if self.live_docs.pending_count:
+            result -= RoaringBitmap.from_sorted(self.live_docs.pending_doc_ids())
+        return result
+
+    def get_live_documents(self) -> RoaringBitmap:
+        """Returns the doc IDs of the live documents of every segment as a bitmap."""
+        result = RoaringBitmap()
+        for segment in self.segments:
+            result |= RoaringBitmap.from_range(segment.first_doc_id, segment.first_doc_id + segment.doc_count)
+        if self.live_docs.deleted_count:
+            result -= RoaringBitmap.from_sorted(self.live_docs.deleted_doc_ids())
+        return result
+
+    def getCursor(self, term: str) -> DiskPostingsCursor:
+        """Returns a cursor over the postings of a term, with positions for phrase queries."""
+        return DiskPostingsCursor(
+            self._read_postings_records(term, self.is_phrase_query),
+            self.codec,
+            self.live_docs if self.live_docs.pending_count else None,
+            with_positions=self.is_phrase_query,
+        )
+
+    def _decode_records(self, records, with_positions=False) -> list[Posting]:
+        """Decodes whole records into postings, skipping deleted documents.
+
+        With a streamable codec, the payload and the positions of each record are decoded with one codec call
+        each, instead of one call per posting as a cursor does."""
+        if not self.codec.streamable:
+            cursor = DiskPostingsCursor(records, self.codec, self.live_docs, with_positions)
+            postings = []
+            while cursor.doc_id is not None:
+                postings.append(cursor.posting())
+                cursor.next()
+            return postings
+
+        live_docs = self.live_docs if self.live_docs.pending_count else None
         postings = []
-        with open(self.postings_file_path, "rb") as postings_file:
-            postings_file.seek(start_position)
-
-            # Read and skip the term length and term
-            term_length_data = postings_file.read(4)
-            term_length = struct.unpack("I", term_length_data)[0]
-            postings_file.read(term_length)  
-
-            # Read the document frequency
-            dft = struct.unpack("I", postings_file.read(4))[0]
-            last_doc_id = 0
-            for _ in range(dft):
-                doc_gap = struct.unpack("I", postings_file.read(4))[0]
-                doc_id = last_doc_id + doc_gap
-                tftd = struct.unpack("I", postings_file.read(4))[0]
-                positions = self._read_positions(postings_file, tftd)
-                postings.append(Posting(doc_id, positions))
-                last_doc_id = doc_id
+        for record in records:
+            values = self.codec.decode_all(record.payload)
+            doc_ids = accumulate(values[0::2])
+            if not with_positions:
+                postings.extend(
+                    Posting(doc_id, 0, tftd)
+                    for doc_id, tftd in zip(doc_ids, values[1::2])
+                    if live_docs is None or live_docs.is_live(doc_id)
+                )
+                continue
 
+            position_gaps = self.codec.decode_all(record.positions)
+            positions_start = 0
+            for doc_id, tftd in zip(doc_ids, values[1::2]):
+                positions_end = positions_start + tftd
+                if live_docs is None or live_docs.is_live(doc_id):
+                    positions = list(accumulate(position_gaps[positions_start:positions_end]))
+                    postings.append(Posting(doc_id, positions, tftd))
+                positions_start = positions_end
         return postings
 
+    def _cached(self, key, decode, size):
+        """Returns the value cached under key, or decodes it and caches it with its estimated size."""
+        value = self.cache.get(key)
+        if value is None:
+            generation = self.cache.generation
+            value = decode()
+            self.cache.put(key, value, size(value), generation)
+        return value
+
+    def positionPostings(self, term: str) -> Iterable[Posting]:
+        """Retrieves postings with positions for a given term."""
+        postings = self._cached(
+            ("positions", term),
+            lambda: self._decode_records(self._read_postings_records(term, with_positions=True), with_positions=True),
+            postings_size,
+        )
+        # Callers get their own list, so they cannot change the cached one
+        return list(postings)
+
     def skipPostings(self, term: str) -> Iterable[Posting]:
         """Retrieves postings without positions for a given term."""
-        start_position = self._start_position(term)
-        if start_position is None:
-            return []
+        # Only the doc IDs and frequencies are read, not the positions
+        postings = self._cached(
+            ("docs", term), lambda: self._decode_records(self._read_postings_records(term)), postings_size
+        )
+        return list(postings)
 
-        postings = []
-        with open(self.postings_file_path, "rb") as postings_file:
-            postings_file.seek(start_position)
-
-            # Read and skip the term length and term
-            term_length_data = postings_file.read(4)
-            term_length = struct.unpack("I", term_length_data)[0]
-            postings_file.read(term_length)  
+    def getPostingArrays(self, term: str):
+        """Retrieves the postings of a term as parallel NumPy arrays of doc IDs and term frequencies.
 
-            # Read the document frequency
-            dft = struct.unpack("I", postings_file.read(4))[0]
-            last_doc_id = 0
-            for _ in range(dft):
-                doc_gap = struct.unpack("I", postings_file.read(4))[0]
-                doc_id = last_doc_id + doc_gap
-                tftd = struct.unpack("I", postings_file.read(4))[0]
+        Requires NumPy; getPostings serves the same postings as Posting objects without it. The arrays are
+        shared with the cache, so they are read-only."""
+        if not HAS_NUMPY:
+            raise RuntimeError("getPostingArrays requires NumPy")
 
-                # Skip the positions data
-                postings_file.seek(tftd * 4, os.SEEK_CUR)
+        def decode():
+            arrays = record_arrays(self._read_postings_records(term), self.codec, self.live_docs)
+            for array in arrays:
+                array.flags.writeable = False
+            return arrays
 
-                postings.append(Posting(doc_id, 0))
-                last_doc_id = doc_id
+        return self._cached(("arrays", term), decode, lambda arrays: sum(array.nbytes for array in arrays))
 
-        return postings
+    def _live_doc_ids(self):
+        """Yields the doc IDs of the live documents of every segment."""
+        for segment in self.segments:
+            for doc_id in range(segment.first_doc_id, segment.first_doc_id + segment.doc_count):
+                if self.live_docs.is_live(doc_id):
+                    yield doc_id
 
     def get_doc_weights(self) -> dict[int, float]:
-        """Loads the document weights (Euclidean lengths) from the specified file."""
-        doc_weights = {}
-        try:
-            with open(DOC_WEIGHTS_FILE_PATH, 'rb') as doc_weights_file:
-                doc_id = 0
-                while True:
-                    doc_weight_data = doc_weights_file.read(8) 
-                    if not doc_weight_data:
-                        break
-                    L_d, = struct.unpack('d', doc_weight_data)
-                    doc_weights[doc_id] = L_d
-                    doc_id += 1
-            return doc_weights
-        except FileNotFoundError:
-            print(f"File not found: {DOC_WEIGHTS_FILE_PATH}")
-            return {}
-        
+        """Returns the document weights (Euclidean lengths) of the live documents of every segment."""
+        return {doc_id: self.doc_stats.weights[doc_id] for doc_id in self._live_doc_ids()}
+
     def get_document_length(self, doc_id):
-        self.db_cursor.execute('SELECT doc_length FROM document_metadata WHERE doc_id = ?', (doc_id,))
-        result = self.db_cursor.fetchone()
-        return result[0] if result else None
-    
+        """Returns the number of tokens of a live document, or None for deleted or unknown documents."""
+        if doc_id >= len(self.doc_stats) or not self.live_docs.is_live(doc_id):
+            return None
+        return int(self.doc_stats.lengths[doc_id])
+
+    def get_document_lengths(self) -> dict[int, int]:
+        """Returns the number of tokens of every live document."""
+        return {doc_id: int(self.doc_stats.lengths[doc_id]) for doc_id in self._live_doc_ids()}
+
+    def _segments_of(self, doc_ids):
+        """Yields the segment of each doc ID, or None for doc IDs that are deleted or in no segment."""
+        first_doc_ids = [segment.first_doc_id for segment in self.segments]
+        for doc_id in doc_ids:
+            i = bisect.bisect_right(first_doc_ids, doc_id) - 1
+            if i >= 0 and self.segments[i].contains(doc_id) and self.live_docs.is_live(doc_id):
+                yield self.segments[i]
+            else:
+                yield None
+
+    def get_document_titles(self, doc_ids) -> list[Optional[str]]:
+        """Returns the titles of a batch of documents, in the order of doc_ids, with None for deleted or unknown
+        documents. The titles are read from the segments' document stores, not from SQLite."""
+        doc_ids = list(doc_ids)
+        return [
+            segment.document_title(doc_id) if segment else None
+            for doc_id, segment in zip(doc_ids, self._segments_of(doc_ids))
+        ]
+
+    def get_documents(self, doc_ids) -> list[Optional[DocumentInfo]]:
+        """Returns the title, path and length of a batch of documents, in the order of doc_ids, with None for
+        deleted or unknown documents."""
+        doc_ids = list(doc_ids)
+        return [
+            DocumentInfo(doc_id, segment.document_title(doc_id), segment.document_path(doc_id), int(self.doc_stats.lengths[doc_id]))
+            if segment else None
+            for doc_id, segment in zip(doc_ids, self._segments_of(doc_ids))
+        ]
+
     def calculate_average_doc_length(self):
-        self.db_cursor.execute('SELECT COUNT(*) FROM document_metadata')
-        num_documents = self.db_cursor.fetchone()[0]
+        return self._average_doc_length(self.db_cursor)
+
+    @staticmethod
+    def _average_doc_length(db_cursor):
+        db_cursor.execute('SELECT COUNT(*) FROM document_metadata')
+        num_documents = db_cursor.fetchone()[0]
         if num_documents == 0:
             return 0  
 
-        self.db_cursor.execute('SELECT value FROM corpus_stats WHERE stat_name = "total_tokens"')
-        total_tokens = self.db_cursor.fetchone()[0]
+        db_cursor.execute('SELECT value FROM corpus_stats WHERE stat_name = "total_tokens"')
+        total_tokens = db_cursor.fetchone()[0]
 
         return total_tokens / num_documents
 
@@ -155,38 +396,20 @@ class DiskPositionalIndex:
     
     def get_term_frequency(self, term: str, doc_id: int) -> int:
         """Retrieves the term frequency for a given term in a specific document."""
-        start_position = self._start_position(term)
-        if start_position is None:
+        segment = next((segment for segment in self.segments if segment.contains(doc_id)), None)
+        if segment is None or not self.live_docs.is_live(doc_id):
+            return 0
+        record = segment.read_postings_record(term)
+        if record is None:
             return 0
 
-        term_frequency = 0
-        with open(self.postings_file_path, "rb") as postings_file:
-            postings_file.seek(start_position)
-
-            # Read and skip the term length and term
-            term_length_data = postings_file.read(4)
-            term_length = struct.unpack("I", term_length_data)[0]
-            postings_file.read(term_length)
-
-            # Read the document frequency
-            dft = struct.unpack("I", postings_file.read(4))[0]
-            last_read_doc_id = 0
-            for _ in range(dft):
-                # Read and calculate the document id
-                doc_gap = struct.unpack("I", postings_file.read(4))[0]
-                current_doc_id = last_read_doc_id + doc_gap
-                if current_doc_id == doc_id:
-                    tftd = struct.unpack("I", postings_file.read(4))[0]
-                    term_frequency = tftd
-                    break
-                else:
-                    # Skip to the next posting if this is not the required document
-                    tftd = struct.unpack("I", postings_file.read(4))[0]
-                    postings_file.seek(tftd * 4, os.SEEK_CUR)
-                    last_read_doc_id = current_doc_id
-
-        return term_frequency
+        # Jump over the skip blocks before the document instead of scanning the postings
+        cursor = DiskPostingsCursor([record], self.codec)
+        if cursor.advance(doc_id) != doc_id:
+            return 0
+        return cursor.tftd
 
     def close(self):
+        self._close_segments()
         self.db_conn.close()
 
@@ -0,0 +1,38 @@
+from array import array
+import struct
+
+# docStats.bin holds one fixed-width entry <L_d><doc length> per document of a segment, in doc ID order. Both
+# are doubles, so the file can be read as a flat array of doubles without parsing it.
+DOC_STATS = struct.Struct("dd")
+
+
+def pack_doc_stats(L_d: float, doc_length: int) -> bytes:
+    return DOC_STATS.pack(L_d, doc_length)
+
+
+class DocStats:
+    """The weights L_d, the token counts and the Okapi length normalizers of every document, indexed by doc ID.
+
+    They are loaded once from the segments' docStats.bin files when the index is opened, so ranking looks
+    them up in arrays instead of querying SQLite or reading files. Doc IDs without a document (before the
+    first segment) have a weight of 1 and a length of 0."""
+
+    def __init__(self, segments, avg_doc_length: float):
+        self.weights = array("d")
+        self.lengths = array("d")
+        for segment in segments:
+            stats = segment.read_doc_stats()
+            padding = segment.first_doc_id - len(self.weights)
+            if padding > 0:
+                self.weights.extend([1.0] * padding)
+                self.lengths.extend([0.0] * padding)
+            self.weights.extend(stats[0::2])
+            self.lengths.extend(stats[1::2])
+
+        # The BM25 denominator term k1 * ((1 - b) + b * doc length / average doc length), with k1 = 1.2 and b = 0.75
+        self.avg_doc_length = avg_doc_length
+        relative_lengths = (length / avg_doc_length if avg_doc_length else 0 for length in self.lengths)
+        self.okapi_normalizers = array("d", (1.2 * (0.25 + 0.75 * relative_length) for relative_length in relative_lengths))
+
+    def __len__(self) -> int:
+        return len(self.weights)
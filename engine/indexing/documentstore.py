@@ -0,0 +1,72 @@
+from array import array
+from typing import NamedTuple, Optional
+import mmap
+import struct
+
+# documents.bin holds the titles and paths of a segment's documents, in doc ID order, as a UTF-8 blob followed
+# by the 2 * count + 1 offsets of the fields in the blob (title, path, title, path, ..., end) and the footer
+# <count><offsets start>. The fields of a document are read with two offsets, without parsing the file.
+OFFSETS_TYPE = "Q"
+FOOTER = struct.Struct("QQ")
+
+
+class DocumentInfo(NamedTuple):
+    """What the results page shows of a document: its title, its file path and its number of tokens."""
+
+    doc_id: int
+    title: str
+    path: str
+    length: int
+
+
+class DocumentStoreWriter:
+    """Appends the titles and paths of documents, in doc ID order, to a document store file."""
+
+    def __init__(self, file_path):
+        self.stream = open(file_path, "wb")
+        self.offsets = array(OFFSETS_TYPE, [0])
+
+    def add(self, title: str, path: str):
+        for field in (title, path):
+            data = field.encode("utf-8", errors="replace")
+            self.stream.write(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self):
+        """Writes the offsets and the footer, and closes the file."""
+        offsets_start = self.offsets[-1]
+        self.stream.write(self.offsets.tobytes())
+        self.stream.write(FOOTER.pack((len(self.offsets) - 1) // 2, offsets_start))
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DocumentStore:
+    """A read-only, memory-mapped document store. Documents are numbered from 0 within the store."""
+
+    def __init__(self, file_path):
+        with open(file_path, "rb") as store_file:
+            self.data = mmap.mmap(store_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count, offsets_start = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+        self.offsets = memoryview(self.data)[offsets_start : len(self.data) - FOOTER.size].cast(OFFSETS_TYPE)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _field(self, index: int) -> str:
+        return self.data[self.offsets[index] : self.offsets[index + 1]].decode("utf-8")
+
+    def title(self, index: int) -> Optional[str]:
+        return self._field(2 * index) if 0 <= index < self.count else None
+
+    def path(self, index: int) -> Optional[str]:
+        return self._field(2 * index + 1) if 0 <= index < self.count else None
+
+    def close(self):
+        self.offsets.release()
+        self.data.close()
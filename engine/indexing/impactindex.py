@@ -0,0 +1,104 @@
+from .codecs import VariableByteCodec
+from .segmentfile import SegmentFile, SegmentFileWriter
+from itertools import accumulate
+from typing import NamedTuple
+import math
+import os
+
+# impacts.bin holds a second copy of each term's doc IDs, sorted by impact instead of by doc ID, for
+# score-at-a-time ranking. The impact of a posting is its tf-idf or Okapi contribution without the query
+# weight, quantized to an integer from 1 to IMPACT_LEVELS, so the postings of a term with the same impact form
+# a block. A term's record is <tf-idf block count><Okapi block count>, then <impact><doc count><byte length>
+# per block, highest impact first, then the doc IDs of each block as gaps; all are variable-byte integers.
+# impactTerms.bin is a term dictionary whose postings offsets point at the records in impacts.bin.
+IMPACT_LEVELS = 255
+# (1 + log tf) / L_d is at most 1, and 2.2 * tf / (normalizer + tf) is below 2.2
+TFIDF_IMPACT_SCALE = 1.0
+OKAPI_IMPACT_SCALE = 2.2
+
+_vbyte = VariableByteCodec()
+
+
+class ImpactBlock(NamedTuple):
+    """The doc IDs of a term's postings that share an impact, still encoded."""
+
+    impact: int
+    count: int
+    data: bytes
+
+    def doc_ids(self) -> list[int]:
+        return list(accumulate(_vbyte.decode_all(self.data)))
+
+
+def quantize(contribution: float, scale: float) -> int:
+    """Maps a contribution between 0 and scale to an impact between 1 and IMPACT_LEVELS."""
+    return min(IMPACT_LEVELS, max(1, round(contribution / scale * IMPACT_LEVELS)))
+
+
+def impact_paths(directory) -> tuple[str, str]:
+    return os.path.join(directory, "impacts.bin"), os.path.join(directory, "impactTerms.bin")
+
+
+class ImpactIndexWriter(SegmentFileWriter):
+    """Writes the impact-ordered postings of a segment. Terms must be added in sorted order.
+
+    doc_stats holds the L_d and length of each document of the segment, from first_doc_id on. Okapi impacts
+    are computed with the segment's average document length."""
+
+    paths = staticmethod(impact_paths)
+
+    def __init__(self, directory, doc_stats, first_doc_id):
+        super().__init__(directory)
+        self.doc_stats = doc_stats
+        self.first_doc_id = first_doc_id
+        doc_lengths = doc_stats[1::2]
+        self.avg_doc_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0
+
+    def _blocks(self, impacts) -> list[tuple[int, list[int]]]:
+        """Groups (impact, doc ID) pairs into blocks, highest impact first, with the doc IDs in order."""
+        blocks = {}
+        for impact, doc_id in impacts:
+            blocks.setdefault(impact, []).append(doc_id)
+        return sorted(blocks.items(), reverse=True)
+
+    def add(self, term: str, doc_ids, frequencies, cf: int):
+        tfidf_impacts = []
+        okapi_impacts = []
+        for doc_id, tf in zip(doc_ids, frequencies):
+            L_d, doc_length = self.doc_stats[2 * (doc_id - self.first_doc_id)], self.doc_stats[2 * (doc_id - self.first_doc_id) + 1]
+            relative_length = doc_length / self.avg_doc_length if self.avg_doc_length else 0
+            tfidf_impacts.append((quantize((1 + math.log(tf)) / L_d, TFIDF_IMPACT_SCALE), doc_id))
+            okapi = 2.2 * tf / (1.2 * (0.25 + 0.75 * relative_length) + tf)
+            okapi_impacts.append((quantize(okapi, OKAPI_IMPACT_SCALE), doc_id))
+
+        tfidf_blocks = self._blocks(tfidf_impacts)
+        okapi_blocks = self._blocks(okapi_impacts)
+        header = [len(tfidf_blocks), len(okapi_blocks)]
+        payloads = []
+        for impact, block_doc_ids in tfidf_blocks + okapi_blocks:
+            payload = _vbyte.encode(b - a for a, b in zip([0] + block_doc_ids, block_doc_ids))
+            header.extend((impact, len(block_doc_ids), len(payload)))
+            payloads.append(payload)
+
+        self.write_record(term, _vbyte.encode(header) + b"".join(payloads), len(tfidf_impacts), cf)
+
+
+class ImpactIndex(SegmentFile):
+    """The read-only, memory-mapped impact-ordered postings of a segment."""
+
+    paths = staticmethod(impact_paths)
+
+    def blocks(self, term: str, use_okapi: bool) -> list[ImpactBlock]:
+        """Returns the Okapi or tf-idf impact blocks of a term, highest impact first."""
+        entry = self.lookup(term)
+        if entry is None:
+            return []
+        (tfidf_count, okapi_count), offset = _vbyte.decode(self.data, entry.postings_offset, 2)
+        header, offset = _vbyte.decode(self.data, offset, 3 * (tfidf_count + okapi_count))
+        blocks = []
+        for i in range(tfidf_count + okapi_count):
+            impact, count, length = header[3 * i : 3 * i + 3]
+            if (i >= tfidf_count) == use_okapi:
+                blocks.append(ImpactBlock(impact, count, self.data[offset : offset + length]))
+            offset += length
+        return blocks
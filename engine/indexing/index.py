@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Iterable
 from .postings import Posting
+from .postingscursor import ListPostingsCursor, PostingsCursor
 
 
 class Index(ABC):
@@ -16,3 +17,7 @@ class Index(ABC):
     def getVocabulary(self) -> list[str]:
         """A (sorted) list of all terms in the index vocabulary."""
         pass
+
+    def getCursor(self, term: str) -> PostingsCursor:
+        """Returns a cursor over the postings of the given term."""
+        return ListPostingsCursor(self.getPostings(term))
@@ -0,0 +1,63 @@
+from array import array
+from .postingsfile import PostingsRecord, RecordBuilder
+import sys
+
+# Bytes taken by a term with no postings yet: its key, its entry tuple, three empty arrays and a dict slot
+_ENTRY_OVERHEAD = sys.getsizeof((None, None, None)) + 3 * sys.getsizeof(array("I")) + 3 * 8
+_ITEM_SIZE = array("I").itemsize
+
+
+class InversionBuffer:
+    """The in-memory side of SPIMI: postings of the documents seen since the last flush.
+
+    Each term keeps three growable arrays (doc IDs, term frequencies and positions) instead of a Posting
+    object and a list per document, and the buffer counts the bytes it holds so SPIMI can flush against a
+    real memory budget."""
+
+    def __init__(self):
+        self.postings = {}
+        self.memory_used = 0
+
+    def add_term(self, term: str, doc_id: int, position: int):
+        """Records that the given document contains the term at the given position.
+
+        Documents must be added in increasing doc ID order, and positions in non-decreasing order."""
+        if not term:
+            return
+        entry = self.postings.get(term)
+        if entry is None:
+            entry = (array("I"), array("I"), array("I"))
+            self.postings[term] = entry
+            self.memory_used += _ENTRY_OVERHEAD + sys.getsizeof(term)
+
+        doc_ids, frequencies, positions = entry
+        if doc_ids and doc_ids[-1] == doc_id:
+            frequencies[-1] += 1
+        else:
+            doc_ids.append(doc_id)
+            frequencies.append(1)
+            self.memory_used += 2 * _ITEM_SIZE
+        positions.append(position)
+        self.memory_used += _ITEM_SIZE
+
+    def getVocabulary(self) -> list[str]:
+        """Returns the sorted list of buffered terms."""
+        return sorted(self.postings)
+
+    def encode_postings(self, term: str, codec) -> PostingsRecord:
+        """Encodes the buffered postings of a term as a bucket record."""
+        doc_ids, frequencies, positions = self.postings[term]
+        builder = RecordBuilder(term, codec)
+        start = 0
+        for doc_id, tftd in zip(doc_ids, frequencies):
+            builder.add(doc_id, positions[start : start + tftd])
+            start += tftd
+        return builder.record()
+
+    def __len__(self) -> int:
+        return len(self.postings)
+
+    def clear(self):
+        """Empties the buffer."""
+        self.postings = {}
+        self.memory_used = 0
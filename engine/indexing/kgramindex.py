@@ -0,0 +1,107 @@
+from .codecs import VariableByteCodec
+from .segmentfile import SegmentFile, SegmentFileWriter
+from itertools import accumulate
+from typing import Optional
+import os
+import re
+
+# kgrams.bin maps the character k-grams of the terms of a segment, with "$" marking the start and the end of
+# a term, to the terms that contain them, for wildcard queries. A term is identified by its ordinal in the
+# sorted terms.bin, and the record of a k-gram is <count><ordinal gaps> as variable-byte integers. Besides its
+# KGRAM_LENGTH-grams, a term gets the shorter grams of its start and end, so "comput*" and "*t" still have a
+# gram with a boundary marker to look up. kgramTerms.bin is a term dictionary of the k-grams whose postings
+# offsets point at the records in kgrams.bin.
+KGRAM_LENGTH = 3
+BOUNDARY = "$"
+WILDCARD = "*"
+
+_vbyte = VariableByteCodec()
+
+
+def kgram_paths(directory) -> tuple[str, str]:
+    return os.path.join(directory, "kgrams.bin"), os.path.join(directory, "kgramTerms.bin")
+
+
+def term_kgrams(term: str) -> set[str]:
+    """Returns the k-grams of a term, with its shorter start and end grams."""
+    marked = BOUNDARY + term + BOUNDARY
+    grams = {marked[i : i + KGRAM_LENGTH] for i in range(max(1, len(marked) - KGRAM_LENGTH + 1))}
+    for length in range(2, min(KGRAM_LENGTH, len(marked))):
+        grams.update((marked[:length], marked[-length:]))
+    return grams
+
+
+def wildcard_kgrams(pattern: str) -> set[str]:
+    """Returns the k-grams every term matching a wildcard pattern contains. Pieces between two wildcards that
+    are shorter than KGRAM_LENGTH give none; they are left to the post-filter."""
+    pieces = (BOUNDARY + pattern + BOUNDARY).split(WILDCARD)
+    grams = set()
+    for i, piece in enumerate(pieces):
+        if len(piece) >= KGRAM_LENGTH:
+            grams.update(piece[j : j + KGRAM_LENGTH] for j in range(len(piece) - KGRAM_LENGTH + 1))
+        elif len(piece) >= 2 and (i == 0 or i == len(pieces) - 1):
+            grams.add(piece)
+    return grams
+
+
+def wildcard_regex(pattern: str) -> re.Pattern:
+    """Compiles a wildcard pattern, where * stands for any run of characters, into a regex terms must fully
+    match."""
+    return re.compile(".*".join(map(re.escape, pattern.split(WILDCARD))))
+
+
+class KGramIndexWriter(SegmentFileWriter):
+    """Writes the k-gram index of the vocabulary of a segment. Terms must be added in sorted order, the order
+    of the term dictionary; the k-grams are kept in memory until close()."""
+
+    paths = staticmethod(kgram_paths)
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.ordinals = {}
+        self.term_count = 0
+
+    def add(self, term: str, doc_ids, frequencies, cf: int):
+        for gram in term_kgrams(term):
+            self.ordinals.setdefault(gram, []).append(self.term_count)
+        self.term_count += 1
+
+    def close(self):
+        for gram in sorted(self.ordinals):
+            ordinals = self.ordinals[gram]
+            record = _vbyte.encode([len(ordinals)] + [b - a for a, b in zip([0] + ordinals, ordinals)])
+            self.write_record(gram, record, len(ordinals), 0)
+        super().close()
+
+
+class KGramIndex(SegmentFile):
+    """The read-only, memory-mapped k-gram index of a segment."""
+
+    paths = staticmethod(kgram_paths)
+
+    def ordinals(self, gram: str) -> list[int]:
+        """Returns the ordinals of the terms that contain a k-gram, in increasing order."""
+        entry = self.lookup(gram)
+        if entry is None:
+            return []
+        (count,), offset = _vbyte.decode(self.data, entry.postings_offset, 1)
+        gaps, _ = _vbyte.decode(self.data, offset, count)
+        return list(accumulate(gaps))
+
+    def candidates(self, grams) -> Optional[list[int]]:
+        """Returns the ordinals of the terms that contain all the given k-grams, in increasing order, or None if
+        there are no k-grams to narrow the terms down with. The rarest k-gram is decoded first and the others
+        only filter it."""
+        if not grams:
+            return None
+        entries = [self.lookup(gram) for gram in grams]
+        if not all(entries):
+            return []
+        grams = [gram for _, gram in sorted(zip((entry.df for entry in entries), grams))]
+        candidates = self.ordinals(grams[0])
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            ordinals = set(self.ordinals(gram))
+            candidates = [ordinal for ordinal in candidates if ordinal in ordinals]
+        return candidates
@@ -0,0 +1,114 @@
+from typing import Iterable
+import os
+
+
+def live_docs_path(db_path: str) -> str:
+    """Returns the path of the deleted documents bitmap of the index stored in db_path."""
+    return os.path.join(os.path.dirname(db_path), "deletedDocs.bin")
+
+
+def purged_docs_path(live_docs_file_path: str) -> str:
+    """Returns the path of the bitmap of the deleted documents whose postings compaction purged."""
+    return os.path.join(os.path.dirname(live_docs_file_path), "purgedDocs.bin")
+
+
+def _read_bitmap(file_path: str) -> bytearray:
+    try:
+        with open(file_path, "rb") as bitmap_file:
+            return bytearray(bitmap_file.read())
+    except FileNotFoundError:
+        return bytearray()
+
+
+def _write_bitmap(file_path: str, bitmap: bytearray):
+    """Writes a bitmap to a temporary file and swaps it in, so readers never see a partial bitmap."""
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "wb") as bitmap_file:
+        bitmap_file.write(bitmap)
+    os.replace(temp_path, file_path)
+
+
+def _doc_ids(bitmap) -> list[int]:
+    doc_ids = []
+    for byte_index, byte in enumerate(bitmap):
+        if byte:
+            doc_ids.extend(byte_index * 8 + bit for bit in range(8) if byte & (1 << bit))
+    return doc_ids
+
+
+class LiveDocs:
+    """Tells which doc IDs of the index are still live.
+
+    It is stored as a bitmap with one bit per doc ID, set once the document is deleted, so documents
+    appended after the last deletion are live without the file growing. A second bitmap, purgedDocs.bin,
+    marks the deleted documents whose postings compaction has removed, so only the pending deletions, the
+    others, need to be filtered out of postings."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.purged_file_path = purged_docs_path(file_path)
+        self.bitmap = bytearray()
+        self.purged = bytearray()
+        self.deleted_count = 0
+        self.pending_count = 0
+        self.reload()
+
+    def reload(self):
+        """Reads the bitmaps from disk. A missing file means no document was deleted, or purged."""
+        self.bitmap = _read_bitmap(self.file_path)
+        self.purged = _read_bitmap(self.purged_file_path)
+        self._count()
+
+    def _count(self):
+        self.deleted_count = sum(bin(byte).count("1") for byte in self.bitmap)
+        self.pending_count = sum(bin(byte).count("1") for byte in self._pending())
+
+    def _pending(self) -> bytes:
+        """Returns the bitmap of the deleted documents whose postings are not purged yet."""
+        purged = self.purged[: len(self.bitmap)]
+        return bytes(byte & ~purged_byte for byte, purged_byte in zip(self.bitmap, purged)) + bytes(
+            self.bitmap[len(purged) :]
+        )
+
+    def is_live(self, doc_id: int) -> bool:
+        byte_index = doc_id >> 3
+        if byte_index >= len(self.bitmap):
+            return True
+        return not self.bitmap[byte_index] & (1 << (doc_id & 7))
+
+    def delete(self, doc_ids: Iterable[int]) -> list[int]:
+        """Marks the documents as deleted and returns the ones that were live until now."""
+        deleted = []
+        for doc_id in doc_ids:
+            if not self.is_live(doc_id):
+                continue
+            byte_index = doc_id >> 3
+            if byte_index >= len(self.bitmap):
+                self.bitmap.extend(bytes(byte_index + 1 - len(self.bitmap)))
+            self.bitmap[byte_index] |= 1 << (doc_id & 7)
+            deleted.append(doc_id)
+        self.deleted_count += len(deleted)
+        self.pending_count += len(deleted)
+        return deleted
+
+    def deleted_doc_ids(self) -> list[int]:
+        """Returns the deleted doc IDs in increasing order."""
+        return _doc_ids(self.bitmap)
+
+    def pending_doc_ids(self) -> list[int]:
+        """Returns the deleted doc IDs whose postings are not purged yet, in increasing order."""
+        return _doc_ids(self._pending())
+
+    def mark_purged(self, doc_ids: Iterable[int]):
+        """Records that the postings of the documents were purged, and saves the purged bitmap."""
+        for doc_id in doc_ids:
+            byte_index = doc_id >> 3
+            if byte_index >= len(self.purged):
+                self.purged.extend(bytes(byte_index + 1 - len(self.purged)))
+            self.purged[byte_index] |= 1 << (doc_id & 7)
+        _write_bitmap(self.purged_file_path, self.purged)
+        self._count()
+
+    def save(self):
+        """Writes the deleted documents bitmap, swapped in whole so readers never see a partial bitmap."""
+        _write_bitmap(self.file_path, self.bitmap)
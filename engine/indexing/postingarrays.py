@@ -0,0 +1,78 @@
+from .codecs import PostingsCodec
+from .postingscursor import DiskPostingsCursor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: without it, postings are only served as Posting objects
+    np = None
+
+HAS_NUMPY = np is not None
+
+
+def _decode_vbyte(data) -> "np.ndarray":
+    """Decodes a whole variable-byte run at once.
+
+    Every byte with its high bit set ends a value, so each byte's 7 bits are shifted by 7 times its distance to
+    the end of its value and the shifted bits of each value are summed."""
+    data = np.frombuffer(data, dtype=np.uint8)
+    low_bits = (data & 0x7F).astype(np.int64)
+    ends = np.flatnonzero(data >= 0x80)
+    if len(ends) == len(data):
+        return low_bits
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    value_ends = np.repeat(ends, ends - starts + 1)
+    return np.add.reduceat(low_bits << (7 * (value_ends - np.arange(len(data)))), starts)
+
+
+def decode_array(codec: PostingsCodec, data) -> "np.ndarray":
+    """Decodes every value in the run of a streamable codec into an int64 array."""
+    if len(data) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if codec.name == "raw":
+        return np.frombuffer(data, dtype=np.uintc).astype(np.int64)
+    if codec.name == "vbyte":
+        return _decode_vbyte(data)
+    return np.array(codec.decode_all(data), dtype=np.int64)
+
+
+def deleted_mask(live_docs, doc_ids) -> "np.ndarray":
+    """Returns a boolean array telling which of the doc IDs are deleted."""
+    deleted = np.unpackbits(np.frombuffer(bytes(live_docs.bitmap), dtype=np.uint8), bitorder="little")
+    mask = np.zeros(len(doc_ids), dtype=bool)
+    in_bitmap = doc_ids < len(deleted)
+    mask[in_bitmap] = deleted[doc_ids[in_bitmap]].astype(bool)
+    return mask
+
+
+def record_arrays(records, codec: PostingsCodec, live_docs=None) -> tuple["np.ndarray", "np.ndarray"]:
+    """Decodes the records of a term into parallel arrays of doc IDs and term frequencies, without positions.
+
+    The doc gaps of each record start from 0, so a cumulative sum per record gives its doc IDs."""
+    doc_ids = []
+    tfs = []
+    for record in records:
+        if codec.streamable:
+            values = decode_array(codec, record.payload)
+            doc_ids.append(np.cumsum(values[0::2]))
+            tfs.append(values[1::2])
+        else:
+            cursor = DiskPostingsCursor([record], codec)
+            record_doc_ids = []
+            record_tfs = []
+            while cursor.doc_id is not None:
+                record_doc_ids.append(cursor.doc_id)
+                record_tfs.append(cursor.tftd)
+                cursor.next()
+            doc_ids.append(np.array(record_doc_ids, dtype=np.int64))
+            tfs.append(np.array(record_tfs, dtype=np.int64))
+
+    if not doc_ids:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    doc_ids = np.concatenate(doc_ids)
+    tfs = np.concatenate(tfs)
+    if live_docs is not None and live_docs.pending_count:
+        live = ~deleted_mask(live_docs, doc_ids)
+        doc_ids, tfs = doc_ids[live], tfs[live]
+    return doc_ids, tfs
@@ -1,7 +1,9 @@
 class Posting:
     """A Posting encapulates a document ID associated with a search query component."""
 
-    def __init__(self, doc_id: int, positions=None):
+    def __init__(self, doc_id: int, positions=None, tf=None):
+        """tf is the frequency of the term in the document. It defaults to the number of positions, and must be
+        given when the postings were read without their positions."""
         self.doc_id = doc_id
         if positions is None:
             self.positions = []
@@ -9,3 +11,4 @@ class Posting:
             self.positions = [positions]
         else:
             self.positions = positions
+        self.tf = len(self.positions) if tf is None else tf
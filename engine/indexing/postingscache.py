@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from typing import Hashable
+import threading
+
+# Approximate memory taken by a Posting object and by each of its positions
+POSTING_BYTES = 120
+POSITION_BYTES = 36
+
+
+def postings_size(postings) -> int:
+    """Estimates the memory taken by a list of Postings."""
+    return sum(POSTING_BYTES + POSITION_BYTES * len(posting.positions) for posting in postings)
+
+
+class PostingsCache:
+    """A least recently used cache of decoded postings, bounded by an estimate of their size in bytes.
+
+    It is shared by the threads that serve queries, so every operation holds a lock. Values larger than the
+    whole budget are not cached. clear() starts a new generation: a value decoded before it is not cached
+    if it is put after it."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        """Returns the value cached under key and marks it as recently used, or None if it is not cached."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value, size: int, generation=None):
+        """Caches a value of the given size, evicting the least recently used values to stay in budget.
+
+        generation is the generation the value was read in, if the cache may have been cleared since."""
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        """Drops every cached value, e.g. once the index changed. The hit and miss counters are kept."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self.entries)
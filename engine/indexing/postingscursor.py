@@ -0,0 +1,322 @@
+from typing import Optional
+from .postings import Posting
+from .postingsfile import skip_columns
+import bisect
+import heapq
+
+
+def gallop(values, target, lo=0) -> int:
+    """Returns the first index >= lo whose value is >= target, or len(values) if there is none.
+
+    The search probes lo, lo + 1, lo + 3, lo + 7, ... before a binary search, so it costs O(log d) when the
+    answer is d entries away."""
+    step = 1
+    hi = lo
+    while hi < len(values) and values[hi] < target:
+        lo = hi + 1
+        hi += step
+        step *= 2
+    return bisect.bisect_left(values, target, lo, min(hi, len(values)))
+
+
+class PostingsCursor:
+    """Iterates over a postings list in doc ID order without materializing it.
+
+    A cursor starts on its first posting; doc_id is None once it is exhausted. cost is the number of
+    postings, which intersections use to pick the list that drives them."""
+
+    doc_id: Optional[int] = None
+    cost: int = 0
+
+    def next(self) -> Optional[int]:
+        """Moves to the next posting and returns its doc ID, or None once the cursor is exhausted."""
+        raise NotImplementedError
+
+    def advance(self, target: int) -> Optional[int]:
+        """Moves to the first posting whose doc ID is >= target and returns its doc ID, or None if there is none.
+
+        The cursor never moves backwards: if it is already at or past target, it stays where it is."""
+        while self.doc_id is not None and self.doc_id < target:
+            self.next()
+        return self.doc_id
+
+    def posting(self) -> Posting:
+        """Returns the current posting."""
+        raise NotImplementedError
+
+    def positions(self) -> list[int]:
+        """Returns the positions of the current posting, in order."""
+        return self.posting().positions
+
+    def collect(self) -> list[Posting]:
+        """Returns the postings from the current one to the last one, leaving the cursor exhausted."""
+        postings = []
+        while self.doc_id is not None:
+            postings.append(self.posting())
+            self.next()
+        return postings
+
+
+class ListPostingsCursor(PostingsCursor):
+    """A cursor over a postings list that is already in memory, such as the result of a query component."""
+
+    def __init__(self, postings):
+        self.postings = list(postings)
+        self.doc_ids = [posting.doc_id for posting in self.postings]
+        self.cost = len(self.postings)
+        self.index = 0
+        self.doc_id = self.doc_ids[0] if self.doc_ids else None
+
+    def next(self) -> Optional[int]:
+        self.index += 1
+        self.doc_id = self.doc_ids[self.index] if self.index < len(self.doc_ids) else None
+        return self.doc_id
+
+    def advance(self, target: int) -> Optional[int]:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        self.index = gallop(self.doc_ids, target, self.index + 1)
+        self.doc_id = self.doc_ids[self.index] if self.index < len(self.doc_ids) else None
+        return self.doc_id
+
+    def posting(self) -> Posting:
+        return self.postings[self.index]
+
+    def positions(self) -> list[int]:
+        return self.postings[self.index].positions
+
+
+class DocIdsCursor(PostingsCursor):
+    """A cursor over sorted doc IDs without positions or frequencies, such as the doc IDs of a bitmap. Its
+    postings are only created as they are read."""
+
+    def __init__(self, doc_ids):
+        self.doc_ids = doc_ids
+        self.cost = len(doc_ids)
+        self.index = 0
+        self.doc_id = doc_ids[0] if doc_ids else None
+
+    def next(self) -> Optional[int]:
+        self.index += 1
+        self.doc_id = self.doc_ids[self.index] if self.index < len(self.doc_ids) else None
+        return self.doc_id
+
+    def advance(self, target: int) -> Optional[int]:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        self.index = gallop(self.doc_ids, target, self.index + 1)
+        self.doc_id = self.doc_ids[self.index] if self.index < len(self.doc_ids) else None
+        return self.doc_id
+
+    def posting(self) -> Posting:
+        return Posting(self.doc_id)
+
+
+class IntersectionPostingsCursor(PostingsCursor):
+    """A cursor over the documents that all the given cursors hold and none of the excluded cursors do.
+
+    The cursor with the fewest postings drives the intersection: the others advance to its doc IDs, galloping
+    over their skip entries, so a rare term intersected with a common one only decodes the blocks of the common
+    term that can hold a match. Documents must also be in every one of required and in none of excluded, which
+    are sets of doc IDs such as bitmaps. The posting of a document is that of the first cursor."""
+
+    def __init__(self, cursors, excluded_cursors=(), required=(), excluded=()):
+        self.cursors = list(cursors)
+        self.first = cursors[0]
+        self.lead = min(cursors, key=lambda cursor: cursor.cost)
+        self.others = [cursor for cursor in cursors if cursor is not self.lead]
+        self.excluded_cursors = list(excluded_cursors)
+        self.required = list(required)
+        self.excluded = list(excluded)
+        self.cost = self.lead.cost
+        self._align(self.lead.doc_id)
+
+    def _align(self, doc_id: Optional[int]) -> Optional[int]:
+        """Moves to the first match at or after doc_id, where the lead cursor is."""
+        while doc_id is not None:
+            for cursor in self.others:
+                other_doc_id = cursor.advance(doc_id)
+                if other_doc_id is None:
+                    doc_id = None
+                    break
+                if other_doc_id != doc_id:
+                    doc_id = self.lead.advance(other_doc_id)
+                    break
+            else:
+                if self._accepts(doc_id):
+                    break
+                doc_id = self.lead.next()
+        self.doc_id = doc_id
+        return doc_id
+
+    def _accepts(self, doc_id: int) -> bool:
+        """Tells if a document that all the cursors are on is a match."""
+        return (
+            all(doc_id in doc_ids for doc_ids in self.required)
+            and not any(doc_id in doc_ids for doc_ids in self.excluded)
+            and not any(cursor.advance(doc_id) == doc_id for cursor in self.excluded_cursors)
+        )
+
+    def next(self) -> Optional[int]:
+        if self.doc_id is None:
+            return None
+        return self._align(self.lead.next())
+
+    def advance(self, target: int) -> Optional[int]:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        return self._align(self.lead.advance(target))
+
+    def posting(self) -> Posting:
+        return self.first.posting()
+
+    def positions(self) -> list[int]:
+        return self.first.positions()
+
+
+class UnionPostingsCursor(PostingsCursor):
+    """A cursor over the union of several cursors, in doc ID order and without duplicates.
+
+    The cursors are kept in a heap keyed by their doc ID, so each step costs O(log k) for k cursors and only
+    the current posting of each cursor is held in memory. The posting of a document is that of the first
+    cursor, in the given order, that holds it."""
+
+    def __init__(self, cursors):
+        self.cursors = list(cursors)
+        self.cost = sum(cursor.cost for cursor in self.cursors)
+        self.heap = [(cursor.doc_id, i) for i, cursor in enumerate(self.cursors) if cursor.doc_id is not None]
+        heapq.heapify(self.heap)
+        self.doc_id = self.heap[0][0] if self.heap else None
+
+    def _replace_top(self, doc_id: Optional[int]):
+        """Puts the cursor at the top of the heap back in place once it has moved to doc_id."""
+        if doc_id is None:
+            heapq.heappop(self.heap)
+        else:
+            heapq.heapreplace(self.heap, (doc_id, self.heap[0][1]))
+
+    def next(self) -> Optional[int]:
+        heap, cursors, current = self.heap, self.cursors, self.doc_id
+        while heap and heap[0][0] == current:
+            i = heap[0][1]
+            doc_id = cursors[i].next()
+            if doc_id is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (doc_id, i))
+        self.doc_id = heap[0][0] if heap else None
+        return self.doc_id
+
+    def advance(self, target: int) -> Optional[int]:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        while self.heap and self.heap[0][0] < target:
+            self._replace_top(self.cursors[self.heap[0][1]].advance(target))
+        self.doc_id = self.heap[0][0] if self.heap else None
+        return self.doc_id
+
+    def posting(self) -> Posting:
+        return self.cursors[self.heap[0][1]].posting()
+
+    def positions(self) -> list[int]:
+        return self.cursors[self.heap[0][1]].positions()
+
+
+class DiskPostingsCursor(PostingsCursor):
+    """A cursor over the encoded postings records of a term, one per segment, in doc ID order.
+
+    Postings are decoded one at a time from the doc and frequency payload. advance() skips records that end
+    before the target, then gallops over the skip entries of the record to jump to the block that can hold
+    the target, so it only decodes postings of that block. With with_positions, the records must hold their
+    positions; they are only decoded when positions() asks for them. Deleted documents are skipped if
+    live_docs is given."""
+
+    def __init__(self, records, codec, live_docs=None, with_positions=False):
+        self.records = list(records)
+        self.codec = codec
+        self.live_docs = live_docs
+        self.with_positions = with_positions
+        self.cost = sum(record.df for record in self.records)
+        self.tftd = 0
+        self.record_index = -1
+        self._open_record(0)
+        self.next()
+
+    def _open_record(self, record_index) -> bool:
+        """Positions the cursor before the first posting of a record. Returns False if there is none left."""
+        self.record_index = record_index
+        if record_index >= len(self.records):
+            self.payload = b""
+            self.offset = 0
+            return False
+        record = self.records[record_index]
+        self.payload = record.payload
+        self.skip_doc_ids, self.skip_offsets, self.skip_positions_offsets = skip_columns(record.skips)
+        self.skip_index = 0
+        self.offset = 0
+        self.last_doc_id = 0
+        self._seek_positions(0)
+        return True
+
+    def _seek_positions(self, positions_offset):
+        """Sets where the positions of the next decoded posting start."""
+        # Frequencies of the postings decoded since positions_offset, whose positions are skipped lazily
+        self.positions_offset = positions_offset
+        self.pending_frequencies = []
+
+    def next(self) -> Optional[int]:
+        while True:
+            while self.offset >= len(self.payload):
+                if not self._open_record(self.record_index + 1):
+                    self.doc_id = None
+                    return None
+
+            (doc_gap, tftd), self.offset = self.codec.decode(self.payload, self.offset, 2)
+            self.last_doc_id += doc_gap
+            self.tftd = tftd
+            if self.with_positions:
+                self.pending_frequencies.append(tftd)
+            if self.live_docs is None or self.live_docs.is_live(self.last_doc_id):
+                self.doc_id = self.last_doc_id
+                return self.doc_id
+
+    def advance(self, target: int) -> Optional[int]:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+
+        # Skip the records of segments that end before the target
+        while self.records[self.record_index].last_doc_id < target:
+            if not self._open_record(self.record_index + 1):
+                self.doc_id = None
+                return None
+
+        # Jump to the start of the block that holds the target, unless the cursor is already in it
+        self.skip_index = gallop(self.skip_doc_ids, target, self.skip_index)
+        if self.skip_index > 0 and self.skip_offsets[self.skip_index - 1] > self.offset:
+            self.offset = self.skip_offsets[self.skip_index - 1]
+            self.last_doc_id = self.skip_doc_ids[self.skip_index - 1]
+            self._seek_positions(self.skip_positions_offsets[self.skip_index - 1])
+
+        while self.next() is not None and self.doc_id < target:
+            pass
+        return self.doc_id
+
+    def positions(self) -> list[int]:
+        """Decodes the positions of the current posting."""
+        positions_data = self.records[self.record_index].positions
+        for frequency in self.pending_frequencies[:-1]:
+            self.positions_offset = self.codec.skip(positions_data, self.positions_offset, frequency)
+        del self.pending_frequencies[:-1]
+
+        position_gaps, _ = self.codec.decode(positions_data, self.positions_offset, self.tftd)
+        positions = []
+        last_position = 0
+        for position_gap in position_gaps:
+            last_position += position_gap
+            positions.append(last_position)
+        return positions
+
+    def posting(self) -> Posting:
+        if self.with_positions:
+            return Posting(self.doc_id, self.positions(), self.tftd)
+        return Posting(self.doc_id, 0, self.tftd)
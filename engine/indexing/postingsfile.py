@@ -0,0 +1,236 @@
+from typing import NamedTuple, Optional
+import struct
+
+# Postings are stored in two files listing the terms in the same order. The postings file holds, per term,
+# <term length><term><df><cf><last doc id><skip count><payload length><positions length><skips><payload>
+# where cf is the collection frequency (the sum of the term frequencies) and the payload holds the doc gaps
+# and term frequencies. The positions file holds the position gaps of each posting, back to back. Boolean
+# and ranked queries only read the postings file.
+TERM_LENGTH = struct.Struct("I")
+RECORD_HEADER = struct.Struct("IIIIII")
+
+# A skip entry <last doc id><payload offset><positions offset> closes every SKIP_INTERVAL postings, so
+# readers can jump over whole blocks. Decoding resumes at the offsets with the entry's doc ID as the gap base.
+SKIP_ENTRY = struct.Struct("III")
+SKIP_INTERVAL = 128
+
+# Size of the block reads used when streaming records from a file
+BLOCK_SIZE = 1 << 20
+
+
+class PostingsRecord(NamedTuple):
+    """The postings of one term as stored on disk, with the payload and the positions still encoded.
+
+    positions is empty when the record was read without them."""
+
+    term: str
+    df: int
+    cf: int
+    last_doc_id: int
+    skips: bytes
+    payload: bytes
+    positions: bytes
+
+    def skip_entries(self) -> tuple[list[int], list[int], list[int]]:
+        """Returns the last doc IDs, the payload offsets and the positions offsets of the skip entries."""
+        return unpack_skips(self.skips)
+
+
+class RecordBuilder:
+    """Encodes the postings of one term, added in doc ID order, into a PostingsRecord."""
+
+    def __init__(self, term: str, codec):
+        self.term = term
+        self.codec = codec
+        self.payload = bytearray()
+        self.positions = bytearray()
+        self.skips = bytearray()
+        self.df = 0
+        self.cf = 0
+        self.last_doc_id = 0
+
+    def add(self, doc_id: int, positions):
+        """Appends a posting with its positions, in increasing order."""
+        # Close a skip block every SKIP_INTERVAL postings
+        if self.df and self.df % SKIP_INTERVAL == 0:
+            self.skips += SKIP_ENTRY.pack(self.last_doc_id, len(self.payload), len(self.positions))
+
+        # Encode the document gap and the term frequency in the document
+        self.payload += self.codec.encode((doc_id - self.last_doc_id, len(positions)))
+        self.last_doc_id = doc_id
+        self.df += 1
+        self.cf += len(positions)
+
+        position_gaps = []
+        last_position = 0
+        for position in positions:
+            position_gaps.append(position - last_position)
+            last_position = position
+        self.positions += self.codec.encode(position_gaps)
+
+    def record(self) -> PostingsRecord:
+        return PostingsRecord(
+            self.term,
+            self.df,
+            self.cf,
+            self.last_doc_id,
+            bytes(self.skips),
+            bytes(self.payload),
+            bytes(self.positions),
+        )
+
+
+def encode_record(record: PostingsRecord) -> bytes:
+    """Lays out the part of a term record that goes to the postings file."""
+    term_bytes = record.term.encode("latin-1")
+    return (
+        TERM_LENGTH.pack(len(term_bytes))
+        + term_bytes
+        + RECORD_HEADER.pack(
+            record.df,
+            record.cf,
+            record.last_doc_id,
+            len(record.skips) // SKIP_ENTRY.size,
+            len(record.payload),
+            len(record.positions),
+        )
+        + record.skips
+        + record.payload
+    )
+
+
+def pack_skips(doc_ids, offsets, positions_offsets) -> bytes:
+    """Packs skip entries from their last doc IDs, payload offsets and positions offsets."""
+    skips = bytearray()
+    for entry in zip(doc_ids, offsets, positions_offsets):
+        skips += SKIP_ENTRY.pack(*entry)
+    return bytes(skips)
+
+
+def unpack_skips(skips) -> tuple[list[int], list[int], list[int]]:
+    """Splits packed skip entries into their last doc IDs, payload offsets and positions offsets."""
+    doc_ids = []
+    offsets = []
+    positions_offsets = []
+    for doc_id, offset, positions_offset in SKIP_ENTRY.iter_unpack(skips):
+        doc_ids.append(doc_id)
+        offsets.append(offset)
+        positions_offsets.append(positions_offset)
+    return doc_ids, offsets, positions_offsets
+
+
+def skip_columns(skips):
+    """Returns the last doc IDs, the payload offsets and the positions offsets of packed skip entries as views
+    of skips, so reading a record's skip entries does not copy them into lists."""
+    if not skips:
+        return (), (), ()
+    entries = memoryview(skips).cast("I")
+    return entries[0::3], entries[1::3], entries[2::3]
+
+
+def parse_record(data, offset=0, positions=b"") -> PostingsRecord:
+    """Parses the term record that starts at the given offset of data, given its positions if they were read.
+
+    The skips and the payload are slices of data, so they do not copy it when data is a memoryview."""
+    term_length = TERM_LENGTH.unpack_from(data, offset)[0]
+    term_start = offset + TERM_LENGTH.size
+    term = bytes(data[term_start : term_start + term_length]).decode("latin-1")
+    df, cf, last_doc_id, skip_count, payload_length, _ = RECORD_HEADER.unpack_from(data, term_start + term_length)
+    skips_start = term_start + term_length + RECORD_HEADER.size
+    payload_start = skips_start + skip_count * SKIP_ENTRY.size
+    return PostingsRecord(
+        term,
+        df,
+        cf,
+        last_doc_id,
+        data[skips_start:payload_start],
+        data[payload_start : payload_start + payload_length],
+        positions,
+    )
+
+
+class _BlockReader:
+    """Reads a file sequentially in large blocks."""
+
+    def __init__(self, file_path, block_size):
+        self.stream = open(file_path, "rb")
+        self.block_size = block_size
+        self.buffer = b""
+        self.offset = 0
+
+    def _fill(self, size: int) -> bool:
+        """Makes sure at least size unread bytes are buffered. Returns False if the file ends first."""
+        available = len(self.buffer) - self.offset
+        if available >= size:
+            return True
+        chunk = self.stream.read(max(self.block_size, size - available))
+        self.buffer = self.buffer[self.offset :] + chunk
+        self.offset = 0
+        return len(self.buffer) >= size
+
+    def read(self, size: int) -> Optional[bytes]:
+        """Returns the next size bytes, or None if the file ends first."""
+        if not self._fill(size):
+            return None
+        data = self.buffer[self.offset : self.offset + size]
+        self.offset += size
+        return data
+
+    def close(self):
+        self.stream.close()
+
+
+class RecordReader:
+    """Streams the term records of a sorted postings file and its positions file, reading them in large blocks."""
+
+    def __init__(self, file_path, positions_file_path, block_size=BLOCK_SIZE):
+        self.postings = _BlockReader(file_path, block_size)
+        self.positions = _BlockReader(positions_file_path, block_size)
+
+    def read_record(self) -> Optional[PostingsRecord]:
+        """Returns the next record in the files, or None once they are exhausted."""
+        term_length_data = self.postings.read(TERM_LENGTH.size)
+        if term_length_data is None:
+            return None
+        term_length = TERM_LENGTH.unpack(term_length_data)[0]
+        head = self.postings.read(term_length + RECORD_HEADER.size)
+        if head is None:
+            return None
+
+        term = head[:term_length].decode("latin-1")
+        df, cf, last_doc_id, skip_count, payload_length, positions_length = RECORD_HEADER.unpack_from(head, term_length)
+        skips = self.postings.read(skip_count * SKIP_ENTRY.size)
+        payload = self.postings.read(payload_length)
+        positions = self.positions.read(positions_length)
+        if skips is None or payload is None or positions is None:
+            return None
+        return PostingsRecord(term, df, cf, last_doc_id, skips, payload, positions)
+
+    def close(self):
+        self.postings.close()
+        self.positions.close()
+
+
+class RecordWriter:
+    """Writes term records to a postings file and its positions file."""
+
+    def __init__(self, file_path, positions_file_path):
+        self.postings = open(file_path, "wb")
+        self.positions = open(positions_file_path, "wb")
+
+    def write_record(self, record: PostingsRecord) -> tuple[int, int]:
+        """Appends a record and returns its offsets in the postings file and in the positions file."""
+        offsets = self.postings.tell(), self.positions.tell()
+        self.postings.write(encode_record(record))
+        self.positions.write(record.positions)
+        return offsets
+
+    def close(self):
+        self.postings.close()
+        self.positions.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,193 @@
+from array import array
+from typing import Iterable, Iterator, Optional
+import bisect
+import struct
+
+# A RoaringBitmap splits doc IDs into chunks of 2^16 by their high bits. A chunk with at most
+# ARRAY_MAX_CARDINALITY doc IDs is an array container, the sorted low 16 bits of its doc IDs; a denser chunk is
+# a bitmap container, a 65536-bit integer whose bit i is set if the chunk holds doc ID (key << 16) + i, so AND,
+# OR and ANDNOT of two bitmap containers are word-level integer operations.
+#
+# Serialized, a bitmap is <container count>, then <key><cardinality> per container, then the containers in
+# key order: the native unsigned shorts of an array container, or the BITMAP_BYTES little-endian bytes of a
+# bitmap container. The cardinality tells which of the two a container is.
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+ARRAY_MAX_CARDINALITY = 4096
+BITMAP_BYTES = (1 << CHUNK_BITS) // 8
+HEADER = struct.Struct("I")
+CONTAINER_HEADER = struct.Struct("II")
+
+# The set bits of each byte value
+_BYTE_BITS = [tuple(bit for bit in range(8) if value & (1 << bit)) for value in range(256)]
+
+
+def _to_bitmap(values) -> int:
+    bits = bytearray(BITMAP_BYTES)
+    for value in values:
+        bits[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _to_array(bitmap: int) -> array:
+    values = array("H")
+    for byte_index, byte in enumerate(bitmap.to_bytes(BITMAP_BYTES, "little")):
+        if byte:
+            base = byte_index << 3
+            values.extend([base + bit for bit in _BYTE_BITS[byte]])
+    return values
+
+
+def _filter(values: array, bitmap: int, keep: bool) -> array:
+    """Returns the values whose bit in bitmap is set if keep is True, or clear if it is False."""
+    bits = bitmap.to_bytes(BITMAP_BYTES, "little")
+    return array("H", [value for value in values if bool(bits[value >> 3] >> (value & 7) & 1) == keep])
+
+
+def _normalize(container):
+    """Returns the container in its smaller form, or None if it is empty."""
+    if isinstance(container, int):
+        cardinality = bin(container).count("1")
+        if cardinality > ARRAY_MAX_CARDINALITY:
+            return container
+        return _to_array(container) if cardinality else None
+    if len(container) > ARRAY_MAX_CARDINALITY:
+        return _to_bitmap(container)
+    return container if container else None
+
+
+def _and(first, second):
+    if isinstance(first, int) and isinstance(second, int):
+        return _normalize(first & second)
+    if isinstance(first, int):
+        return _normalize(_filter(second, first, True))
+    if isinstance(second, int):
+        return _normalize(_filter(first, second, True))
+    return _normalize(array("H", sorted(set(first).intersection(second))))
+
+
+def _or(first, second):
+    if isinstance(first, int) or isinstance(second, int):
+        first = first if isinstance(first, int) else _to_bitmap(first)
+        second = second if isinstance(second, int) else _to_bitmap(second)
+        return first | second
+    return _normalize(array("H", sorted(set(first).union(second))))
+
+
+def _and_not(first, second):
+    if isinstance(first, int):
+        return _normalize(first & ~(second if isinstance(second, int) else _to_bitmap(second)))
+    if isinstance(second, int):
+        return _normalize(_filter(first, second, False))
+    return _normalize(array("H", sorted(set(first).difference(second))))
+
+
+class RoaringBitmap:
+    """A compressed set of doc IDs, with AND (&), OR (|) and ANDNOT (-) between bitmaps."""
+
+    def __init__(self, containers: Optional[dict] = None):
+        # High bits of the doc IDs -> array or bitmap container, never empty
+        self.containers = containers if containers is not None else {}
+
+    @classmethod
+    def from_sorted(cls, doc_ids: Iterable[int]) -> "RoaringBitmap":
+        """Builds a bitmap from doc IDs in increasing order."""
+        chunks = {}
+        for doc_id in doc_ids:
+            chunks.setdefault(doc_id >> CHUNK_BITS, array("H")).append(doc_id & CHUNK_MASK)
+        return cls({key: _normalize(values) for key, values in chunks.items()})
+
+    @classmethod
+    def from_range(cls, start: int, stop: int) -> "RoaringBitmap":
+        """Builds the bitmap of the doc IDs from start to stop - 1."""
+        containers = {}
+        for key in range(start >> CHUNK_BITS, ((stop - 1) >> CHUNK_BITS) + 1 if stop > start else 0):
+            low = max(start, key << CHUNK_BITS) & CHUNK_MASK
+            high = min(stop, (key + 1) << CHUNK_BITS) - (key << CHUNK_BITS)
+            containers[key] = _normalize(((1 << high) - 1) & ~((1 << low) - 1))
+        return cls(containers)
+
+    def __len__(self) -> int:
+        return sum(
+            bin(container).count("1") if isinstance(container, int) else len(container)
+            for container in self.containers.values()
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.containers)
+
+    def __iter__(self) -> Iterator[int]:
+        for key in sorted(self.containers):
+            container = self.containers[key]
+            base = key << CHUNK_BITS
+            for value in _to_array(container) if isinstance(container, int) else container:
+                yield base + value
+
+    def __contains__(self, doc_id: int) -> bool:
+        container = self.containers.get(doc_id >> CHUNK_BITS)
+        if container is None:
+            return False
+        value = doc_id & CHUNK_MASK
+        if isinstance(container, int):
+            return bool(container >> value & 1)
+        index = bisect.bisect_left(container, value)
+        return index < len(container) and container[index] == value
+
+    def _combine(self, keys, operation) -> "RoaringBitmap":
+        containers = {}
+        for key in keys:
+            container = operation(self.containers.get(key), key)
+            if container is not None:
+                containers[key] = container
+        return RoaringBitmap(containers)
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        keys = self.containers.keys() & other.containers.keys()
+        return self._combine(keys, lambda container, key: _and(container, other.containers[key]))
+
+    def __or__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        def union(container, key):
+            other_container = other.containers.get(key)
+            if container is None or other_container is None:
+                return container if other_container is None else other_container
+            return _or(container, other_container)
+
+        return self._combine(self.containers.keys() | other.containers.keys(), union)
+
+    def __sub__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        def difference(container, key):
+            other_container = other.containers.get(key)
+            return container if other_container is None else _and_not(container, other_container)
+
+        return self._combine(self.containers.keys(), difference)
+
+    def to_bytes(self) -> bytes:
+        keys = sorted(self.containers)
+        parts = [HEADER.pack(len(keys))]
+        for key in keys:
+            container = self.containers[key]
+            cardinality = bin(container).count("1") if isinstance(container, int) else len(container)
+            parts.append(CONTAINER_HEADER.pack(key, cardinality))
+        for key in keys:
+            container = self.containers[key]
+            parts.append(container.to_bytes(BITMAP_BYTES, "little") if isinstance(container, int) else container.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, offset: int = 0) -> "RoaringBitmap":
+        """Reads a bitmap written by to_bytes from data, starting at offset."""
+        (count,) = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+        headers = [CONTAINER_HEADER.unpack_from(data, offset + i * CONTAINER_HEADER.size) for i in range(count)]
+        offset += count * CONTAINER_HEADER.size
+        containers = {}
+        for key, cardinality in headers:
+            if cardinality > ARRAY_MAX_CARDINALITY:
+                containers[key] = int.from_bytes(data[offset : offset + BITMAP_BYTES], "little")
+                offset += BITMAP_BYTES
+            else:
+                values = array("H")
+                values.frombytes(data[offset : offset + 2 * cardinality])
+                containers[key] = values
+                offset += 2 * cardinality
+        return cls(containers)
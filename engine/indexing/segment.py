@@ -0,0 +1,100 @@
+from .bitmapindex import BitmapIndex
+from .championlists import ChampionLists
+from .documentstore import DocumentStore
+from .impactindex import ImpactBlock, ImpactIndex
+from .kgramindex import KGramIndex
+from .postingsfile import RECORD_HEADER, TERM_LENGTH, PostingsRecord, parse_record
+from .segmentfile import map_file
+from .termdictionary import TermDictionary
+from typing import Optional
+import os
+
+
+class Segment:
+    """A part of the on-disk index covering a consecutive range of doc IDs.
+
+    A segment has its own postings.bin, which stores absolute doc IDs, its own positions.bin and its own
+    docStats.bin, which holds the weights and lengths of documents first_doc_id to first_doc_id + doc_count - 1
+    in doc ID order. Its terms.bin maps each term to its offsets in postings.bin and positions.bin, and its
+    documents.bin holds the titles and paths of its documents for rendering results. If the index was built with
+    impact-ordered postings, impacts.bin and impactTerms.bin hold them, and likewise champions.bin and
+    championTerms.bin hold its champion lists, and bitmaps.bin and bitmapTerms.bin the doc ID bitmaps of its
+    frequent terms. kgrams.bin and kgramTerms.bin index the k-grams of its terms for wildcard queries; segments
+    written before they existed have none."""
+
+    def __init__(self, segment_id, directory, first_doc_id, doc_count):
+        self.segment_id = segment_id
+        self.directory = directory
+        self.first_doc_id = first_doc_id
+        self.doc_count = doc_count
+        self.postings_file_path = os.path.join(directory, "postings.bin")
+        self.positions_file_path = os.path.join(directory, "positions.bin")
+        self.doc_stats_file_path = os.path.join(directory, "docStats.bin")
+        self.dictionary = TermDictionary(os.path.join(directory, "terms.bin"))
+        self.documents = DocumentStore(os.path.join(directory, "documents.bin"))
+        self.impacts = ImpactIndex(directory) if ImpactIndex.exists(directory) else None
+        self.champions = ChampionLists(directory) if ChampionLists.exists(directory) else None
+        self.bitmaps = BitmapIndex(directory) if BitmapIndex.exists(directory) else None
+        self.kgrams = KGramIndex(directory) if KGramIndex.exists(directory) else None
+        self.postings = map_file(self.postings_file_path)
+        self.positions = map_file(self.positions_file_path)
+
+    def contains(self, doc_id: int) -> bool:
+        """Returns True if the document belongs to this segment."""
+        return self.first_doc_id <= doc_id < self.first_doc_id + self.doc_count
+
+    def read_postings_record(self, term: str, with_positions=False) -> Optional[PostingsRecord]:
+        """Returns the record of a term, with its skip entries and encoded postings. Returns None for unknown terms.
+
+        The record's skips, payload and positions are views of the mapped files, so nothing is read or copied
+        until they are decoded. The positions are only included if with_positions is True."""
+        entry = self.dictionary.lookup(term)
+        if entry is None:
+            return None
+
+        positions = b""
+        if with_positions:
+            term_length = TERM_LENGTH.unpack_from(self.postings, entry.postings_offset)[0]
+            header_offset = entry.postings_offset + TERM_LENGTH.size + term_length
+            positions_length = RECORD_HEADER.unpack_from(self.postings, header_offset)[5]
+            positions = self.positions[entry.positions_offset : entry.positions_offset + positions_length]
+        return parse_record(self.postings, entry.postings_offset, positions)
+
+    def read_doc_stats(self):
+        """Maps docStats.bin and returns it as a flat array of doubles, alternating L_d and doc length."""
+        stats = map_file(self.doc_stats_file_path)
+        return stats.cast("d") if stats else memoryview(b"").cast("d")
+
+    def read_doc_weights(self) -> dict[int, float]:
+        """Loads the document weights (Euclidean lengths) of the segment's documents."""
+        weights = self.read_doc_stats()[0::2]
+        return {self.first_doc_id + i: L_d for i, L_d in enumerate(weights)}
+
+    def read_impact_blocks(self, term: str, use_okapi: bool) -> list[ImpactBlock]:
+        """Returns the Okapi or tf-idf impact blocks of a term, highest impact first."""
+        return self.impacts.blocks(term, use_okapi)
+
+    def document_title(self, doc_id: int) -> Optional[str]:
+        """Returns the title of one of the segment's documents."""
+        return self.documents.title(doc_id - self.first_doc_id)
+
+    def document_path(self, doc_id: int) -> Optional[str]:
+        """Returns the file path of one of the segment's documents, empty if it was not read from its own file."""
+        return self.documents.path(doc_id - self.first_doc_id)
+
+    def close(self):
+        """Releases the term dictionary, the document store and the mapped files.
+
+        The maps are dropped rather than closed: records that cursors still hold keep them alive until they
+        are done, so a reader racing a reload never sees a closed map."""
+        self.dictionary.close()
+        self.documents.close()
+        if self.impacts:
+            self.impacts.close()
+        if self.champions:
+            self.champions.close()
+        if self.bitmaps:
+            self.bitmaps.close()
+        if self.kgrams:
+            self.kgrams.close()
+        self.postings = self.positions = b""
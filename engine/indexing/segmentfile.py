@@ -0,0 +1,67 @@
+from .termdictionary import TermDictionary, TermDictionaryWriter, TermEntry
+from typing import Optional
+import mmap
+import os
+
+# Besides postings.bin and positions.bin, a segment can hold optional structures that map terms (or k-grams) to
+# records in a data file of their own, through a term dictionary whose postings offsets point at the records.
+# SegmentFileWriter and SegmentFile handle the opening, mapping and closing of such a pair of files, so each
+# structure only encodes and decodes its records.
+
+
+def map_file(file_path):
+    """Maps a file read-only and returns a memoryview of it, or empty bytes if the file is empty."""
+    with open(file_path, "rb") as mapped_file:
+        if os.fstat(mapped_file.fileno()).st_size == 0:
+            return b""
+        return memoryview(mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class SegmentFileWriter:
+    """Writes the records of a data file and the term dictionary that points at them. Terms must be added in
+    sorted order. paths maps a segment directory to the paths of the data file and of the dictionary."""
+
+    paths = None
+
+    def __init__(self, directory):
+        data_path, dictionary_path = self.paths(directory)
+        self.stream = open(data_path, "wb")
+        self.dictionary = TermDictionaryWriter(dictionary_path)
+
+    def write_record(self, term: str, record: bytes, df: int, cf: int):
+        self.dictionary.add(term, TermEntry(self.stream.tell(), 0, df, cf))
+        self.stream.write(record)
+
+    def close(self):
+        self.stream.close()
+        self.dictionary.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SegmentFile:
+    """A read-only term dictionary with the memory-mapped data file it points into. paths maps a segment
+    directory to the paths of the data file and of the dictionary."""
+
+    paths = None
+
+    def __init__(self, directory):
+        data_path, dictionary_path = self.paths(directory)
+        self.dictionary = TermDictionary(dictionary_path)
+        self.data = map_file(data_path)
+
+    @classmethod
+    def exists(cls, directory) -> bool:
+        return all(os.path.exists(path) for path in cls.paths(directory))
+
+    def lookup(self, term: str) -> Optional[TermEntry]:
+        return self.dictionary.lookup(term)
+
+    def close(self):
+        """Closes the dictionary and drops the data map, like Segment.close, for records still being decoded."""
+        self.dictionary.close()
+        self.data = b""
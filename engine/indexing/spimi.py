@@ -1,31 +1,107 @@
-from engine.indexing import PositionalInvertedIndex
 from engine.text import Preprocessing
-from config import WEIGHTS_DIR, BUCKET_DIR, DB_PATH, POSTINGS_DIR
-import struct
+from config import (
+    BITMAP_MIN_DF,
+    BUCKET_DIR,
+    BUILD_IMPACT_INDEX,
+    CHAMPION_LIST_SIZE,
+    DB_PATH,
+    SEGMENTS_DIR,
+    INDEX_BATCH_SIZE,
+    POSTINGS_CODEC,
+    SPIMI_MEMORY_BUDGET,
+)
+from .bitmapindex import BitmapIndexWriter
+from .championlists import ChampionListWriter
+from .codecs import get_codec
+from .docstats import pack_doc_stats
+from .documentstore import DocumentStore, DocumentStoreWriter
+from .impactindex import ImpactIndexWriter
+from .inversionbuffer import InversionBuffer
+from .kgramindex import KGramIndexWriter
+from .livedocs import LiveDocs, live_docs_path, purged_docs_path
+from .postingsfile import PostingsRecord, RecordBuilder, RecordReader, RecordWriter, pack_skips
+from .termdictionary import TermDictionaryWriter, TermEntry
+from array import array
+from collections import deque
+from contextlib import ExitStack
+from itertools import accumulate
+from typing import Iterable, Optional
+import bisect
+import copy
+import multiprocessing
+import threading
+import shutil
 import sqlite3
 import math
 import os
 import heapq
 
+# Per-process preprocessing pipeline, created once by each pool worker.
+_worker_preprocessing = None
+
 class Posting:
     def __init__(self, term, file_index, postings_data):
         self.term = term
         self.file_index = file_index
         self.postings_data = postings_data
     def __lt__(self, other):
-        return self.term < other.term
+        return (self.term, self.file_index) < (other.term, other.file_index)
 
 
 class SPIMI:
-    def __init__(self, corpus):
-        """Initialize the DiskIndexWriter with the specified database path and in-memory index."""
+    def __init__(
+        self,
+        corpus,
+        codec_name=POSTINGS_CODEC,
+        memory_budget=SPIMI_MEMORY_BUDGET,
+        impact_index=BUILD_IMPACT_INDEX,
+        champion_list_size=CHAMPION_LIST_SIZE,
+        bitmap_min_df=BITMAP_MIN_DF,
+    ):
+        """Initialize the DiskIndexWriter with the specified database path and in-memory index.
+
+        With impact_index, every segment also gets impact-ordered postings for score-at-a-time ranking, and
+        with a champion_list_size above 0, champion lists of that many documents for its frequent terms. With a
+        bitmap_min_df above 0, the terms of a segment in at least that many of its documents also get a doc ID
+        bitmap. Like the codec, these choices are made by the full build and kept by appends and compactions."""
         os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        self.db_conn = sqlite3.connect(DB_PATH)
+        self.db_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
         self.db_cursor = self.db_conn.cursor()
+        self._create_tables()
+
+        os.makedirs(BUCKET_DIR, exist_ok=True)
+        self._preprocessing = None
+        self.buffer = InversionBuffer()
+        self.memory_budget = memory_budget
+        self.codec_name = codec_name
+        self.codec = get_codec(codec_name)
+        self.impact_index = impact_index
+        self.champion_list_size = champion_list_size
+        self.bitmap_min_df = bitmap_min_df
+        self.corpus = corpus
+        self.segment_id = None
+        self.segment_dir = None
+        self.bucket_paths = []
+        self.file_counter = 0
+        self.uniq_terms = 0
+        self.purged_doc_ids = []
+
+    @property
+    def preprocessing(self) -> Preprocessing:
+        """The preprocessing pipeline, loaded when documents are first inverted, so deleting documents or
+        compacting segments does not load it."""
+        if self._preprocessing is None:
+            self._preprocessing = Preprocessing()
+        return self._preprocessing
+
+    def _create_tables(self):
+        """Creates the index tables that do not exist yet."""
         self.db_cursor.execute('''
-            CREATE TABLE IF NOT EXISTS term_positions (
-                term TEXT PRIMARY KEY,
-                position INTEGER
+            CREATE TABLE IF NOT EXISTS segments (
+                segment_id INTEGER PRIMARY KEY,
+                directory TEXT,
+                first_doc_id INTEGER,
+                doc_count INTEGER
             )''')
         self.db_cursor.execute('''
             CREATE TABLE IF NOT EXISTS document_metadata (
@@ -38,177 +114,459 @@ class SPIMI:
                 stat_name TEXT PRIMARY KEY,
                 value INTEGER
             )''')
+        self.db_cursor.execute('''
+            CREATE TABLE IF NOT EXISTS index_settings (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            )''')
         self.db_conn.commit()
 
-        os.makedirs(BUCKET_DIR, exist_ok=True)
-        self.preprocessing = Preprocessing()
-        self.p_i_index = PositionalInvertedIndex()
-        self.corpus = corpus
-        self.in_memory_index = {}
-        self.file_counter = 0
-        self.uniq_terms = 0
+    def _reset_index(self):
+        """Drops the tables and segments of a previous index before a full rebuild."""
+        # term_positions held the term offsets before segments had their own terms.bin
+        for table in ("segments", "term_positions", "document_metadata", "corpus_stats", "index_settings"):
+            self.db_cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        self._create_tables()
+        shutil.rmtree(SEGMENTS_DIR, ignore_errors=True)
+        for file_path in (live_docs_path(DB_PATH), purged_docs_path(live_docs_path(DB_PATH))):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        # Record the postings codec so readers decode the postings files the same way they were written
+        self.codec = get_codec(self.codec_name)
+        self.db_cursor.execute('REPLACE INTO index_settings (name, value) VALUES ("codec", ?)', (self.codec.name,))
+        self.db_cursor.execute(
+            'REPLACE INTO index_settings (name, value) VALUES ("impact_index", ?)', (int(self.impact_index),)
+        )
+        self.db_cursor.execute(
+            'REPLACE INTO index_settings (name, value) VALUES ("champion_list_size", ?)', (self.champion_list_size,)
+        )
+        self.db_cursor.execute(
+            'REPLACE INTO index_settings (name, value) VALUES ("bitmap_min_df", ?)', (self.bitmap_min_df,)
+        )
+        self.db_conn.commit()
+
+    def _index_codec(self):
+        """Returns the codec of the existing index, which new segments must share."""
+        self.db_cursor.execute('SELECT value FROM index_settings WHERE name = "codec"')
+        result = self.db_cursor.fetchone()
+        return get_codec(result[0]) if result else self.codec
+
+    def _index_impact_setting(self) -> bool:
+        """Returns True if the existing index has impact-ordered postings, which new segments must have too."""
+        self.db_cursor.execute('SELECT value FROM index_settings WHERE name = "impact_index"')
+        result = self.db_cursor.fetchone()
+        return bool(int(result[0])) if result else self.impact_index
+
+    def _index_champion_list_size(self) -> int:
+        """Returns the champion list size of the existing index, which new segments must share."""
+        self.db_cursor.execute('SELECT value FROM index_settings WHERE name = "champion_list_size"')
+        result = self.db_cursor.fetchone()
+        return int(result[0]) if result else self.champion_list_size
+
+    def _index_bitmap_min_df(self) -> int:
+        """Returns the bitmap df threshold of the existing index, which new segments must share."""
+        self.db_cursor.execute('SELECT value FROM index_settings WHERE name = "bitmap_min_df"')
+        result = self.db_cursor.fetchone()
+        return int(result[0]) if result else self.bitmap_min_df
 
     def batch_insert_document_metadata(self, documents):
         # 'documents' is now a list of tuples (doc_id, title, doc_length)
         self.db_cursor.executemany('INSERT INTO document_metadata (doc_id, title, doc_length) VALUES (?, ?, ?)', documents)
         self.db_conn.commit()
 
-    def spimi_index(self, progress_callback=None):
-        """Creates the positional inverted index using SPIMI."""
+    def spimi_index(self, progress_callback=None, num_workers=1):
+        """Creates the positional inverted index using SPIMI, replacing any existing index with one segment.
+
+        With num_workers > 1 the documents are inverted by a process pool, see parallel_spimi_index.
+        """
+        self._reset_index()
+        self._start_segment()
+        if num_workers > 1:
+            return self.parallel_spimi_index(progress_callback, num_workers)
+
         print("SPIMI indexing...")
-        total_memory = 0
+        self._index_documents(self.corpus.load_documents_generator(), progress_callback)
+        print("SPIMI indexing completed.")
+
+    def append_documents(self, documents, progress_callback=None) -> int:
+        """Indexes new documents into a new segment, leaving the existing segments untouched.
+
+        The documents are numbered after the last indexed document, so the cost depends only on the new
+        documents. Returns the number of documents added.
+        """
+        self.codec = self._index_codec()
+        self.impact_index = self._index_impact_setting()
+        self.champion_list_size = self._index_champion_list_size()
+        self.bitmap_min_df = self._index_bitmap_min_df()
+        # Deleted documents keep their IDs, so numbering continues after the last segment
+        self.db_cursor.execute('SELECT COALESCE(MAX(first_doc_id + doc_count), 0) FROM segments')
+        next_doc_id = self.db_cursor.fetchone()[0]
+
+        def numbered_documents():
+            for offset, document in enumerate(documents):
+                document.id = next_doc_id + offset
+                yield document
+
+        self._start_segment()
+        return self._index_documents(numbered_documents(), progress_callback)
+
+    def delete_documents(self, doc_ids) -> int:
+        """Marks documents as deleted in the live docs bitmap. Returns the number of documents deleted.
+
+        Their metadata rows and tokens are removed from the corpus stats right away, so the document count
+        and the average document length only cover live documents. Their postings stay on disk, filtered out
+        by DiskPositionalIndex, until the next compaction purges them.
+        """
+        doc_lengths = {}
+        for doc_id in set(doc_ids):
+            self.db_cursor.execute('SELECT doc_length FROM document_metadata WHERE doc_id = ?', (doc_id,))
+            result = self.db_cursor.fetchone()
+            if result:
+                doc_lengths[doc_id] = result[0]
+
+        live_docs = LiveDocs(live_docs_path(DB_PATH))
+        deleted = live_docs.delete(sorted(doc_lengths))
+        if not deleted:
+            return 0
+
+        self.db_cursor.executemany('DELETE FROM document_metadata WHERE doc_id = ?', [(doc_id,) for doc_id in deleted])
+        self._add_total_tokens(-sum(doc_lengths[doc_id] for doc_id in deleted))
+        live_docs.save()
+        return len(deleted)
+
+    def update_document(self, doc_id, document) -> int:
+        """Replaces a document with a new version. Returns the doc ID the new version was indexed under."""
+        self.delete_documents([doc_id])
+        self.append_documents([document])
+        return document.id
+
+    def _index_documents(self, documents, progress_callback=None) -> int:
+        """Inverts the documents into the current segment. Returns the number of documents indexed.
+
+        Each document's token count and weight L_d are computed as soon as it is inverted and streamed to
+        document_metadata and docStats.bin, and its title and path to documents.bin, so memory does not grow
+        with the number of documents.
+        """
         num_docs = 36803
 
         document_metadata = []
-        doc_term_freq = {}
         total_tokens = 0
-
-        # Single loop for indexing and metadata handling
-        for i, document in enumerate(self.corpus.load_documents_generator()):
-            doc_id = document.id
-            doc_length = 0
-            doc_term_freq[doc_id] = {}
-
-            # Process each term in the document
-            for term, _, position in self.preprocessing.dic_process_position(document):
-                self.p_i_index.addTerm(term, doc_id, position)
-                total_memory += 5
-                doc_term_freq[doc_id][term] = doc_term_freq[doc_id].get(term, 0) + 1
-                doc_length += 1
-
-                # Check memory limit
-                if self.memory_limit(total_memory):
+        first_doc_id = None
+        doc_count = 0
+
+        with open(os.path.join(self.segment_dir, "docStats.bin"), "wb") as doc_stats_file, \
+                DocumentStoreWriter(os.path.join(self.segment_dir, "documents.bin")) as document_store:
+            # Single loop for indexing and metadata handling
+            for i, document in enumerate(documents):
+                doc_id = document.id
+                doc_length = 0
+                term_freq = {}
+                if first_doc_id is None:
+                    first_doc_id = doc_id
+
+                # Process each term in the document
+                for term, _, position in self.preprocessing.dic_process_position(document):
+                    self.buffer.add_term(term, doc_id, position)
+                    term_freq[term] = term_freq.get(term, 0) + 1
+                    doc_length += 1
+
+                # Documents arrive in doc ID order, so their stats are appended in order
+                doc_stats_file.write(pack_doc_stats(document_weight(term_freq), doc_length))
+                document_store.add(document.title, document_path(document))
+
+                # Check memory limit between documents, so a document never spans two buckets
+                if self.memory_limit(self.buffer.memory_used):
                     self.memory_index()
-                    total_memory = 0
-                    self.p_i_index.clear()
 
-            # Accumulate document metadata
-            document_metadata.append((doc_id, document.title, doc_length))
+                # Accumulate document metadata
+                document_metadata.append((doc_id, document.title, doc_length))
 
-            # Batch insert metadata if threshold reached
-            if len(document_metadata) >= 1000:
-                self.batch_insert_document_metadata(document_metadata)
-                document_metadata = []
+                # Batch insert metadata if threshold reached
+                if len(document_metadata) >= 1000:
+                    self.batch_insert_document_metadata(document_metadata)
+                    document_metadata = []
 
-            total_tokens += doc_length
+                total_tokens += doc_length
+                doc_count += 1
 
-            # Progress callback handling
-            if progress_callback:
-                progress_fraction = 0.50 * (i + 1) / num_docs
-                progress_callback(progress_fraction)
+                # Progress callback handling
+                if progress_callback:
+                    progress_fraction = 0.50 * (i + 1) / num_docs
+                    progress_callback(progress_fraction)
+
+        if first_doc_id is None:
+            shutil.rmtree(self.segment_dir)
+            return 0
 
         # Insert any remaining metadata after the loop
         if document_metadata:
             self.batch_insert_document_metadata(document_metadata)
 
-        # Update the corpus stats with the total number of tokens
-        self.db_cursor.execute('REPLACE INTO corpus_stats (stat_name, value) VALUES ("total_tokens", ?)', (total_tokens,))
-        self.db_conn.commit()
+        # Update the corpus stats with the number of tokens
+        self._add_total_tokens(total_tokens)
 
         self.memory_index()
-        self.merge_files(lambda fraction: progress_callback(0.50 + 0.50 * fraction), self.uniq_terms)
+        self.merge_files(self._merge_progress(progress_callback), self.uniq_terms, first_doc_id)
+
+        self._finish_segment(first_doc_id, doc_count)
+        return doc_count
+
+    def parallel_spimi_index(self, progress_callback=None, num_workers=2):
+        """Creates the positional inverted index with a pool of worker processes.
+
+        The corpus is split into batches of consecutive documents. Each worker inverts a batch into a local
+        InversionBuffer and writes it as its own sorted bucket files, named after the batch number so the
+        buckets stay in doc ID order for merge_files. The memory budget is shared between the workers.
+        Metadata, token counts, document weights and paths are returned to this process and streamed to disk in
+        batch order, so the result is identical to a serial build.
+        """
+        print(f"SPIMI indexing with {num_workers} workers...")
+        num_docs = 36803
+        first_doc_id = None
+        indexed_docs = 0
+        total_tokens = 0
+        pending = deque()
+
+        def collect(result):
+            nonlocal first_doc_id, indexed_docs, total_tokens
+            batch_paths, batch_metadata, batch_weights, batch_doc_paths, batch_tokens, batch_terms = result
+            if first_doc_id is None:
+                first_doc_id = batch_metadata[0][0]
+            self.bucket_paths.extend(batch_paths)
+            self.batch_insert_document_metadata(batch_metadata)
+            for (_, title, doc_length), L_d, doc_path in zip(batch_metadata, batch_weights, batch_doc_paths):
+                doc_stats_file.write(pack_doc_stats(L_d, doc_length))
+                document_store.add(title, doc_path)
+            total_tokens += batch_tokens
+            self.uniq_terms += batch_terms
+            indexed_docs += len(batch_metadata)
+            if progress_callback:
+                progress_callback(0.50 * indexed_docs / num_docs)
 
-        doc_squares_sum = {}
-        for doc_id, terms in doc_term_freq.items():
-            squares_sum = sum((1 + math.log(tf))**2 for tf in terms.values() if tf > 0)
-            doc_squares_sum[doc_id] = squares_sum
+        worker_budget = self.memory_budget // num_workers
+        doc_stats_path = os.path.join(self.segment_dir, "docStats.bin")
+        document_store_path = os.path.join(self.segment_dir, "documents.bin")
+        with open(doc_stats_path, "wb") as doc_stats_file, DocumentStoreWriter(document_store_path) as document_store, \
+                multiprocessing.Pool(num_workers, initializer=_init_worker) as pool:
+            for batch in self._document_batches():
+                file_prefix = os.path.join(BUCKET_DIR, f"bucket_{self.segment_id}_{self.file_counter}")
+                self.file_counter += 1
+                pending.append(
+                    pool.apply_async(_index_batch, (file_prefix, batch, self.codec.name, worker_budget))
+                )
 
-        euclidean_lengths = {}
-        for doc_id, squares_sum in doc_squares_sum.items():
-            euclidean_length = math.sqrt(squares_sum)
-            euclidean_lengths[doc_id] = euclidean_length
+                # Keep a bounded number of batches in flight so the corpus is never held in memory.
+                if len(pending) >= 2 * num_workers:
+                    collect(pending.popleft().get())
 
-        os.makedirs(WEIGHTS_DIR, exist_ok=True)
-        doc_weights_file_path = os.path.join(WEIGHTS_DIR, "docWeights.bin")
-        self.write_doc_weights(euclidean_lengths, doc_weights_file_path)
+            while pending:
+                collect(pending.popleft().get())
+
+        if first_doc_id is None:
+            shutil.rmtree(self.segment_dir)
+            print("SPIMI indexing completed.")
+            return
+
+        self._add_total_tokens(total_tokens)
+
+        self.merge_files(self._merge_progress(progress_callback), self.uniq_terms, first_doc_id)
+
+        self._finish_segment(first_doc_id, indexed_docs)
 
         print("SPIMI indexing completed.")
 
-    def memory_index(self):
-        """Sorts the in-memory index and writes it to disk."""
-        file_path = os.path.join(BUCKET_DIR, f"bucket_{self.file_counter}.bin")
-        
-        with open(file_path, "wb") as postings_file:
-            sorted_terms = self.p_i_index.getVocabulary()
-            for term in sorted_terms:
-                if term:
-                    self.uniq_terms += 1
-                    postings = self.p_i_index.getPostings(term)
-                    encoded_postings = self._encode_postings(term, postings)
-                    # Format <term length><term><df><doc_id><tftd><position>
-                    postings_file.write(encoded_postings)
-        
-        self.db_conn.commit()  
-        self.file_counter += 1
-        self.p_i_index.clear()
+    def _document_batches(self):
+        """Groups the corpus documents into lists of INDEX_BATCH_SIZE consecutive documents."""
+        batch = []
+        for document in self.corpus.load_documents_generator():
+            batch.append(document)
+            if len(batch) >= INDEX_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
-    def _encode_postings(self, term, postings_list):
-        """Encodes the postings list using gap encoding."""
-        # Encode the term length as an integer (4 bytes)
-        term_bytes = b''.join([struct.pack('B', ord(character)) for character in term])
-        term_length = len(term_bytes)
+    @staticmethod
+    def _merge_progress(progress_callback):
+        """Maps merge progress onto the second half of the overall indexing progress."""
+        if not progress_callback:
+            return None
+        return lambda fraction: progress_callback(0.50 + 0.50 * fraction)
 
-        # Encode the term length as an integer (4 bytes)
-        postings_data = struct.pack('I', term_length)
+    def _add_total_tokens(self, tokens):
+        """Adds the tokens of newly indexed documents to the corpus stats."""
+        self.db_cursor.execute('''
+            INSERT INTO corpus_stats (stat_name, value) VALUES ("total_tokens", ?)
+            ON CONFLICT (stat_name) DO UPDATE SET value = value + excluded.value''', (tokens,))
+        self.db_conn.commit()
 
-        # Append the term
-        postings_data += term_bytes
+    def _start_segment(self):
+        """Allocates the ID and the directory of the segment that the next build writes."""
+        self.db_cursor.execute('SELECT COALESCE(MAX(segment_id) + 1, 0) FROM segments')
+        segment_id = self.db_cursor.fetchone()[0]
+        os.makedirs(SEGMENTS_DIR, exist_ok=True)
+        while True:
+            segment_dir = os.path.join(SEGMENTS_DIR, f"segment_{segment_id}")
+            try:
+                os.mkdir(segment_dir)
+                break
+            except FileExistsError:
+                # Another build (e.g. a background compaction) holds this ID
+                segment_id += 1
+
+        self.segment_id = segment_id
+        self.segment_dir = segment_dir
+        self.buffer.clear()
+        self.bucket_paths = []
+        self.file_counter = 0
+        self.uniq_terms = 0
 
-        # Encode the document frequency as an integer (4 bytes)
-        dtf = struct.pack('I', len(postings_list))
-        postings_data += dtf
-        last_doc_id = 0
+    def _finish_segment(self, first_doc_id, doc_count):
+        """Makes the current segment visible to readers and removes its buckets."""
+        self.db_cursor.execute(
+            'INSERT INTO segments (segment_id, directory, first_doc_id, doc_count) VALUES (?, ?, ?, ?)',
+            (self.segment_id, self.segment_dir, first_doc_id, doc_count),
+        )
+        self.db_conn.commit()
+        for file_paths in self.bucket_paths:
+            for file_path in file_paths:
+                os.remove(file_path)
+        self.bucket_paths = []
+
+    def compact_segments(self, progress_callback=None, on_swap=None) -> bool:
+        """Merges all segments into a single one with the k-way merge of merge_files.
+
+        Segments cover consecutive doc ID ranges, so their postings files are merged like buckets. The new
+        segment replaces the old ones in a single transaction; on_swap is called after that and before the
+        old segment files are deleted, so readers can reload. Postings of the documents deleted since the
+        last compaction are purged; a single segment is rewritten if there are any. Returns False if there was nothing to merge or purge.
+        """
+        self.codec = self._index_codec()
+        self.impact_index = self._index_impact_setting()
+        self.champion_list_size = self._index_champion_list_size()
+        self.bitmap_min_df = self._index_bitmap_min_df()
+        self.db_cursor.execute('SELECT segment_id, directory, first_doc_id, doc_count FROM segments ORDER BY first_doc_id')
+        segments = self.db_cursor.fetchall()
+        # Only the deletions since the last compaction can still have postings
+        live_docs = LiveDocs(live_docs_path(DB_PATH))
+        purged_doc_ids = live_docs.pending_doc_ids()
+        if not segments or (len(segments) < 2 and not purged_doc_ids):
+            return False
+
+        print(f"Compacting {len(segments)} segments...")
+        self._start_segment()
+        # Segments are consecutive, so their document stats and stores concatenate in doc ID order. Deleted
+        # documents keep their slot, so the entries of the others stay at their doc ID.
+        with open(os.path.join(self.segment_dir, "docStats.bin"), "wb") as doc_stats_file:
+            for _, directory, _, _ in segments:
+                with open(os.path.join(directory, "docStats.bin"), "rb") as segment_stats_file:
+                    shutil.copyfileobj(segment_stats_file, doc_stats_file)
+        with DocumentStoreWriter(os.path.join(self.segment_dir, "documents.bin")) as document_store:
+            for _, directory, _, _ in segments:
+                segment_store = DocumentStore(os.path.join(directory, "documents.bin"))
+                for i in range(len(segment_store)):
+                    document_store.add(segment_store.title(i), segment_store.path(i))
+                segment_store.close()
+
+        input_paths = [
+            (os.path.join(directory, "postings.bin"), os.path.join(directory, "positions.bin"))
+            for _, directory, _, _ in segments
+        ]
+        self.bucket_paths = input_paths
+        self.purged_doc_ids = purged_doc_ids
+        try:
+            self.merge_files(progress_callback, first_doc_id=segments[0][2])
+        finally:
+            self.bucket_paths = []
+            self.purged_doc_ids = []
+
+        old_ids = [(segment_id,) for segment_id, _, _, _ in segments]
+        self.db_cursor.executemany('DELETE FROM segments WHERE segment_id = ?', old_ids)
+        self._finish_segment(segments[0][2], sum(doc_count for _, _, _, doc_count in segments))
+        # Marked once the new segment is live: a reader that still has the old segments must keep filtering.
+        # Documents deleted during the compaction stay pending.
+        live_docs.mark_purged(purged_doc_ids)
+
+        if on_swap:
+            on_swap()
+        for _, directory, _, _ in segments:
+            shutil.rmtree(directory, ignore_errors=True)
+        print("Compaction completed.")
+        return True
+
+    def compact_in_background(self, on_swap=None) -> threading.Thread:
+        """Runs compact_segments in a background thread and returns the thread."""
+        thread = threading.Thread(target=self._compact_in_thread, args=(on_swap,), daemon=True)
+        thread.start()
+        return thread
+
+    def _compact_in_thread(self, on_swap):
+        """Compacts with a copy of this SPIMI that has its own database connection, opened in the worker thread,
+        and its own buffer, so the compaction shares no connection or state with the thread that started it."""
+        compactor = copy.copy(self)
+        compactor.db_conn = sqlite3.connect(DB_PATH)
+        compactor.db_cursor = compactor.db_conn.cursor()
+        compactor.buffer = InversionBuffer()
+        try:
+            compactor.compact_segments(on_swap=on_swap)
+        finally:
+            compactor.db_conn.close()
+
+    def segment_count(self) -> int:
+        """Returns the number of live segments."""
+        self.db_cursor.execute('SELECT COUNT(*) FROM segments')
+        return self.db_cursor.fetchone()[0]
+
+    def memory_index(self):
+        """Sorts the in-memory buffer and writes it to disk."""
+        file_paths = bucket_file_paths(os.path.join(BUCKET_DIR, f"bucket_{self.segment_id}_{self.file_counter}"))
+        self.uniq_terms += write_bucket(file_paths, self.buffer, self.codec)
+        self.bucket_paths.append(file_paths)
 
+        self.db_conn.commit()  
+        self.file_counter += 1
+        self.buffer.clear()
+
+    @staticmethod
+    def _encode_postings(term, postings_list, codec) -> PostingsRecord:
+        """Encodes the postings list using gap encoding and the given codec."""
+        builder = RecordBuilder(term, codec)
         for posting in postings_list:
             # Check if posting is a dict or an object and access doc_id and positions
             if isinstance(posting, dict):
-                doc_id = posting['doc_id']
-                positions = posting['positions']
+                builder.add(posting['doc_id'], posting['positions'])
             else:  # assuming it's an object
-                doc_id = posting.doc_id
-                positions = posting.positions
+                builder.add(posting.doc_id, posting.positions)
+        return builder.record()
 
-            # Encode the document id as an integer (4 bytes)
-            doc_gap = doc_id - last_doc_id
-            postings_data += struct.pack('I', doc_gap)
-            last_doc_id = doc_id
+    def merge_files(self, progress_callback=None, total_terms=0, first_doc_id=0):
+        """Merges the sorted buckets into the postings, positions and term dictionary files of the segment.
 
-            # Encode the term frequency in the document as an integer (4 bytes)
-            tftd = len(positions)
-            postings_data += struct.pack('I', tftd)
-
-            last_position = 0
-            for position in positions:
-                # Encode the position as an integer (4 bytes)
-                position_gap = position - last_position
-                postings_data += struct.pack('I', position_gap)
-                last_position = position
-
-        return postings_data
-
-    def merge_files(self, progress_callback=None, total_terms=0):
+        The segment's docStats.bin, whose first document is first_doc_id, must be written already: the score
+        bounds of each term in the dictionary, and its impact-ordered postings and champion list if the index
+        has them, are computed from it. Terms frequent enough to get a doc ID bitmap get it here too, and the
+        k-gram index of the vocabulary for wildcard queries is built next to the term dictionary."""
         print("Merging Files...")
-        
-        # Open read streams for each intermediate file
-        file_streams = [open(os.path.join(BUCKET_DIR, f"bucket_{i}.bin"), "rb") for i in range(self.file_counter)]
-        
-        # Track whether a stream is exhausted
-        stream_exhausted = [False] * len(file_streams)
+        doc_stats = array("d")
+        with open(os.path.join(self.segment_dir, "docStats.bin"), "rb") as doc_stats_file:
+            doc_stats.frombytes(doc_stats_file.read())
+
+        # Open buffered record readers for each intermediate postings and positions file
+        readers = [RecordReader(file_path, positions_file_path) for file_path, positions_file_path in self.bucket_paths]
 
-        # Open write stream for final merged file
-        merged_file_path = os.path.join(POSTINGS_DIR, "postings.bin")
-        with open(merged_file_path, "wb") as merged_file:
+        # Open write streams for the final merged files
+        merged_file_paths = (os.path.join(self.segment_dir, "postings.bin"), os.path.join(self.segment_dir, "positions.bin"))
+        dictionary_path = os.path.join(self.segment_dir, "terms.bin")
+        with RecordWriter(*merged_file_paths) as merged_file, TermDictionaryWriter(dictionary_path) as dictionary, \
+                ExitStack() as stages:
+            # Builder stages that get the doc IDs and frequencies of each merged term
+            term_writers = [stages.enter_context(writer) for writer in self._term_writers(doc_stats, first_doc_id)]
 
             # Initialize priority queue
             pq = []
-            for index, file_stream in enumerate(file_streams):
-                first_posting = self._read_postings_data(file_stream)
-                if first_posting:
-                    heapq.heappush(pq, Posting(first_posting[0][0], index, first_posting))
-
-            # Initialize buffer for batch database updates
-            db_update_buffer = []
-            db_update_threshold = 1000  
+            for index in range(len(readers)):
+                self._push_next_record(pq, readers, index)
 
             # Merge process
             processed_terms = 0
@@ -216,65 +574,128 @@ class SPIMI:
                 current_posting = heapq.heappop(pq)
                 current_term = current_posting.term
                 L = [current_posting.postings_data]
+                self._push_next_record(pq, readers, current_posting.file_index)
 
-                # While the next term is the same as the current one
+                # While the next term is the same as the current one. Ties are popped in bucket order,
+                # which is doc ID order.
                 while pq and pq[0].term == current_term:
                     same_term_posting = heapq.heappop(pq)
                     L.append(same_term_posting.postings_data)
-
-                    # Get next posting from the same file
-                    if not stream_exhausted[same_term_posting.file_index]:
-                        next_posting = self._read_postings_data(file_streams[same_term_posting.file_index])
-                        if next_posting:
-                            heapq.heappush(pq, Posting(next_posting[0][0], same_term_posting.file_index, next_posting))
-                        else:
-                            stream_exhausted[same_term_posting.file_index] = True
-
-                # Merge L and write to file
-                merged_postings = self.merge_postings(L)
-                formatted_postings = [{'doc_id': posting[0], 'positions': posting[2]} for posting in merged_postings]
-
-                # Record the start position
-                start_position = merged_file.tell()
-                db_update_buffer.append((current_term, start_position))
-
-                # Write to file
-                encoded_data = self._encode_postings(current_term, formatted_postings)
-                merged_file.write(encoded_data)
-
-                # Push the next posting from the file we just processed to the priority queue
-                if not pq or pq[0].file_index != current_posting.file_index:
-                    if not stream_exhausted[current_posting.file_index]:
-                        next_posting = self._read_postings_data(file_streams[current_posting.file_index])
-                        if next_posting:
-                            heapq.heappush(pq, Posting(next_posting[0][0], current_posting.file_index, next_posting))
-                        else:
-                            stream_exhausted[current_posting.file_index] = True
+                    self._push_next_record(pq, readers, same_term_posting.file_index)
+
+                # Merge L and write it to the files, unless all its documents were purged. Terms come out of
+                # the queue in sorted order, as the dictionary needs them.
+                merged_record = self.merge_records(L)
+                if merged_record:
+                    position, positions_position = merged_file.write_record(merged_record)
+                    doc_ids, frequencies = self._doc_frequencies(merged_record)
+                    doc_ids = list(doc_ids)
+                    bounds = score_bounds(doc_ids, frequencies, doc_stats, first_doc_id)
+                    dictionary.add(
+                        current_term,
+                        TermEntry(position, positions_position, merged_record.df, merged_record.cf, *bounds),
+                    )
+                    for writer in term_writers:
+                        writer.add(current_term, doc_ids, frequencies, merged_record.cf)
 
                 processed_terms += 1
                 if progress_callback and total_terms:
                     progress_fraction = processed_terms / total_terms
                     progress_callback(progress_fraction)
 
-                # Batch update to the database
-                if len(db_update_buffer) >= db_update_threshold:
-                    self.db_cursor.executemany('REPLACE INTO term_positions (term, position) VALUES (?, ?)', db_update_buffer)
-                    db_update_buffer = []
-
-            # Final database update for remaining items
-            if db_update_buffer:
-                self.db_cursor.executemany('REPLACE INTO term_positions (term, position) VALUES (?, ?)', db_update_buffer)
-            self.db_conn.commit()
-
             if progress_callback:
                 progress_callback(1.0)
 
-            # Close all streams
-            for file_stream in file_streams:
-                file_stream.close()
+            # Close all readers
+            for reader in readers:
+                reader.close()
 
         print("Merging completed.")
 
+    def _term_writers(self, doc_stats, first_doc_id) -> list:
+        """Returns the writers of the per-term structures the index keeps besides its postings."""
+        return term_writers(
+            self.segment_dir, doc_stats, first_doc_id, self.impact_index, self.champion_list_size, self.bitmap_min_df
+        )
+
+    @staticmethod
+    def _push_next_record(pq, readers, file_index):
+        """Pushes the next record of the given file onto the priority queue, if the file has one left."""
+        record = readers[file_index].read_record()
+        if record:
+            heapq.heappush(pq, Posting(record.term, file_index, record))
+
+    def merge_records(self, records) -> Optional[PostingsRecord]:
+        """Merges the records of one term, given in bucket order, into a single record.
+
+        Buckets hold consecutive ranges of documents, so the chunks are concatenated byte for byte: only the
+        first doc gap of each chunk is re-based on the last doc ID of the previous one, and df is summed.
+        Positions are concatenated as they are. The skip entries of each chunk are shifted by the chunk's
+        new start, and an entry closes the last, possibly shorter, block of the previous chunk. Chunks that
+        overlap (a document split across buckets) or hold postings of purged documents fall back to
+        decoding and re-encoding.
+        """
+        if self.purged_doc_ids and self._has_purged_postings(records):
+            return self._reencode_records(records)
+        if len(records) == 1:
+            return records[0]
+
+        payload = bytearray(records[0].payload)
+        positions = bytearray(records[0].positions)
+        skip_doc_ids, skip_offsets, skip_positions_offsets = records[0].skip_entries()
+        df = records[0].df
+        cf = records[0].cf
+        last_doc_id = records[0].last_doc_id
+        for record in records[1:]:
+            # A chunk starts with a gap from doc ID 0, i.e. its first doc ID
+            (first_doc_id, tftd), offset = self.codec.decode(record.payload, 0, 2)
+            if first_doc_id <= last_doc_id:
+                return self._reencode_records(records)
+            skip_doc_ids.append(last_doc_id)
+            skip_offsets.append(len(payload))
+            skip_positions_offsets.append(len(positions))
+
+            first_gap = self.codec.encode((first_doc_id - last_doc_id, tftd))
+            shift = len(payload) + len(first_gap) - offset
+            positions_shift = len(positions)
+            payload += first_gap
+            payload += record.payload[offset:]
+            positions += record.positions
+
+            record_doc_ids, record_offsets, record_positions_offsets = record.skip_entries()
+            skip_doc_ids.extend(record_doc_ids)
+            skip_offsets.extend(record_offset + shift for record_offset in record_offsets)
+            skip_positions_offsets.extend(record_offset + positions_shift for record_offset in record_positions_offsets)
+            df += record.df
+            cf += record.cf
+            last_doc_id = record.last_doc_id
+
+        skips = pack_skips(skip_doc_ids, skip_offsets, skip_positions_offsets)
+        return PostingsRecord(records[0].term, df, cf, last_doc_id, skips, bytes(payload), bytes(positions))
+
+    def _has_purged_postings(self, records) -> bool:
+        """Returns True if a purged doc ID falls between the first and the last document of the records."""
+        (first_doc_id, _), _ = self.codec.decode(records[0].payload, 0, 2)
+        index = bisect.bisect_left(self.purged_doc_ids, first_doc_id)
+        return index < len(self.purged_doc_ids) and self.purged_doc_ids[index] <= records[-1].last_doc_id
+
+    def _is_purged(self, doc_id) -> bool:
+        index = bisect.bisect_left(self.purged_doc_ids, doc_id)
+        return index < len(self.purged_doc_ids) and self.purged_doc_ids[index] == doc_id
+
+    def _reencode_records(self, records) -> Optional[PostingsRecord]:
+        """Merges the records of one term by decoding every posting and encoding the merged list.
+
+        Postings of purged documents are dropped; returns None if none is left."""
+        merged_postings = self.merge_postings([self._decode_postings(record) for record in records])
+        formatted_postings = [
+            {'doc_id': posting[0], 'positions': posting[2]}
+            for posting in merged_postings
+            if not self._is_purged(posting[0])
+        ]
+        if not formatted_postings:
+            return None
+        return self._encode_postings(records[0].term, formatted_postings, self.codec)
 
     @staticmethod
     def merge_postings(postings_lists):
@@ -297,68 +718,145 @@ class SPIMI:
 
         return sorted_postings
 
-    def _read_postings_data(self, stream):
-        """Reads the next postings data from the specified stream."""
+    def _doc_frequencies(self, record) -> tuple[Iterable[int], list[int]]:
+        """Decodes the doc IDs and term frequencies of a record, without its positions."""
+        if self.codec.streamable:
+            values = self.codec.decode_all(record.payload)
+        else:
+            # Each posting is encoded on its own
+            values = []
+            offset = 0
+            for _ in range(record.df):
+                posting_values, offset = self.codec.decode(record.payload, offset, 2)
+                values.extend(posting_values)
+        return accumulate(values[0::2]), values[1::2]
+
+    def _decode_postings(self, record):
+        """Decodes the postings of a record into (term, doc_id, tftd, positions) tuples."""
         postings = []
         last_doc_id = 0
-
-        # Read the term length
-        term_length_data = stream.read(4)
-
-        if not term_length_data:
-            return None
-
-        term_length = struct.unpack('I', term_length_data)[0]
-
-        # Read and decode the term
-        term_bytes = stream.read(term_length)
-        term = ''.join([chr(struct.unpack('B', bytes([b]))[0]) for b in term_bytes])
-
-        # Read the document frequency
-        dtf_data = stream.read(4)
-        if not dtf_data:  
-            return None
-
-        dtf = struct.unpack('I', dtf_data)[0]
-
-        for _ in range(dtf):
-            # Read the document id
-            doc_gap_data = stream.read(4)
-            if not doc_gap_data: 
-                break  
-            doc_gap = struct.unpack('I', doc_gap_data)[0]
+        offset = 0
+        positions_offset = 0
+        for _ in range(record.df):
+            # Read the document gap and the term frequency in the document
+            (doc_gap, tftd), offset = self.codec.decode(record.payload, offset, 2)
             doc_id = last_doc_id + doc_gap
             last_doc_id = doc_id
 
-            # Read the term frequency in the document
-            tftd_data = stream.read(4)
-            if not tftd_data:  
-                break  
-            tftd = struct.unpack('I', tftd_data)[0]
-
+            # Read the positions
+            position_gaps, positions_offset = self.codec.decode(record.positions, positions_offset, tftd)
             last_position = 0
             position_data = []
-            for _ in range(tftd):
-                # Read the positions
-                pos_gap_data = stream.read(4)
-                if not pos_gap_data:
-                    break  
-                pos_gap = struct.unpack('I', pos_gap_data)[0]
+            for pos_gap in position_gaps:
                 position = last_position + pos_gap
                 position_data.append(position)
                 last_position = position
 
-            postings.append((term, doc_id, tftd, position_data))
+            postings.append((record.term, doc_id, tftd, position_data))
 
         return postings
 
-    def memory_limit(self, total_memory):
-        MEMORY_LIMIT = 15000000 # 15 MB
-        return total_memory > MEMORY_LIMIT
-
-    def write_doc_weights(self, doc_lengths: dict[int, float], doc_weights_file_path: str):
-        """Writes the document weights (Euclidean lengths) to the specified file."""
-        with open(doc_weights_file_path, 'wb') as doc_weights_file:
-            for doc_id in sorted(doc_lengths.keys()):
-                L_d = doc_lengths[doc_id]
-                doc_weights_file.write(struct.pack('d', L_d))
\ No newline at end of file
+    def memory_limit(self, memory_used):
+        """Returns True once the in-memory buffer has reached the memory budget."""
+        return memory_used >= self.memory_budget
+
+def document_weight(term_frequencies) -> float:
+    """Computes the Euclidean length L_d of a document from its term frequencies."""
+    squares_sum = sum((1 + math.log(tf))**2 for tf in term_frequencies.values() if tf > 0)
+    return math.sqrt(squares_sum)
+
+
+def score_bounds(doc_ids, frequencies, doc_stats, first_doc_id) -> tuple[int, float, float]:
+    """Returns the largest tf, the largest (1 + log tf) / L_d and the smallest doc length / tf of a term's
+    postings. doc_stats holds the L_d and length of each document of the segment, from first_doc_id on."""
+    max_tf = 0
+    max_weight = 0.0
+    min_length_ratio = math.inf
+    for doc_id, tf in zip(doc_ids, frequencies):
+        L_d, doc_length = doc_stats[2 * (doc_id - first_doc_id)], doc_stats[2 * (doc_id - first_doc_id) + 1]
+        max_tf = max(max_tf, tf)
+        max_weight = max(max_weight, (1 + math.log(tf)) / L_d)
+        min_length_ratio = min(min_length_ratio, doc_length / tf)
+    return max_tf, max_weight, min_length_ratio
+
+
+def term_writers(segment_dir, doc_stats, first_doc_id, impact_index, champion_list_size, bitmap_min_df) -> list:
+    """Returns the writers of the per-term structures of a segment besides its postings: always the k-gram
+    index, and the impact-ordered postings, champion lists and bitmaps if they are enabled. Each writer is given
+    the doc IDs, frequencies and cf of every term, in sorted order."""
+    writers = [KGramIndexWriter(segment_dir)]
+    if impact_index:
+        writers.append(ImpactIndexWriter(segment_dir, doc_stats, first_doc_id))
+    if champion_list_size:
+        writers.append(ChampionListWriter(segment_dir, doc_stats, first_doc_id, champion_list_size))
+    if bitmap_min_df:
+        writers.append(BitmapIndexWriter(segment_dir, bitmap_min_df))
+    return writers
+
+
+def document_path(document) -> str:
+    """Returns the file path of a document, or an empty string for documents not read from their own file."""
+    return str(getattr(document, "path", ""))
+
+
+def bucket_file_paths(file_prefix) -> tuple[str, str]:
+    """Returns the paths of the postings file and the positions file of a bucket."""
+    return f"{file_prefix}.bin", f"{file_prefix}_positions.bin"
+
+
+def write_bucket(file_paths, buffer, codec) -> int:
+    """Writes an inversion buffer to sorted bucket files and returns the number of terms written."""
+    with RecordWriter(*file_paths) as bucket_file:
+        for term in buffer.getVocabulary():
+            bucket_file.write_record(buffer.encode_postings(term, codec))
+    return len(buffer)
+
+
+def _init_worker():
+    """Loads the preprocessing pipeline once per worker process."""
+    global _worker_preprocessing
+    _worker_preprocessing = Preprocessing()
+
+
+def _index_batch(file_prefix, documents, codec_name, memory_budget):
+    """Inverts a batch of documents into bucket files inside a worker process.
+
+    The batch normally fits in one bucket; it is split between documents if the buffer reaches the memory
+    budget. Returns the bucket paths, the document metadata rows, the document weights and paths in doc ID
+    order, the number of tokens and the number of terms written to the buckets.
+    """
+    codec = get_codec(codec_name)
+    buffer = InversionBuffer()
+    bucket_paths = []
+    terms_written = 0
+    document_metadata = []
+    doc_weights = []
+    doc_paths = []
+    total_tokens = 0
+
+    def flush():
+        nonlocal terms_written
+        file_paths = bucket_file_paths(f"{file_prefix}_{len(bucket_paths)}")
+        terms_written += write_bucket(file_paths, buffer, codec)
+        bucket_paths.append(file_paths)
+        buffer.clear()
+
+    for document in documents:
+        doc_length = 0
+        term_freq = {}
+        for term, _, position in _worker_preprocessing.dic_process_position(document):
+            buffer.add_term(term, document.id, position)
+            term_freq[term] = term_freq.get(term, 0) + 1
+            doc_length += 1
+
+        document_metadata.append((document.id, document.title, doc_length))
+        doc_weights.append(document_weight(term_freq))
+        doc_paths.append(document_path(document))
+        total_tokens += doc_length
+
+        if buffer.memory_used >= memory_budget:
+            flush()
+
+    if len(buffer) or not bucket_paths:
+        flush()
+    return bucket_paths, document_metadata, doc_weights, doc_paths, total_tokens, terms_written
@@ -0,0 +1,177 @@
+from typing import Iterator, NamedTuple, Optional
+from .codecs import VariableByteCodec
+import math
+import mmap
+import struct
+
+# terms.bin lists the terms of a segment in sorted order, in blocks of BLOCK_TERMS terms. The first term of a
+# block is stored whole and the others as <shared prefix length><suffix length><suffix>, followed by the
+# entry <postings offset><positions offset><df><cf><max tf><max weight><min length ratio>, all as variable-byte
+# integers. The blocks are followed by the offsets of the blocks and by the footer <block count><term count>
+# <block offsets start>. The max weight and the min length ratio are fixed-point numbers with BOUND_SCALE units,
+# rounded up and down respectively so they stay bounds.
+BLOCK_TERMS = 16
+ENTRY_FIELDS = 7
+BOUND_SCALE = 1 << 16
+BLOCK_OFFSET = struct.Struct("Q")
+FOOTER = struct.Struct("IIQ")
+
+_vbyte = VariableByteCodec()
+
+
+class TermEntry(NamedTuple):
+    """Where the postings of a term start in postings.bin and positions.bin, with its df and cf.
+
+    The last fields bound the score a posting of the term can contribute, for dynamic pruning: the largest
+    term frequency, the largest (1 + log tf) / L_d and the smallest document length / tf of its postings."""
+
+    postings_offset: int
+    positions_offset: int
+    df: int
+    cf: int
+    max_tf: int = 0
+    max_weight: float = 0.0
+    min_length_ratio: float = 0.0
+
+
+def _pack_entry(entry: TermEntry) -> tuple[int, ...]:
+    return entry[:5] + (math.ceil(entry.max_weight * BOUND_SCALE), math.floor(entry.min_length_ratio * BOUND_SCALE))
+
+
+def _unpack_entry(values) -> TermEntry:
+    return TermEntry(*values[:5], values[5] / BOUND_SCALE, values[6] / BOUND_SCALE)
+
+
+class TermDictionaryWriter:
+    """Writes a front-coded term dictionary. Terms must be added in sorted order."""
+
+    def __init__(self, file_path):
+        self.stream = open(file_path, "wb")
+        self.block_offsets = []
+        self.term_count = 0
+        self.previous_term = b""
+
+    def add(self, term: str, entry: TermEntry):
+        term_bytes = term.encode("latin-1")
+        if self.term_count % BLOCK_TERMS == 0:
+            self.block_offsets.append(self.stream.tell())
+            self.stream.write(_vbyte.encode((len(term_bytes),)) + term_bytes)
+        else:
+            prefix_length = 0
+            max_prefix = min(len(term_bytes), len(self.previous_term))
+            while prefix_length < max_prefix and term_bytes[prefix_length] == self.previous_term[prefix_length]:
+                prefix_length += 1
+            suffix = term_bytes[prefix_length:]
+            self.stream.write(_vbyte.encode((prefix_length, len(suffix))) + suffix)
+        self.stream.write(_vbyte.encode(_pack_entry(entry)))
+        self.previous_term = term_bytes
+        self.term_count += 1
+
+    def close(self):
+        """Writes the block offsets and the footer, and closes the file."""
+        block_offsets_start = self.stream.tell()
+        for block_offset in self.block_offsets:
+            self.stream.write(BLOCK_OFFSET.pack(block_offset))
+        self.stream.write(FOOTER.pack(len(self.block_offsets), self.term_count, block_offsets_start))
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TermDictionary:
+    """A read-only, memory-mapped term dictionary.
+
+    Opening it only reads the footer, so it takes the same time whatever the size of the vocabulary. lookup()
+    binary searches the first terms of the blocks, then scans a single block."""
+
+    def __init__(self, file_path):
+        with open(file_path, "rb") as dictionary_file:
+            self.data = mmap.mmap(dictionary_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.block_count, self.term_count, self.block_offsets_start = FOOTER.unpack_from(
+            self.data, len(self.data) - FOOTER.size
+        )
+
+    def __len__(self) -> int:
+        return self.term_count
+
+    def _block_offset(self, block_index: int) -> int:
+        return BLOCK_OFFSET.unpack_from(self.data, self.block_offsets_start + block_index * BLOCK_OFFSET.size)[0]
+
+    def _first_term(self, block_index: int) -> bytes:
+        offset = self._block_offset(block_index)
+        (length,), offset = _vbyte.decode(self.data, offset, 1)
+        return self.data[offset : offset + length]
+
+    def _read_block(self, block_index: int) -> Iterator[tuple[bytes, int]]:
+        """Yields the terms of a block with the offsets of their entries."""
+        offset = self._block_offset(block_index)
+        block_terms = min(BLOCK_TERMS, self.term_count - block_index * BLOCK_TERMS)
+        term = b""
+        for i in range(block_terms):
+            if i == 0:
+                (length,), offset = _vbyte.decode(self.data, offset, 1)
+                term = self.data[offset : offset + length]
+                offset += length
+            else:
+                (prefix_length, suffix_length), offset = _vbyte.decode(self.data, offset, 2)
+                term = term[:prefix_length] + self.data[offset : offset + suffix_length]
+                offset += suffix_length
+            yield term, offset
+            # Entries are only decoded when asked for
+            offset = _vbyte.skip(self.data, offset, ENTRY_FIELDS)
+
+    def _entry(self, offset: int) -> TermEntry:
+        return _unpack_entry(_vbyte.decode(self.data, offset, ENTRY_FIELDS)[0])
+
+    def lookup(self, term: str) -> Optional[TermEntry]:
+        """Returns the entry of a term, or None if the segment does not contain it."""
+        term_bytes = term.encode("latin-1")
+
+        # Find the last block whose first term is <= term
+        lo, hi = 0, self.block_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._first_term(mid) <= term_bytes:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+
+        for block_term, entry_offset in self._read_block(lo - 1):
+            if block_term == term_bytes:
+                return self._entry(entry_offset)
+            if block_term > term_bytes:
+                break
+        return None
+
+    def items(self) -> Iterator[tuple[str, TermEntry]]:
+        """Yields every term, in sorted order, with its entry."""
+        for block_index in range(self.block_count):
+            for term, entry_offset in self._read_block(block_index):
+                yield term.decode("latin-1"), self._entry(entry_offset)
+
+    def terms(self) -> Iterator[str]:
+        """Yields every term in sorted order."""
+        for block_index in range(self.block_count):
+            for term, _ in self._read_block(block_index):
+                yield term.decode("latin-1")
+
+    def terms_at(self, ordinals) -> list[str]:
+        """Returns the terms with the given ordinals in sorted order, given in increasing order. Each block
+        holding one of them is read once."""
+        terms = []
+        block_index, block_terms = -1, []
+        for ordinal in ordinals:
+            if ordinal // BLOCK_TERMS != block_index:
+                block_index = ordinal // BLOCK_TERMS
+                block_terms = [term for term, _ in self._read_block(block_index)]
+            terms.append(block_terms[ordinal % BLOCK_TERMS].decode("latin-1"))
+        return terms
+
+    def close(self):
+        self.data.close()
@@ -5,11 +5,10 @@ from engine.indexing import (
 )
 from config import (
     DB_PATH,
-    POSTINGS_FILE_PATH,
     DATA_DIR,
     BUCKET_DIR,
 )
-from engine.querying import BooleanQueryParser, PhraseLiteral, RankedQuery
+from engine.querying import BooleanQueryParser, NearLiteral, NotQuery, PagedResults, PhraseLiteral, QueryPlanner, RankedQuery
 from tkinter import filedialog
 import customtkinter  # type: ignore
 from .decorators import threaded
@@ -17,6 +16,7 @@ import traceback
 import config
 import os
 import json
+from pathlib import Path
 from engine.text import Preprocessing, SpellingCorrection
 from engine.documents import (
     DirectoryCorpus,
@@ -46,12 +46,58 @@ class CorpusManager:
         """Index the corpus using SPIMI."""
         # Initialize SPIMI with the DirectoryCorpus instance
         spimi = SPIMI(self.corpus)
-        spimi.spimi_index(progress_callback=progress_callback)
+        spimi.spimi_index(progress_callback=progress_callback, num_workers=config.INDEX_WORKERS)
 
         # Initialize the disk index
         if self.search_manager:
             self.search_manager.initialize_disk_index()
 
+    def append_corpus(self, folder_selected, progress_callback=None):
+        """Index the documents of another folder into a new segment of the existing index.
+
+        Once there are more than MAX_SEGMENTS segments, they are compacted in the background."""
+        extension_factories = {
+            ".txt": TextFileDocument.load_from,
+            ".json": JsonDocument.load_from,
+            ".xml": XMLDocument.load_from,
+        }
+        new_documents = DirectoryCorpus(folder_selected, factories=extension_factories)
+        spimi = SPIMI(new_documents)
+        spimi.append_documents(new_documents.load_documents_generator(), progress_callback=progress_callback)
+
+        if self.search_manager:
+            self.search_manager.initialize_disk_index()
+        if spimi.segment_count() > config.MAX_SEGMENTS:
+            spimi.compact_in_background(on_swap=self._reload_disk_index)
+
+    def delete_documents(self, doc_ids):
+        """Remove documents from the index without rebuilding it. Their postings are purged by the next compaction."""
+        spimi = SPIMI(None)
+        deleted = spimi.delete_documents(doc_ids)
+
+        if self.search_manager:
+            self.search_manager.initialize_disk_index()
+        return deleted
+
+    def update_document(self, doc_id, file_path):
+        """Replace an indexed document with the current contents of a file. Returns its new document ID.
+
+        Raises FileNotFoundError if the file does not exist and ValueError if its type is not supported, before
+        the old version is deleted."""
+        file_path = Path(file_path)
+        document = DirectoryCorpus(file_path.parent).load_document(file_path)
+        spimi = SPIMI(None)
+        new_doc_id = spimi.update_document(doc_id, document)
+
+        if self.search_manager:
+            self.search_manager.initialize_disk_index()
+        return new_doc_id
+
+    def _reload_disk_index(self):
+        """Points the search manager at the segments that replaced the compacted ones."""
+        if self.search_manager and self.search_manager.disk_index:
+            self.search_manager.disk_index.reload()
+
     def load_language_setting(self):
         language_file_path = os.path.join(DATA_DIR, "language.json")
         if os.path.exists(language_file_path):
@@ -83,22 +129,27 @@ class SearchManager:
         self.disk_index = None
 
     def initialize_disk_index(self):
-        """Initialize the disk index."""
+        """Initialize the disk index, or reload the open one after the index changed."""
         if self.is_indexed():
-            self.disk_index = self.load_disk_index()
+            if self.disk_index:
+                # Reloading keeps the connection and releases the old segments once no search reads them
+                self.disk_index.reload()
+            else:
+                self.disk_index = self.load_disk_index()
             self.spelling_correction = SpellingCorrection(self.disk_index)
             self.ranked_query_processor = RankedQuery(self.disk_index)
 
     def is_indexed(self):
-        """Check if the index files exist."""
-        db_exists = os.path.exists(DB_PATH)
-        postings_exists = os.path.exists(POSTINGS_FILE_PATH)
-        return db_exists and postings_exists
+        """Check if the index database exists and has at least one segment."""
+        if not os.path.exists(DB_PATH):
+            return False
+        segments_exist = os.path.isdir(config.SEGMENTS_DIR) and any(os.scandir(config.SEGMENTS_DIR))
+        return segments_exist
 
     def load_disk_index(self):
         """Load the disk index if it exists."""
         try:
-            return DiskPositionalIndex(DB_PATH, POSTINGS_FILE_PATH)
+            return DiskPositionalIndex(DB_PATH)
         except Exception as e:
             if self.home_warning_label:
                 self.home_warning_label.configure(text=f"Error loading disk index: {e}")
@@ -135,15 +186,15 @@ class SearchManager:
             if self.view.pages["ResultsPage"].ranked_var.get() or self.view.pages["ResultsPage"].okapi_var.get():
                 use_okapi = self.view.pages["ResultsPage"].okapi_var.get()
                 results = self.ranked_query_processor.rank_documents(raw_query, use_okapi)
+                results_count = len(results)
             else:
-                postings = self._get_postings(query)
-                results = [(posting.doc_id, 0) for posting in postings] 
+                results, results_count = self._get_results(query)
 
             if not results:
                 self.view.pages["ResultsPage"].display_no_results_warning(raw_query)
                 return
 
-            self._display_search_results(results)
+            self._display_search_results(results, results_count)
 
             self.view.pages["ResultsPage"].ranked_var.set(False)
             self.view.pages["ResultsPage"].okapi_var.set(False)
@@ -169,43 +220,56 @@ class SearchManager:
 
     def _is_phrase_query(self, query_component):
         """
-        Recursively checks if any part of the query is a PhraseLiteral.
+        Recursively checks if any part of the query is a PhraseLiteral or a NearLiteral, which need positions.
         """
-        if isinstance(query_component, PhraseLiteral):
+        if isinstance(query_component, (PhraseLiteral, NearLiteral)):
             return True
+        elif isinstance(query_component, NotQuery):
+            return self._is_phrase_query(query_component.component)
         elif hasattr(query_component, "components"):
             return any(
                 self._is_phrase_query(comp) for comp in query_component.components
             )
         return False
 
-    def _get_postings(self, query):
+    def _get_results(self, query):
+        """Plans a boolean query and returns its results, evaluated lazily as they are read, with the number
+        of results the planner estimates."""
         if not query:
             self.home_warning_label.configure(
                 text="Invalid Query. Please enter a valid search query."
             )
-            return []
+            return [], 0
 
-        # Set the flag in DiskPositionalIndex based on the type of query
+        # Set the flag in DiskPositionalIndex based on the type of query. The cursors of the query tree read
+        # their postings records, with or without positions, when they are created.
         self.disk_index.set_phrase_query(self._is_phrase_query(query))
+        planner = QueryPlanner(self.disk_index)
+        query = planner.plan(query)
+        results = PagedResults(query.getCursor(self.disk_index))
 
-        # Fetch postings from the DiskPositionalIndex
-        postings = query.getPostings(self.disk_index)
-
-        # Reset the flag after fetching postings
+        # Reset the flag once the cursors exist
         self.disk_index.set_phrase_query(False)
 
-        return postings
+        return results, planner.cost(query)
 
-    def _display_search_results(self, results):
-        """Display the search results on the ResultsPage."""
-        results_count = len(results)
+    def _display_search_results(self, results, results_count):
+        """Display the search results on the ResultsPage.
+
+        The results are handed over as (doc_id, score) pairs, a list or PagedResults; titles are fetched in one
+        batch per chunk of rows the results frame renders, so results that are never scrolled to are never
+        looked up, nor evaluated for boolean queries."""
         self.view.pages["ResultsPage"].results_frame.update_results_count(results_count)
 
+        self.view.pages["ResultsPage"].results_frame.format_items = self.format_results
+        self.view.pages["ResultsPage"].results_frame.data_items = results
+        self.view.pages["ResultsPage"].results_frame.load_initial_widgets()
+
+    def format_results(self, results):
+        """Formats a chunk of (doc_id, score) results into the data items shown by the results frame."""
+        titles = self.get_document_titles([doc_id for doc_id, _ in results])
         data_items = []
-        for result in results:
-            doc_id, score = result
-            doc_title = self.get_document_title(doc_id)
+        for (doc_id, score), doc_title in zip(results, titles):
             if score > 0:
                 # Handle ranked postings (doc_id, score)
                 data_item = f"Document ID# {doc_id} - {doc_title} - Score: {score:.3f}"
@@ -213,28 +277,22 @@ class SearchManager:
                 # Handle regular postings (just Posting objects)
                 data_item = f"Document ID# {doc_id} - {doc_title}"
             data_items.append(data_item)
+        return data_items
 
-        self.view.pages["ResultsPage"].results_frame.data_items = data_items
-        self.view.pages["ResultsPage"].results_frame.load_initial_widgets()
-
+    def get_document_titles(self, doc_ids):
+        """Retrieve the titles of a batch of documents from the document stores of the index."""
+        if not self.disk_index:
+            return ["Index not loaded"] * len(doc_ids)
+        try:
+            titles = self.disk_index.get_document_titles(doc_ids)
+        except Exception as e:
+            print(f"Error retrieving document titles: {e}")
+            return ["Error retrieving title"] * len(doc_ids)
+        return [title if title is not None else "Title not found" for title in titles]
 
     def get_document_title(self, doc_id):
         """Retrieve the title of a document based on its document ID."""
-        if self.disk_index:
-            try:
-                self.disk_index.db_cursor.execute(
-                    "SELECT title FROM document_metadata WHERE doc_id = ?", (doc_id,)
-                )
-                result = self.disk_index.db_cursor.fetchone()
-                if result:
-                    return result[0]  
-                else:
-                    return "Title not found"
-            except Exception as e:
-                print(f"Error retrieving document title: {e}")
-                return "Error retrieving title"
-        else:
-            return "Index not loaded"
+        return self.get_document_titles([doc_id])[0]
 
     def _handle_search_error(self, exception):
         self.view.pages["ResultsPage"].display_no_results_warning(str(exception))
@@ -306,12 +306,16 @@ class ResultsPage(customtkinter.CTkFrame):
 
 
 class LazyLoading(customtkinter.CTkScrollableFrame):
-    def __init__(self, master, data_items, chunk_size=15, *args, **kwargs):
-        """Initializes the LazyLoading frame with data items and settings."""
+    def __init__(self, master, data_items, chunk_size=15, format_items=None, *args, **kwargs):
+        """Initializes the LazyLoading frame with data items and settings.
+
+        format_items, if given, turns a chunk of data items into the strings the widgets are built from. It is
+        only called for the rows being rendered, so costly lookups are limited to what is shown."""
         super().__init__(master, *args, **kwargs)
 
         self.data_items = data_items
         self.chunk_size = chunk_size
+        self.format_items = format_items
         self.last_loaded_index = -1
 
         self.load_initial_widgets()
@@ -335,8 +339,8 @@ class LazyLoading(customtkinter.CTkScrollableFrame):
 
     def load_initial_widgets(self):
         """Loads the initial set of widgets based on the chunk size."""
-        end = min(self.chunk_size, len(self.data_items))
-        self.load_new_widgets(0, end)
+        # Slicing stops at the last item, so data items that are evaluated lazily are not counted
+        self.load_new_widgets(0, self.chunk_size)
 
     def periodic_check_scroll(self):
         """Periodically checks the scroll position to load more items if needed."""
@@ -354,10 +358,12 @@ class LazyLoading(customtkinter.CTkScrollableFrame):
 
     def load_new_widgets(self, start, end):
         """Loads widgets for data items in the given range (start to end)."""
-        for i in range(start, end):
-            if i < len(self.data_items):
-                widget = self.create_widget_from_data(self.data_items[i])
-                widget.grid(row=i + 1, column=0, sticky="nsew")
+        items = self.data_items[start:end]
+        if items and self.format_items:
+            items = self.format_items(items)
+        for i, item in enumerate(items, start):
+            widget = self.create_widget_from_data(item)
+            widget.grid(row=i + 1, column=0, sticky="nsew")
 
         self.last_loaded_index = end - 1
 
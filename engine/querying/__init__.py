@@ -3,6 +3,10 @@ from .termliteral import TermLiteral
 from .orquery import OrQuery
 from .andquery import AndQuery
 from .phraseliteral import PhraseLiteral
+from .nearliteral import NearLiteral
+from .wildcardliteral import WildcardLiteral
 from .notquery import NotQuery
 from .booleanqueryparser import BooleanQueryParser
+from .queryplanner import EmptyQuery, QueryPlanner
+from .pagedresults import PagedResults
 from .rankedquery import RankedQuery
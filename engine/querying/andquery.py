@@ -1,6 +1,11 @@
 from .querycomponent import QueryComponent
 from engine.indexing import Index, Posting
 from .notquery import NotQuery
+from engine.indexing.postingscursor import DocIdsCursor, IntersectionPostingsCursor, ListPostingsCursor, PostingsCursor
+from engine.indexing.roaringbitmap import RoaringBitmap
+from functools import reduce
+from typing import Optional
+import operator
 
 
 class AndQuery(QueryComponent):
@@ -9,14 +14,69 @@ class AndQuery(QueryComponent):
         self.components = components
 
     def getPostings(self, index: Index) -> list[Posting]:
-        # result = []
-        # TODO: program the merge for an AndQuery, by gathering the postings of the composed QueryComponents and
-        # intersecting the resulting postings.
-        result = self.components[0].getPostings(index)
-        for component in self.components[1:]:
-            not_component = not component.is_positive()
-            new_postings = component.getPostings(index)
-            result = self._and_op(result, new_postings, not_component)
+        if not self.components[0].is_positive():
+            # A leading NOT component starts from the documents without it, which the next components narrow
+            result = self.components[0].getPostings(index)
+            for component in self.components[1:]:
+                not_component = not component.is_positive()
+                # A NOT component on its own is the complement of its component, so the component is subtracted
+                new_postings = component.component.getPostings(index) if not_component else component.getPostings(index)
+                result = self._and_op(result, new_postings, not_component)
+            return result
+
+        return self.getCursor(index).collect()
+
+    def getCursor(self, index: Index) -> PostingsCursor:
+        if not self.components[0].is_positive():
+            return ListPostingsCursor(self.getPostings(index))
+
+        # Frequent terms are stored as bitmaps too. When every component has one, the query is evaluated with
+        # bitmap AND and ANDNOT; otherwise the components with a list drive the intersection and the bitmaps
+        # filter its results, so the postings of the dense terms are never decoded.
+        bitmaps = [self._bitmap(component, index) for component in self.components]
+        if all(bitmap is not None for bitmap in bitmaps):
+            return DocIdsCursor(list(self._combine_bitmaps(bitmaps)))
+        listed = [component for component, bitmap in zip(self.components, bitmaps) if bitmap is None]
+        with_bitmaps = [(component, bitmap) for component, bitmap in zip(self.components, bitmaps) if bitmap is not None]
+        positive_bitmaps = [bitmap for component, bitmap in with_bitmaps if component.is_positive()]
+        negative_bitmaps = [bitmap for component, bitmap in with_bitmaps if not component.is_positive()]
+        if not any(component.is_positive() for component in listed):
+            # Only NOT components have lists: subtract their doc IDs from the intersection of the bitmaps
+            for component in listed:
+                postings = component.component.getPostings(index)
+                negative_bitmaps.append(RoaringBitmap.from_sorted(posting.doc_id for posting in postings))
+            return DocIdsCursor(list(reduce(operator.and_, positive_bitmaps) - reduce(operator.or_, negative_bitmaps)))
+
+        # The cursors are only advanced as far as the results are read
+        return IntersectionPostingsCursor(
+            [component.getCursor(index) for component in listed if component.is_positive()],
+            [component.component.getCursor(index) for component in listed if not component.is_positive()],
+            positive_bitmaps,
+            negative_bitmaps,
+        )
+
+    def getBitmap(self, index: Index) -> Optional[RoaringBitmap]:
+        if not any(component.is_positive() for component in self.components):
+            return None
+        bitmaps = []
+        for component in self.components:
+            bitmap = self._bitmap(component, index)
+            if bitmap is None:
+                return None
+            bitmaps.append(bitmap)
+        return self._combine_bitmaps(bitmaps)
+
+    @staticmethod
+    def _bitmap(component: QueryComponent, index: Index) -> Optional[RoaringBitmap]:
+        """Returns the bitmap of a component, or that of the negated component for a NOT filter."""
+        return component.getBitmap(index) if component.is_positive() else component.component.getBitmap(index)
+
+    def _combine_bitmaps(self, bitmaps) -> RoaringBitmap:
+        """Intersects the bitmaps of the positive components and subtracts those of the NOT components."""
+        result = reduce(operator.and_, (b for c, b in zip(self.components, bitmaps) if c.is_positive()))
+        for component, bitmap in zip(self.components, bitmaps):
+            if not component.is_positive():
+                result -= bitmap
         return result
 
     def _and_op(self, first_postings, second_postings, not_component):
@@ -37,6 +97,9 @@ class AndQuery(QueryComponent):
                 i += 1
             else:
                 j += 1
+        if not_component:
+            # The documents after the last one of the NOT component are all kept
+            result.extend(first_postings[i:])
         return result
 
     def __str__(self):
@@ -1,5 +1,12 @@
 from engine.text import Preprocessing
-from . import AndQuery, OrQuery, QueryComponent, TermLiteral, PhraseLiteral, NotQuery
+from . import AndQuery, OrQuery, QueryComponent, TermLiteral, PhraseLiteral, NotQuery, NearLiteral, WildcardLiteral
+import re
+
+# A proximity operator between two literals of a subquery, such as: angels NEAR/2 baseball
+NEAR_OPERATOR = re.compile(r" *NEAR/(\d+)(?= |$)")
+
+# The characters kept in a wildcard pattern such as comput*, which is matched against the indexed terms as it is
+WILDCARD_CHARACTERS = re.compile(r"[^\w*]")
 
 
 class BooleanQueryParser:
@@ -65,8 +72,11 @@ class BooleanQueryParser:
 
         # Check if this is a NOT component
         if subquery[start_index] == "-":
-            literal = BooleanQueryParser._find_next_literal(
-                subquery, start_index + 1, preprocess
+            # A NOT applies to the whole NEAR query that follows it, if any
+            literal = BooleanQueryParser._near_literal(
+                subquery,
+                BooleanQueryParser._find_next_literal(subquery, start_index + 1, preprocess),
+                preprocess,
             )
             return BooleanQueryParser._Literal(
                 BooleanQueryParser._StringBounds(
@@ -115,12 +125,46 @@ class BooleanQueryParser:
             length_out = sub_length - start_index
         else:
             length_out = next_space - start_index
-        term = preprocess.process(subquery[start_index : start_index + length_out])
+        literal = subquery[start_index : start_index + length_out]
+        if "*" in literal:
+            # A wildcard literal is not stemmed, but matched against the stemmed terms of the vocabulary
+            pattern = WILDCARD_CHARACTERS.sub("", literal.lower())
+            if not pattern.strip("*"):
+                raise ValueError("Malformed wildcard, expected at least one character besides *.")
+            return BooleanQueryParser._Literal(
+                BooleanQueryParser._StringBounds(start_index, length_out), WildcardLiteral(pattern)
+            )
+        term = preprocess.process(literal)
         # This is a term literal containing a single term.
         return BooleanQueryParser._Literal(
             BooleanQueryParser._StringBounds(start_index, length_out), TermLiteral(term)
         )
 
+    @staticmethod
+    def _near_literal(
+        subquery: str, left: "BooleanQueryParser._Literal", preprocess: Preprocessing
+    ) -> "BooleanQueryParser._Literal":
+        """
+        Folds the NEAR/k operators that follow a literal, left to right, into NearLiteral components.
+        """
+        while True:
+            operator = NEAR_OPERATOR.match(subquery, left.bounds.start + left.bounds.length)
+            if operator is None:
+                return left
+
+            k = int(operator.group(1))
+            right_start = operator.end()
+            if k < 1 or not subquery[right_start:].strip():
+                raise ValueError("Malformed NEAR operator, expected NEAR/k with k >= 1 between two literals.")
+            right = BooleanQueryParser._find_next_literal(subquery, right_start, preprocess)
+            if not right.literal_component.is_positive():
+                raise ValueError("NEAR operands cannot be negated.")
+
+            left = BooleanQueryParser._Literal(
+                BooleanQueryParser._StringBounds(left.bounds.start, right.bounds.start + right.bounds.length - left.bounds.start),
+                NearLiteral(left.literal_component, right.literal_component, k),
+            )
+
     @staticmethod
     def parse_query(query: str, preprocess: Preprocessing) -> QueryComponent:
         all_subqueries = []
@@ -143,6 +187,7 @@ class BooleanQueryParser:
                 lit = BooleanQueryParser._find_next_literal(
                     subquery, sub_start, preprocess
                 )
+                lit = BooleanQueryParser._near_literal(subquery, lit, preprocess)
 
                 # Add the literal component to the conjunctive list.
                 subquery_literals.append(lit.literal_component)
@@ -0,0 +1,68 @@
+from engine.indexing import Posting
+from engine.indexing.postingscursor import IntersectionPostingsCursor, PostingsCursor
+from .querycomponent import QueryComponent
+
+
+def near_positions(left: list[int], right: list[int], k: int) -> list[int]:
+    """Returns the positions of right that are at most k positions away from a position of left, in either
+    direction. Both lists are sorted, and are merged in one pass with a window over left."""
+    matches = []
+    i = 0
+    for position in right:
+        # Slide the window to the first position of left that is not more than k before this one
+        while i < len(left) and left[i] < position - k:
+            i += 1
+        if i == len(left):
+            break
+        # The same term on both sides must not match itself
+        j = i + 1 if left[i] == position else i
+        if j < len(left) and left[j] <= position + k:
+            matches.append(position)
+    return matches
+
+
+class NearPostingsCursor(IntersectionPostingsCursor):
+    """A cursor over the documents where a position of the right cursor is within k positions of one of the
+    left cursor. The rarer cursor drives the intersection, as in a phrase, so positions are only merged in
+    the documents that hold both. A match holds the positions of the right cursor, so NEAR queries chain."""
+
+    def __init__(self, left: PostingsCursor, right: PostingsCursor, k: int):
+        self.left = left
+        self.right = right
+        self.k = k
+        self.current = None
+        super().__init__(sorted((left, right), key=lambda cursor: cursor.cost))
+
+    def _accepts(self, doc_id: int) -> bool:
+        positions = near_positions(self.left.positions(), self.right.positions(), self.k)
+        self.current = Posting(doc_id, positions)
+        return bool(positions)
+
+    def posting(self) -> Posting:
+        return self.current
+
+    def positions(self) -> list[int]:
+        return self.current.positions
+
+
+class NearLiteral(QueryComponent):
+    """
+    Represents a NEAR/k proximity query: the left component must occur within k positions of the right one.
+    """
+
+    def __init__(self, left: QueryComponent, right: QueryComponent, k: int):
+        self.left = left
+        self.right = right
+        self.k = k
+
+    def getPostings(self, index) -> list[Posting]:
+        return self.getCursor(index).collect()
+
+    def getCursor(self, index) -> PostingsCursor:
+        return NearPostingsCursor(self.left.getCursor(index), self.right.getCursor(index), self.k)
+
+    def __str__(self) -> str:
+        return f"{self.left} NEAR/{self.k} {self.right}"
+
+    def matches(self, tokens: set) -> bool:
+        return self.left.matches(tokens) and self.right.matches(tokens)
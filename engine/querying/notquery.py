@@ -1,5 +1,7 @@
 from .querycomponent import QueryComponent
 from ..indexing import Index, Posting
+from ..indexing.postingscursor import DocIdsCursor
+from ..indexing.roaringbitmap import RoaringBitmap
 
 
 class NotQuery(QueryComponent):
@@ -10,7 +12,23 @@ class NotQuery(QueryComponent):
         return False
 
     def getPostings(self, index) -> list[Posting]:
-        return self.component.getPostings(index)
+        return self.getCursor(index).collect()
+
+    def getCursor(self, index):
+        # On its own, a NOT query matches the complement of its component among the live documents. AND queries
+        # use the component itself as a filter instead.
+        excluded = self.component.getBitmap(index)
+        if excluded is None:
+            excluded = RoaringBitmap.from_sorted(posting.doc_id for posting in self.component.getPostings(index))
+        return DocIdsCursor(list(self._documents(index) - excluded))
+
+    @staticmethod
+    def _documents(index) -> RoaringBitmap:
+        """Returns the live documents of the index, or those of its postings if it cannot list them."""
+        if hasattr(index, "get_live_documents"):
+            return index.get_live_documents()
+        doc_ids = {posting.doc_id for term in index.getVocabulary() for posting in index.getPostings(term)}
+        return RoaringBitmap.from_sorted(sorted(doc_ids))
 
     def __str__(self):
         return f"NOT ({str(self.component)})"
@@ -1,6 +1,10 @@
 from .querycomponent import QueryComponent
 from engine.indexing import Index, Posting
-from . import querycomponent
+from engine.indexing.postingscursor import DocIdsCursor, PostingsCursor, UnionPostingsCursor
+from engine.indexing.roaringbitmap import RoaringBitmap
+from functools import reduce
+from typing import Optional
+import operator
 
 
 class OrQuery(QueryComponent):
@@ -8,16 +12,26 @@ class OrQuery(QueryComponent):
         self.components = components
 
     def getPostings(self, index: Index) -> list[Posting]:
-        document_ids = set()
-        postings = []
+        return self.getCursor(index).collect()
 
-        for component in self.components:
-            for posting in component.getPostings(index):
-                if posting.doc_id not in document_ids:
-                    postings.append(posting)
-                    document_ids.add(posting.doc_id)
+    def getCursor(self, index: Index) -> PostingsCursor:
+        # Bitmaps hold no positions, so a union that phrase or NEAR queries read positions from is merged
+        bitmap = None if getattr(index, "is_phrase_query", False) else self.getBitmap(index)
+        if bitmap is not None:
+            return DocIdsCursor(list(bitmap))
+        # The cursors of the components are merged lazily in doc ID order, so a parent AND query can advance
+        # the union past the documents it does not need
+        return UnionPostingsCursor(component.getCursor(index) for component in self.components)
 
-        return postings
+    def getBitmap(self, index: Index) -> Optional[RoaringBitmap]:
+        # A union of frequent terms is a bitmap OR; one list among them is merged with the heap instead
+        bitmaps = []
+        for component in self.components:
+            bitmap = component.getBitmap(index)
+            if bitmap is None:
+                return None
+            bitmaps.append(bitmap)
+        return reduce(operator.or_, bitmaps)
 
     def __str__(self):
         return "(" + " OR ".join(map(str, self.components)) + ")"
@@ -0,0 +1,40 @@
+from engine.indexing.postingscursor import PostingsCursor
+
+
+class PagedResults:
+    """The results of a boolean query, pulled from the cursor of its query tree only as far as they are read.
+
+    Slices give (doc_id, 0) pairs, like the (doc_id, score) pairs of ranked results, so the results frame can
+    render the first page of a broad query without the whole result set being evaluated, and pull the next
+    pages as the user scrolls."""
+
+    def __init__(self, cursor: PostingsCursor):
+        self.cursor = cursor
+        self.doc_ids = []
+
+    @property
+    def exhausted(self) -> bool:
+        """True once every result has been pulled."""
+        return self.cursor.doc_id is None
+
+    def _fetch(self, count=None):
+        """Pulls results until count of them are known, or all of them if count is None."""
+        while self.cursor.doc_id is not None and (count is None or len(self.doc_ids) < count):
+            self.doc_ids.append(self.cursor.doc_id)
+            self.cursor.next()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            self._fetch(key.stop)
+            return [(doc_id, 0) for doc_id in self.doc_ids[key]]
+        self._fetch(key + 1)
+        return self.doc_ids[key], 0
+
+    def __bool__(self) -> bool:
+        self._fetch(1)
+        return bool(self.doc_ids)
+
+    def __len__(self) -> int:
+        """Returns the number of results, which evaluates the whole query."""
+        self._fetch()
+        return len(self.doc_ids)
@@ -1,8 +1,64 @@
 from engine.indexing import Posting
+from engine.indexing.postingscursor import IntersectionPostingsCursor, ListPostingsCursor, PostingsCursor, gallop
 from .querycomponent import QueryComponent
 from .termliteral import TermLiteral
 
 
+def intersect_positions(starts: list[int], positions: list[int], offset: int) -> list[int]:
+    """Returns the phrase starts s, in order, such that s + offset is in positions.
+
+    Both lists are sorted. The shorter list is walked and the longer one is galloped over, so a rare term
+    checked against a common one costs O(r log(c / r)) instead of O(r * c)."""
+    matches = []
+    j = 0
+    if len(starts) <= len(positions):
+        for start in starts:
+            j = gallop(positions, start + offset, j)
+            if j == len(positions):
+                break
+            if positions[j] == start + offset:
+                matches.append(start)
+    else:
+        for position in positions:
+            j = gallop(starts, position - offset, j)
+            if j == len(starts):
+                break
+            if starts[j] == position - offset:
+                matches.append(starts[j])
+    return matches
+
+
+class PhrasePostingsCursor(IntersectionPostingsCursor):
+    """A cursor over the documents where the cursors' positions form a phrase.
+
+    The cursor at phrase offset i of a phrase starting at s occurs at s + i. The cursors are intersected rarest
+    first, so positions are only decoded once every cursor is on a document, and its phrase starts are narrowed
+    cursor by cursor, stopping as soon as none are left. Like a pairwise intersection, a match holds the
+    positions of the phrase's last literal."""
+
+    def __init__(self, cursors: list[PostingsCursor]):
+        ordered = sorted(enumerate(cursors), key=lambda item: item[1].cost)
+        self.offsets = [offset for offset, _ in ordered]
+        self.last_offset = len(cursors) - 1
+        self.current = None
+        super().__init__([cursor for _, cursor in ordered])
+
+    def _accepts(self, doc_id: int) -> bool:
+        starts = [position - self.offsets[0] for position in self.cursors[0].positions()]
+        for offset, cursor in zip(self.offsets[1:], self.cursors[1:]):
+            starts = intersect_positions(starts, cursor.positions(), offset)
+            if not starts:
+                return False
+        self.current = Posting(doc_id, [start + self.last_offset for start in starts])
+        return True
+
+    def posting(self) -> Posting:
+        return self.current
+
+    def positions(self) -> list[int]:
+        return self.current.positions
+
+
 class PhraseLiteral(QueryComponent):
     """
     Represents a phrase literal consisting of one or more terms that must occur in sequence.
@@ -12,46 +68,25 @@ class PhraseLiteral(QueryComponent):
         self.literals = terms
 
     def getPostings(self, index) -> list[Posting]:
-        if not self.literals or not isinstance(self.literals[0], TermLiteral):
-            return []
-
-        postings_lists = [
-            literal.getPostings(index)
-            for literal in self.literals
-            if isinstance(literal, QueryComponent)
-        ]
-
-        if not postings_lists or not all(postings_lists):
-            return []
+        return self.getCursor(index).collect()
 
-        result_postings = postings_lists[0]
-
-        for next_postings in postings_lists[1:]:
-            result_postings = PhraseLiteral.positional_intersect(
-                result_postings, next_postings
-            )
-
-        return result_postings
+    def getCursor(self, index) -> PostingsCursor:
+        if not self.literals or not isinstance(self.literals[0], TermLiteral):
+            return ListPostingsCursor([])
+        return PhrasePostingsCursor([literal.getCursor(index) for literal in self.literals])
 
     @staticmethod
     def positional_intersect(p1: list[Posting], p2: list[Posting]) -> list[Posting]:
+        """Returns the postings of the documents where a position of p2 directly follows one of p1, with the
+        positions of p2."""
         answer = []
         i, j = 0, 0
 
         while i < len(p1) and j < len(p2):
             if p1[i].doc_id == p2[j].doc_id:
-                l_positions = p1[i].positions
-                r_positions = p2[j].positions
-
-                # Find matching positions
-                positions = []
-                for pos in l_positions:
-                    if (pos + 1) in r_positions:
-                        positions.append(pos + 1)
-
+                positions = [start + 1 for start in intersect_positions(p1[i].positions, p2[j].positions, 1)]
                 if positions:
-                    posting = Posting(p1[i].doc_id, positions)
-                    answer.append(posting)
+                    answer.append(Posting(p1[i].doc_id, positions))
 
                 i += 1
                 j += 1
@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
 from engine.indexing import Posting
+from engine.indexing.postingscursor import ListPostingsCursor, PostingsCursor
+from engine.indexing.roaringbitmap import RoaringBitmap
+from typing import Optional
 
 
 class QueryComponent(ABC):
@@ -15,6 +18,19 @@ class QueryComponent(ABC):
         """
         pass
 
+    def getCursor(self, index) -> PostingsCursor:
+        """
+        Retrieves a cursor over the postings of the query component, which AND queries advance with skips.
+        """
+        return ListPostingsCursor(self.getPostings(index))
+
+    def getBitmap(self, index) -> Optional[RoaringBitmap]:
+        """
+        Retrieves the doc IDs of the query component as a bitmap if the index stores them that way, which boolean
+        operators combine with bitmap AND, OR and ANDNOT. Returns None if its postings must be merged as lists.
+        """
+        return None
+
     def is_positive(self) -> bool:
         """
         Returns true for all QueryComponents except for NotQuery components.
@@ -0,0 +1,159 @@
+from engine.indexing import Posting
+from .andquery import AndQuery
+from .nearliteral import NearLiteral
+from .notquery import NotQuery
+from .orquery import OrQuery
+from .phraseliteral import PhraseLiteral
+from .querycomponent import QueryComponent
+from .termliteral import TermLiteral
+from .wildcardliteral import WildcardLiteral
+
+
+class EmptyQuery(QueryComponent):
+    """
+    A query component that matches no document, which the planner puts in place of a component that needs a
+    term missing from the index.
+    """
+
+    def __init__(self, component: QueryComponent):
+        self.component = component
+
+    def getPostings(self, index) -> list[Posting]:
+        return []
+
+    def __str__(self) -> str:
+        return f"EMPTY ({self.component})"
+
+    def matches(self, tokens: set) -> bool:
+        return False
+
+
+class QueryPlanner:
+    """Rewrites the query tree of BooleanQueryParser.parse_query into a cheaper equivalent one.
+
+    Nested AND and OR queries are flattened, the conjuncts of an AND query are ordered by their estimated
+    number of postings with NOT components last, as filters, and a component that needs a term missing from
+    the index becomes an EmptyQuery, which empties the AND queries above it. Estimates come from the document
+    frequencies of the term dictionaries, so planning decodes no postings."""
+
+    def __init__(self, index):
+        self.index = index
+        self.frequencies = {}
+        self.documents = None
+
+    def document_count(self) -> int:
+        """Returns the number of live documents, which NOT queries match the complement within."""
+        if self.documents is None:
+            self.documents = len(NotQuery._documents(self.index))
+        return self.documents
+
+    def document_frequency(self, term: str) -> int:
+        if term not in self.frequencies:
+            if hasattr(self.index, "estimate_document_frequency"):
+                self.frequencies[term] = self.index.estimate_document_frequency(term)
+            else:
+                self.frequencies[term] = len(list(self.index.getPostings(term)))
+        return self.frequencies[term]
+
+    def cost(self, component: QueryComponent) -> int:
+        """Estimates the number of postings of a component: the df of a term, the smallest estimate of the
+        components of a phrase, NEAR or AND query, and the sum of those of an OR query or of the terms a wildcard
+        expands to. A NOT query matches the documents without its component, and an AND query of only NOT
+        components at most as many as the most selective of them."""
+        if isinstance(component, TermLiteral):
+            return self.document_frequency(component.term)
+        if isinstance(component, EmptyQuery):
+            return 0
+        if isinstance(component, WildcardLiteral):
+            return sum(map(self.document_frequency, component.terms(self.index)))
+        if isinstance(component, PhraseLiteral):
+            return min(self.cost(literal) for literal in component.literals)
+        if isinstance(component, NearLiteral):
+            return min(self.cost(component.left), self.cost(component.right))
+        if isinstance(component, NotQuery):
+            return max(0, self.document_count() - self.cost(component.component))
+        if isinstance(component, AndQuery):
+            positive = [self.cost(c) for c in component.components if c.is_positive()]
+            if positive:
+                return min(positive)
+            return max(0, self.document_count() - max(self.cost(c.component) for c in component.components))
+        if isinstance(component, OrQuery):
+            return sum(self.cost(c) for c in component.components)
+        return len(component.getPostings(self.index))
+
+    def plan(self, component: QueryComponent) -> QueryComponent:
+        """Returns the planned query tree of a component."""
+        if isinstance(component, TermLiteral):
+            return component if self.document_frequency(component.term) else EmptyQuery(component)
+        if isinstance(component, WildcardLiteral):
+            return component if component.terms(self.index) else EmptyQuery(component)
+        if isinstance(component, PhraseLiteral):
+            if any(isinstance(literal, TermLiteral) and not self.cost(literal) for literal in component.literals):
+                return EmptyQuery(component)
+            return component
+        if isinstance(component, NearLiteral):
+            left, right = self.plan(component.left), self.plan(component.right)
+            if isinstance(left, EmptyQuery) or isinstance(right, EmptyQuery):
+                return EmptyQuery(component)
+            return NearLiteral(left, right, component.k)
+        if isinstance(component, NotQuery):
+            return NotQuery(self.plan(component.component))
+        if isinstance(component, OrQuery):
+            return self._plan_or(component)
+        if isinstance(component, AndQuery):
+            return self._plan_and(component)
+        return component
+
+    def _plan_or(self, query: OrQuery) -> QueryComponent:
+        components = []
+        for component in map(self.plan, query.components):
+            if isinstance(component, OrQuery):
+                components.extend(component.components)
+            elif not isinstance(component, EmptyQuery):
+                components.append(component)
+        if not components:
+            return EmptyQuery(query)
+        return components[0] if len(components) == 1 else OrQuery(components)
+
+    def _plan_and(self, query: AndQuery) -> QueryComponent:
+        components = []
+        for component in map(self.plan, query.components):
+            components.extend(component.components if isinstance(component, AndQuery) else [component])
+
+        positive = [component for component in components if component.is_positive()]
+        if not positive:
+            # Only NOT components: AndQuery starts from the documents without the first one
+            return components[0] if len(components) == 1 else AndQuery(components)
+        if any(isinstance(component, EmptyQuery) for component in positive):
+            return EmptyQuery(query)
+
+        # A NOT of nothing filters nothing out
+        negative = [
+            component
+            for component in components
+            if not component.is_positive() and not isinstance(component.component, EmptyQuery)
+        ]
+        components = sorted(positive, key=self.cost) + negative
+        return components[0] if len(components) == 1 else AndQuery(components)
+
+    def explain(self, component: QueryComponent) -> str:
+        """Plans a component, prints the chosen plan with the estimated cost of each of its components, and
+        returns it."""
+        lines = []
+        self._explain(self.plan(component), 0, lines)
+        plan = "\n".join(lines)
+        print(plan)
+        return plan
+
+    def _explain(self, component: QueryComponent, depth: int, lines: list[str]):
+        indent = "  " * depth
+        if isinstance(component, (AndQuery, OrQuery)):
+            operator = "AND" if isinstance(component, AndQuery) else "OR"
+            lines.append(f"{indent}{operator} (est. {self.cost(component)} postings)")
+            for child in component.components:
+                self._explain(child, depth + 1, lines)
+        elif isinstance(component, NotQuery):
+            lines.append(f"{indent}NOT filter (est. {self.cost(component.component)} postings)")
+            self._explain(component.component, depth + 1, lines)
+        else:
+            lines.append(f"{indent}{component} (est. {self.cost(component)} postings)")
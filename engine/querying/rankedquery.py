@@ -1,14 +1,48 @@
+from engine.indexing.impactindex import IMPACT_LEVELS, OKAPI_IMPACT_SCALE, TFIDF_IMPACT_SCALE
+from engine.indexing.postingarrays import HAS_NUMPY, np
+from collections import deque
+from itertools import accumulate
+import heapq
 import math
 
+# Score bounds are padded by this fraction, so rounding differences between a bound and the score it bounds
+# never prune a document that belongs in the top k
+BOUND_SLACK = 1e-9
+
 class RankedQuery:
-    def __init__(self, index):
+    def __init__(self, index, vectorized=None, pruned=None, impact_ordered=False, postings_budget=None, champions=False):
+        """vectorized picks the NumPy scoring path; by default it is used when NumPy is installed and the index
+        can serve postings as arrays. pruned picks MaxScore document-at-a-time scoring for top-k queries; by
+        default it is used when the index stores score bounds for its terms and the NumPy path is not used,
+        since scoring whole arrays beats skipping postings one at a time in Python.
+
+        impact_ordered picks score-at-a-time ranking over the impact-ordered postings of the index, which stops
+        after postings_budget postings, if given, or once the top k cannot change. champions picks champion list
+        ranking for top-k queries."""
         self.index = index
         self.total_docs = self.index.get_total_documents()
         self.avg_doc_length = self.index.calculate_average_doc_length()
-        self.ld = self.index.get_doc_weights()
+        if vectorized is None:
+            vectorized = HAS_NUMPY and hasattr(index, "getPostingArrays")
+        self.vectorized = vectorized
+        if pruned is None:
+            pruned = hasattr(index, "get_score_bounds") and not vectorized
+        self.pruned = pruned
+        if impact_ordered and not index.has_impacts():
+            raise ValueError("The index has no impact-ordered postings")
+        self.impact_ordered = impact_ordered
+        self.postings_budget = postings_budget
+        if champions and not index.has_champions():
+            raise ValueError("The index has no champion lists")
+        self.champions = champions
+        # Postings scored by the last top-k query of the pruned, champion list or impact-ordered path
+        self.scored_postings = 0
 
     def calculate_wqt(self, term, use_okapi):
-        df = len(self.index.getPostings(term))
+        df = self.index.get_document_frequency(term)
+        return self._wqt(df, use_okapi)
+
+    def _wqt(self, df, use_okapi):
         if use_okapi:
             wqt = max(0.1, math.log((self.total_docs - df + 0.5) / (df + 0.5)))
         else:
@@ -24,34 +58,268 @@ class RankedQuery:
             wdt = 1 + math.log(tf)
         return wdt
 
-    def rank_documents(self, raw_query, use_okapi):
+    def _wdt(self, tf, doc_id, use_okapi):
+        """Same as calculate_wdt, from the tf of a posting and the precomputed Okapi length normalizer."""
+        if use_okapi:
+            return 2.2 * tf / (self.index.doc_stats.okapi_normalizers[doc_id] + tf)
+        return 1 + math.log(tf)
+
+    def _max_wdt(self, term, use_okapi):
+        """Returns an upper bound of the wdt / L_d of the term in any document, from its score bounds."""
+        max_tf, max_weight, min_length_ratio = self.index.get_score_bounds(term)
+        if not use_okapi:
+            return max_weight
+        # 2.2 * tf / (1.2 * (0.25 + 0.75 * length / avg) + tf) grows with tf and shrinks with length / tf
+        avg_doc_length = self.index.doc_stats.avg_doc_length
+        relative_ratio = min_length_ratio / avg_doc_length if avg_doc_length else 0
+        return 2.2 / (1 + 0.3 / max_tf + 0.9 * relative_ratio)
+
+    def rank_documents(self, raw_query, use_okapi, top_k=None):
+        """Scores the documents that contain a query term, best first.
+
+        If top_k is given, only the top_k best are returned, ties going to the lowest doc IDs."""
         # Preprocess the query to split it into individual terms
         terms = self.preprocess_query(raw_query)
-        
+        if self.impact_ordered:
+            return self._rank_impacts(terms, use_okapi, top_k)
+        if top_k is not None and self.champions:
+            ranked = self._rank_champions(terms, use_okapi, top_k)
+            if ranked is not None:
+                return ranked
+        if top_k is not None and self.pruned:
+            return self._rank_max_score(terms, use_okapi, top_k)
+        if self.vectorized:
+            return self._rank_arrays(terms, use_okapi, top_k)
+        return self._rank_postings(terms, use_okapi, top_k)
+
+    def _rank_postings(self, terms, use_okapi, top_k):
+        """Scores every posting of every term, one Posting at a time."""
         accumulators = {}
-        doc_lengths = self.index.get_doc_weights()
+        doc_weights = self.index.doc_stats.weights
 
         for term in terms:
-            wqt = self.calculate_wqt(term, use_okapi)
             postings = self.index.getPostings(term)
+            if not postings:
+                continue
+            wqt = self.calculate_wqt(term, use_okapi)
 
             for posting in postings:
                 doc_id = posting.doc_id
-                wdt = self.calculate_wdt(term, doc_id, use_okapi)
+                # The tf comes with the posting and the length from the doc stats, so nothing is read here
+                wdt = self._wdt(posting.tf, doc_id, use_okapi)
 
                 if use_okapi:
                     L_d = 1
                 else:
-                    L_d = self.ld.get(doc_id, 1)
+                    L_d = doc_weights[doc_id]
 
                 if doc_id not in accumulators:
-                    accumulators[doc_id] = 0 
+                    accumulators[doc_id] = 0
                 accumulators[doc_id] += (wqt * wdt) / L_d
 
         # Sort documents by score in descending order
-        ranked_documents = sorted(accumulators.items(), key=lambda item: item[1], reverse=True)
-        return ranked_documents
+        if top_k is not None:
+            return heapq.nsmallest(top_k, accumulators.items(), key=lambda item: (-item[1], item[0]))
+        return sorted(accumulators.items(), key=lambda item: item[1], reverse=True)
+
+    def _rank_champions(self, terms, use_okapi, top_k):
+        """Scores only the documents in the champion lists of the terms, or returns None if there are fewer
+        than top_k of them, so the full postings lists must be scored.
+
+        The candidates get their exact scores: every term's cursor advances through them in doc ID order,
+        jumping over the postings of other documents, so the long lists are mostly skipped rather than read."""
+        candidates = set()
+        for term in terms:
+            candidates.update(self.index.get_champion_doc_ids(term))
+        if len(candidates) < top_k:
+            return None
+        candidates = sorted(candidates)
+
+        self.scored_postings = 0
+        accumulators = {}
+        doc_weights = self.index.doc_stats.weights
+        for term in terms:
+            df = self.index.get_document_frequency(term)
+            if not df:
+                continue
+            wqt = self._wqt(df, use_okapi)
+            cursor = self.index.getCursor(term)
+            for doc_id in candidates:
+                found = cursor.advance(doc_id)
+                if found is None:
+                    break
+                if found == doc_id:
+                    L_d = 1 if use_okapi else doc_weights[doc_id]
+                    accumulators[doc_id] = accumulators.get(doc_id, 0) + (wqt * self._wdt(cursor.tftd, doc_id, use_okapi)) / L_d
+                    self.scored_postings += 1
+        return heapq.nsmallest(top_k, accumulators.items(), key=lambda item: (-item[1], item[0]))
+
+    def _rank_arrays(self, terms, use_okapi, top_k):
+        """Scores with array operations over the doc ID and term frequency arrays of each term, accumulating into
+        a dense array with one score per document."""
+        # Views of the doc stats arrays, so they follow the index when it is reloaded
+        weights = np.frombuffer(self.index.doc_stats.weights, dtype=np.float64)
+        okapi_normalizers = np.frombuffer(self.index.doc_stats.okapi_normalizers, dtype=np.float64)
+        accumulators = np.zeros(len(weights))
+        matched = np.zeros(len(weights), dtype=bool)
+
+        for term in terms:
+            doc_ids, tfs = self.index.getPostingArrays(term)
+            if len(doc_ids) == 0:
+                continue
+            wqt = self._wqt(len(doc_ids), use_okapi)
+            if use_okapi:
+                wdt = 2.2 * tfs / (okapi_normalizers[doc_ids] + tfs)
+                accumulators[doc_ids] += wqt * wdt
+            else:
+                wdt = 1 + np.log(tfs)
+                accumulators[doc_ids] += wqt * wdt / weights[doc_ids]
+            matched[doc_ids] = True
+
+        doc_ids = np.flatnonzero(matched)
+        scores = accumulators[doc_ids]
+        if top_k is not None and top_k < len(doc_ids):
+            # Only sort the top_k best scores
+            best = np.argpartition(-scores, top_k - 1)[:top_k] if top_k > 0 else np.zeros(0, dtype=np.int64)
+            doc_ids, scores = doc_ids[best], scores[best]
+        order = np.lexsort((doc_ids, -scores))
+        return list(zip(doc_ids[order].tolist(), scores[order].tolist()))
+
+    def _rank_max_score(self, terms, use_okapi, top_k):
+        """Scores document-at-a-time with MaxScore pruning, keeping the top_k best documents in a min-heap.
+
+        Terms are sorted by the most they can add to a score. Once the heap is full, the terms whose bounds
+        add up to no more than the worst score in the heap are non-essential: a document that only they
+        contain cannot enter the heap, so only the postings of the other terms drive the evaluation, and the
+        non-essential terms are only looked up, best first, while the document can still make it."""
+        self.scored_postings = 0
+        doc_weights = self.index.doc_stats.weights
+        scorers = []
+        for position, term in enumerate(terms):
+            df = self.index.get_document_frequency(term)
+            if not df:
+                continue
+            wqt = self._wqt(df, use_okapi)
+            bound = wqt * self._max_wdt(term, use_okapi) * (1 + BOUND_SLACK)
+            scorers.append((bound, position, wqt, self.index.getCursor(term)))
+        if top_k <= 0 or not scorers:
+            return []
+        scorers.sort(key=lambda scorer: scorer[0])
+        cumulative_bounds = list(accumulate(scorer[0] for scorer in scorers))
+
+        # The worst of the best documents is at the top of the heap: lowest score, then highest doc ID
+        heap = []
+        threshold = -math.inf
+        first_essential = 0
+        while True:
+            doc_id = min(
+                (scorer[3].doc_id for scorer in scorers[first_essential:] if scorer[3].doc_id is not None),
+                default=None,
+            )
+            if doc_id is None:
+                break
+            L_d = 1 if use_okapi else doc_weights[doc_id]
+
+            contributions = {}
+            for _, position, wqt, cursor in scorers[first_essential:]:
+                if cursor.doc_id == doc_id:
+                    contributions[position] = (wqt * self._wdt(cursor.tftd, doc_id, use_okapi)) / L_d
+                    cursor.next()
+            score = sum(contributions.values())
+            self.scored_postings += len(contributions)
+
+            candidate = True
+            for i in range(first_essential - 1, -1, -1):
+                if score + cumulative_bounds[i] <= threshold:
+                    candidate = False
+                    break
+                _, position, wqt, cursor = scorers[i]
+                if cursor.advance(doc_id) == doc_id:
+                    contribution = (wqt * self._wdt(cursor.tftd, doc_id, use_okapi)) / L_d
+                    contributions[position] = contribution
+                    score += contribution
+                    self.scored_postings += 1
+            if not candidate:
+                continue
+
+            # Sum in query order, like exhaustive scoring, so the scores are the same to the last bit
+            score = sum(contributions[position] for position in sorted(contributions))
+            if len(heap) < top_k:
+                heapq.heappush(heap, (score, -doc_id))
+            elif score > threshold:
+                heapq.heapreplace(heap, (score, -doc_id))
+            else:
+                continue
+            if len(heap) == top_k:
+                threshold = heap[0][0]
+                while first_essential < len(scorers) and cumulative_bounds[first_essential] <= threshold:
+                    first_essential += 1
+
+        return [(-negated_doc_id, score) for score, negated_doc_id in sorted(heap, key=lambda entry: (-entry[0], -entry[1]))]
+
+    def _rank_impacts(self, terms, use_okapi, top_k):
+        """Scores score-at-a-time: the impact blocks of all terms are processed from the largest contribution
+        wqt * impact down, so the best documents gather most of their score first.
+
+        Processing stops once postings_budget postings were scored, or once the remaining blocks cannot change
+        which documents are in the top k: the k-th best score must exceed both the (k + 1)-th plus the most
+        the remaining blocks can add, and that most itself. Scores are sums of quantized impacts, so they
+        approximate the exact ones, and they may miss the contributions of the blocks left unprocessed."""
+        self.scored_postings = 0
+        if top_k is not None and top_k <= 0:
+            return []
+        unit = (OKAPI_IMPACT_SCALE if use_okapi else TFIDF_IMPACT_SCALE) / IMPACT_LEVELS
+        blocks = []
+        remaining = {}
+        for position, term in enumerate(terms):
+            df = self.index.get_document_frequency(term)
+            if not df:
+                continue
+            wqt = self._wqt(df, use_okapi)
+            contributions = [
+                (wqt * block.impact * unit, position, block) for block in self.index.get_impact_blocks(term, use_okapi)
+            ]
+            # The contributions of a term's blocks not processed yet, largest first
+            remaining[position] = deque(contribution for contribution, _, _ in contributions)
+            blocks.extend(contributions)
+        blocks.sort(key=lambda block: block[0], reverse=True)
+
+        live_docs = self.index.live_docs if self.index.live_docs.pending_count else None
+        accumulators = {}
+        next_check = 1
+        for contribution, position, block in blocks:
+            doc_ids = block.doc_ids()
+            if self.postings_budget is not None:
+                doc_ids = doc_ids[: self.postings_budget - self.scored_postings]
+            for doc_id in doc_ids:
+                if live_docs is None or live_docs.is_live(doc_id):
+                    accumulators[doc_id] = accumulators.get(doc_id, 0) + contribution
+            self.scored_postings += len(doc_ids)
+            remaining[position].popleft()
+            if self.postings_budget is not None and self.scored_postings >= self.postings_budget:
+                break
+
+            # The stability check sorts the accumulators, so it is only made each time the scored postings double
+            if top_k is not None and self.scored_postings >= next_check:
+                next_check = 2 * self.scored_postings
+                if self._top_k_stable(accumulators, top_k, sum(bound[0] for bound in remaining.values() if bound)):
+                    break
+
+        if top_k is not None:
+            return heapq.nsmallest(top_k, accumulators.items(), key=lambda item: (-item[1], item[0]))
+        return sorted(accumulators.items(), key=lambda item: (-item[1], item[0]))
+
+    @staticmethod
+    def _top_k_stable(accumulators, top_k, remaining_bound) -> bool:
+        """Returns True if no document can enter or leave the top k once the remaining blocks, which add at most
+        remaining_bound to any score, are processed."""
+        if len(accumulators) < top_k:
+            return False
+        best = heapq.nlargest(top_k + 1, accumulators.values())
+        kth_score = best[top_k - 1]
+        next_score = best[top_k] if len(best) > top_k else 0
+        return kth_score > next_score + remaining_bound
 
     def preprocess_query(self, raw_query):
-        processed_terms = raw_query.lower().split()  
-        return processed_terms
\ No newline at end of file
+        processed_terms = raw_query.lower().split()
+        return processed_terms
@@ -13,6 +13,13 @@ class TermLiteral(QueryComponent):
     def getPostings(self, index) -> list[Posting]:
         return index.getPostings(self.term)
 
+    def getCursor(self, index):
+        return index.getCursor(self.term)
+
+    def getBitmap(self, index):
+        # Only frequent terms have a bitmap
+        return index.get_bitmap(self.term) if hasattr(index, "get_bitmap") else None
+
     def __str__(self) -> str:
         return self.term
 
@@ -0,0 +1,64 @@
+from config import WILDCARD_MAX_TERMS
+from engine.indexing import Posting
+from engine.indexing.kgramindex import wildcard_regex
+from engine.indexing.postingscursor import ListPostingsCursor, PostingsCursor
+from engine.indexing.roaringbitmap import RoaringBitmap
+from .orquery import OrQuery
+from .querycomponent import QueryComponent
+from .termliteral import TermLiteral
+from typing import Optional
+import heapq
+
+
+class WildcardLiteral(QueryComponent):
+    """
+    A WildcardLiteral represents a term pattern in a subquery, such as comput*, *tion or c*t, where * stands for
+    any run of characters. It matches the documents of any term of the vocabulary that fits the pattern, of
+    which at most max_terms, the most frequent ones, are kept.
+    """
+
+    def __init__(self, pattern: str, max_terms: int = WILDCARD_MAX_TERMS):
+        self.pattern = pattern
+        self.max_terms = max_terms
+        self._expansion = None
+
+    def terms(self, index) -> list[str]:
+        """Returns the terms the pattern expands to in an index, in sorted order."""
+        if self._expansion is None or self._expansion[0] is not index:
+            if hasattr(index, "expand_wildcard"):
+                terms = index.expand_wildcard(self.pattern)
+            else:
+                regex = wildcard_regex(self.pattern)
+                terms = sorted(term for term in index.getVocabulary() if regex.fullmatch(term))
+            if len(terms) > self.max_terms:
+                terms = sorted(heapq.nlargest(self.max_terms, terms, key=lambda term: _document_frequency(index, term)))
+            self._expansion = (index, terms)
+        return self._expansion[1]
+
+    def _query(self, index) -> Optional[OrQuery]:
+        terms = self.terms(index)
+        return OrQuery([TermLiteral(term) for term in terms]) if terms else None
+
+    def getPostings(self, index) -> list[Posting]:
+        return self.getCursor(index).collect()
+
+    def getCursor(self, index) -> PostingsCursor:
+        query = self._query(index)
+        return query.getCursor(index) if query else ListPostingsCursor([])
+
+    def getBitmap(self, index) -> Optional[RoaringBitmap]:
+        query = self._query(index)
+        return query.getBitmap(index) if query else None
+
+    def __str__(self) -> str:
+        return self.pattern
+
+    def matches(self, tokens: set) -> bool:
+        regex = wildcard_regex(self.pattern)
+        return any(regex.fullmatch(token) for token in tokens)
+
+
+def _document_frequency(index, term: str) -> int:
+    if hasattr(index, "estimate_document_frequency"):
+        return index.estimate_document_frequency(term)
+    return len(list(index.getPostings(term)))
@@ -0,0 +1,50 @@
+from engine.indexing.codecs import CODECS, get_codec
+import pytest
+
+values = [0, 1, 127, 128, 255, 256, 16383, 16384, 65535, 65536, 2**24 - 1, 2**24, 2**32 - 1, 3, 7]
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_round_trip(name):
+    codec = get_codec(name)
+    data = codec.encode(values)
+    decoded, offset = codec.decode(data, 0, len(values))
+    assert decoded == values
+    assert offset == len(data)
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_consecutive_sequences(name):
+    codec = get_codec(name)
+    data = codec.encode([5, 3]) + codec.encode([1, 300, 70000]) + codec.encode([9])
+    first, offset = codec.decode(data, 0, 2)
+    offset = codec.skip(data, offset, 3)
+    last, offset = codec.decode(data, offset, 1)
+    assert first == [5, 3]
+    assert last == [9]
+    assert offset == len(data)
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_streamable_codecs_decode_separate_runs_at_once(name):
+    codec = get_codec(name)
+    runs = [[5, 3], [1, 300, 70000], [9]]
+    data = b"".join(codec.encode(run) for run in runs)
+    assert codec.streamable == (data == codec.encode(value for run in runs for value in run))
+    if codec.streamable:
+        assert codec.decode(memoryview(data), 0, 6) == ([5, 3, 1, 300, 70000, 9], len(data))
+        assert codec.decode_all(memoryview(data)) == [5, 3, 1, 300, 70000, 9]
+        assert codec.decode_all(codec.encode(range(100))) == list(range(100))
+        assert codec.decode_all(b"") == []
+
+
+def test_small_values_compress():
+    small = list(range(100))
+    assert len(get_codec("vbyte").encode(small)) == 100
+    assert len(get_codec("group_varint").encode(small)) == 125
+    assert len(get_codec("raw").encode(small)) == 400
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("gamma")
@@ -55,3 +55,19 @@ def test_directorycorpus():
 
         doc = corpus.get_document(999)
         assert doc is None
+
+
+# Test for loading a single file of a DirectoryCorpus
+def test_load_document_from_directory(tmp_path):
+    (tmp_path / "doc.json").write_text(json.dumps(json_content))
+    (tmp_path / "doc.txt").write_text(text_content)
+    (tmp_path / "doc.csv").write_text("a,b")
+    corpus = DirectoryCorpus(tmp_path)
+
+    json_document = corpus.load_document(tmp_path / "doc.json", 7)
+    assert (json_document.id, json_document.title) == (7, "test")
+    assert corpus.load_document(tmp_path / "doc.txt").title == "doc"
+    with pytest.raises(FileNotFoundError):
+        corpus.load_document(tmp_path / "missing.txt")
+    with pytest.raises(ValueError):
+        corpus.load_document(tmp_path / "doc.csv")
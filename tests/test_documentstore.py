@@ -0,0 +1,24 @@
+from engine.indexing.documentstore import DocumentStore, DocumentStoreWriter
+
+
+def test_document_store_roundtrips_titles_and_paths(tmp_path):
+    documents = [("Yosemite", "corpus/yosemite.json"), ("", ""), ("Parc national de la Vanoise été", "corpus/é.txt")]
+    documents += [(f"title {i}", f"corpus/{i}.txt") for i in range(100)]
+    with DocumentStoreWriter(str(tmp_path / "documents.bin")) as writer:
+        for title, path in documents:
+            writer.add(title, path)
+
+    store = DocumentStore(str(tmp_path / "documents.bin"))
+    assert len(store) == len(documents)
+    assert [(store.title(i), store.path(i)) for i in range(len(store))] == documents
+    assert store.title(len(documents)) is None and store.path(-1) is None
+    store.close()
+
+
+def test_empty_document_store(tmp_path):
+    DocumentStoreWriter(str(tmp_path / "documents.bin")).close()
+
+    store = DocumentStore(str(tmp_path / "documents.bin"))
+    assert len(store) == 0
+    assert store.title(0) is None
+    store.close()
@@ -0,0 +1,41 @@
+from engine.indexing import PositionalInvertedIndex, get_codec
+from engine.indexing.inversionbuffer import InversionBuffer
+from engine.indexing.spimi import SPIMI
+import pytest
+
+occurrences = [("cat", 1, 0), ("cat", 1, 2), ("dog", 2, 1), ("cat", 3, 4), ("cat", 3, 4), ("", 3, 5)]
+
+
+@pytest.fixture
+def buffer():
+    buffer = InversionBuffer()
+    for term, doc_id, position in occurrences:
+        buffer.add_term(term, doc_id, position)
+    return buffer
+
+
+def test_vocabulary(buffer):
+    assert buffer.getVocabulary() == ["cat", "dog"]
+    assert len(buffer) == 2
+
+
+def test_encodes_like_positional_index(buffer):
+    index = PositionalInvertedIndex()
+    for term, doc_id, position in occurrences:
+        index.addTerm(term, doc_id, position)
+    codec = get_codec("vbyte")
+    for term in index.getVocabulary():
+        assert buffer.encode_postings(term, codec) == SPIMI._encode_postings(term, index.getPostings(term), codec)
+
+
+def test_memory_accounting(buffer):
+    used = buffer.memory_used
+    buffer.add_term("cat", 3, 9)
+    assert buffer.memory_used == used + 4
+    buffer.add_term("cat", 4, 1)
+    assert buffer.memory_used == used + 16
+    buffer.add_term("bird", 4, 2)
+    assert buffer.memory_used > used + 16 + 12
+    buffer.clear()
+    assert buffer.memory_used == 0
+    assert buffer.getVocabulary() == []
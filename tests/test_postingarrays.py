@@ -0,0 +1,41 @@
+from engine.indexing import LiveDocs, get_codec
+from engine.indexing.codecs import CODECS
+from engine.indexing.postingscursor import DiskPostingsCursor
+from engine.indexing.spimi import SPIMI
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+from engine.indexing.postingarrays import decode_array, record_arrays  # noqa: E402
+
+
+@pytest.mark.parametrize("name", ["raw", "vbyte"])
+def test_decode_array_matches_decode_all(name):
+    codec = get_codec(name)
+    rng = random.Random(5)
+    for values in ([], [0, 1, 127, 128, 16383, 16384, 2**21, 2**32 - 1], [rng.randrange(100) for _ in range(300)]):
+        data = b"".join(codec.encode([value]) for value in values)
+        assert decode_array(codec, memoryview(data)).tolist() == codec.decode_all(data) == values
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_record_arrays_match_cursor(tmp_path, name):
+    codec = get_codec(name)
+    rng = random.Random(11)
+    doc_ids = sorted(rng.sample(range(5000), 700))
+    split = 300
+    records = [
+        SPIMI._encode_postings("term", [{"doc_id": d, "positions": list(range(1, d % 5 + 2))} for d in chunk], codec)
+        for chunk in (doc_ids[:split], doc_ids[split:])
+    ]
+    live_docs = LiveDocs(str(tmp_path / "deletedDocs.bin"))
+    live_docs.delete(doc_ids[::7] + [6000])
+
+    array_doc_ids, tfs = record_arrays(records, codec, live_docs)
+    cursor = DiskPostingsCursor(records, codec, live_docs)
+    expected = []
+    while cursor.doc_id is not None:
+        expected.append((cursor.doc_id, cursor.tftd))
+        cursor.next()
+    assert list(zip(array_doc_ids.tolist(), tfs.tolist())) == expected
+    assert record_arrays([], codec)[0].tolist() == []
@@ -0,0 +1,39 @@
+from engine.indexing import Posting
+from engine.indexing.postingscache import POSITION_BYTES, POSTING_BYTES, PostingsCache, postings_size
+
+
+def test_cache_evicts_least_recently_used_within_budget():
+    cache = PostingsCache(max_bytes=100)
+    cache.put("a", "A", 40)
+    cache.put("b", "B", 40)
+    assert cache.get("a") == "A"
+
+    # "b" is the least recently used entry, so it makes room for "c"
+    cache.put("c", "C", 40)
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.size == 80
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    # Replacing an entry updates its size, and values over the whole budget are not cached
+    cache.put("a", "AA", 60)
+    assert cache.size == 100
+    cache.put("huge", "H", 101)
+    assert cache.get("huge") is None
+    assert len(cache) == 2
+
+
+def test_cache_ignores_values_decoded_before_clear():
+    cache = PostingsCache(max_bytes=100)
+    generation = cache.generation
+    cache.clear()
+    cache.put("a", "stale", 10, generation)
+    assert cache.get("a") is None
+    cache.put("a", "fresh", 10, cache.generation)
+    assert cache.get("a") == "fresh"
+
+
+def test_postings_size_counts_positions():
+    postings = [Posting(1, [1, 2, 3]), Posting(4, 0)]
+    assert postings_size(postings) == 2 * POSTING_BYTES + 4 * POSITION_BYTES
@@ -0,0 +1,67 @@
+from engine.indexing import LiveDocs, Posting, get_codec
+from engine.indexing.postingscursor import DiskPostingsCursor, ListPostingsCursor, gallop
+from engine.indexing.postingsfile import SKIP_INTERVAL
+from engine.indexing.spimi import SPIMI
+import random
+import pytest
+
+
+def make_record(doc_ids, codec, term="term"):
+    postings = [{"doc_id": doc_id, "positions": [doc_id % 7 + 1, doc_id % 7 + 3]} for doc_id in doc_ids]
+    return SPIMI._encode_postings(term, postings, codec)
+
+
+def test_gallop_finds_first_value_not_below_target():
+    values = [2, 4, 4, 9, 15, 40]
+    for lo in range(len(values)):
+        for target in range(45):
+            expected = next((i for i in range(lo, len(values)) if values[i] >= target), len(values))
+            assert gallop(values, target, lo) == expected
+
+
+@pytest.mark.parametrize("codec_name", ["raw", "vbyte", "group_varint"])
+def test_disk_cursor_advances_over_skip_blocks(codec_name):
+    codec = get_codec(codec_name)
+    rng = random.Random(7)
+    doc_ids = sorted(rng.sample(range(20000), 3 * SKIP_INTERVAL + 17))
+    record = make_record(doc_ids, codec)
+    assert len(record.skip_entries()[0]) == 3
+
+    cursor = DiskPostingsCursor([record], codec, with_positions=True)
+    visited = []
+    while cursor.doc_id is not None:
+        visited.append(cursor.doc_id)
+        assert cursor.posting().positions == [cursor.doc_id % 7 + 1, cursor.doc_id % 7 + 3]
+        cursor.next()
+    assert visited == doc_ids
+
+    # Positions stay in step when advance() jumps over blocks, whether or not they were read on the way
+    cursor = DiskPostingsCursor([record], codec, with_positions=True)
+    for i, target in enumerate(sorted(rng.sample(range(21000), 200))):
+        expected = next((doc_id for doc_id in doc_ids if doc_id >= max(target, cursor.doc_id or 0)), None)
+        assert cursor.advance(target) == expected
+        if expected is None:
+            break
+        if i % 3 == 0:
+            assert cursor.positions() == [expected % 7 + 1, expected % 7 + 3]
+
+
+def test_disk_cursor_spans_segments_and_skips_deleted_documents(tmp_path):
+    codec = get_codec("vbyte")
+    first, second = list(range(0, 600, 2)), list(range(600, 900, 3))
+    live_docs = LiveDocs(str(tmp_path / "deletedDocs.bin"))
+    live_docs.delete([4, 598, 600, 603])
+    cursor = DiskPostingsCursor([make_record(first, codec), make_record(second, codec)], codec, live_docs)
+    assert cursor.cost == len(first) + len(second)
+    assert cursor.advance(597) == 606
+    assert cursor.advance(601) == 606
+    assert cursor.advance(607) == 609
+    assert cursor.advance(900) is None
+
+
+def test_list_cursor_gallops_over_postings():
+    postings = [Posting(doc_id, [1]) for doc_id in range(0, 100, 5)]
+    cursor = ListPostingsCursor(postings)
+    assert cursor.advance(12) == 15 and cursor.posting() is postings[3]
+    assert cursor.next() == 20
+    assert cursor.advance(96) is None
@@ -5,10 +5,18 @@ from engine.querying import (
     NotQuery,
     TermLiteral,
     PhraseLiteral,
+    NearLiteral,
+    EmptyQuery,
+    QueryPlanner,
+    PagedResults,
+    WildcardLiteral,
 )
-from engine.indexing import Posting
+from engine.indexing import Posting, PositionalInvertedIndex, get_codec
+from engine.indexing.postingscursor import DiskPostingsCursor
+from engine.indexing.spimi import SPIMI
 from engine.text import Preprocessing
 import pytest
+import random
 import config
 
 config.LANGUAGE = "english"
@@ -47,6 +55,27 @@ def test_parse_mixed_query():
     assert isinstance(query_component.components[1], AndQuery)
 
 
+def test_parse_near_query():
+    query_component = BooleanQueryParser.parse_query("cat NEAR/2 dog mouse + -fox NEAR/10 hen", preprocessor)
+    assert isinstance(query_component, OrQuery)
+    first, second = query_component.components
+    assert isinstance(first, AndQuery)
+    near = first.components[0]
+    assert isinstance(near, NearLiteral)
+    assert (near.left.term, near.right.term, near.k) == ("cat", "dog", 2)
+    assert first.components[1].term == "mous"
+    assert isinstance(second, NotQuery)
+    assert isinstance(second.component, NearLiteral) and second.component.k == 10
+
+    chained = BooleanQueryParser.parse_query('"quick fox" NEAR/3 cat NEAR/1 dog', preprocessor)
+    assert isinstance(chained, NearLiteral) and chained.k == 1
+    assert isinstance(chained.left, NearLiteral) and isinstance(chained.left.left, PhraseLiteral)
+
+    for malformed in ("cat NEAR/2", "cat NEAR/0 dog", "cat NEAR/2 -dog"):
+        with pytest.raises(ValueError):
+            BooleanQueryParser.parse_query(malformed, preprocessor)
+
+
 def test_and_not_query():
     query_str = "cat -dog"
     query_component = BooleanQueryParser.parse_query(query_str, preprocessor)
@@ -56,3 +85,250 @@ def test_and_not_query():
     assert query_component.components[0].term == "cat"
     assert isinstance(query_component.components[1], NotQuery)
     assert query_component.components[1].component.term == "dog"
+
+
+def test_and_query_of_only_not_filters():
+    index = _memory_index([["a", "b"], ["b"], ["c"], ["a"], ["c", "d"]])
+    query = BooleanQueryParser.parse_query("-a -b", preprocessor)
+    assert [p.doc_id for p in query.getPostings(index)] == [2, 4]
+    three = AndQuery([NotQuery(TermLiteral("a")), NotQuery(TermLiteral("b")), NotQuery(TermLiteral("d"))])
+    assert [p.doc_id for p in three.getPostings(index)] == [2]
+    assert [p.doc_id for p in QueryPlanner(index).plan(three).getPostings(index)] == [2]
+    assert [p.doc_id for p in AndQuery([NotQuery(TermLiteral("a")), TermLiteral("c")]).getPostings(index)] == [2, 4]
+
+
+class _CursorIndex:
+    """An index over encoded records, so AND queries run on disk cursors with skip entries."""
+
+    def __init__(self, postings):
+        self.codec = get_codec("vbyte")
+        self.records = {
+            term: SPIMI._encode_postings(term, [{"doc_id": d, "positions": [1]} for d in doc_ids], self.codec)
+            for term, doc_ids in postings.items()
+        }
+
+    def getCursor(self, term):
+        return DiskPostingsCursor([self.records[term]] if term in self.records else [], self.codec)
+
+    def getPostings(self, term):
+        cursor = self.getCursor(term)
+        postings = []
+        while cursor.doc_id is not None:
+            postings.append(cursor.posting())
+            cursor.next()
+        return postings
+
+
+def test_and_query_intersects_with_cursors():
+    common = list(range(0, 5000, 2))
+    rare = [3, 10, 11, 500, 4998, 5001]
+    multiples = list(range(0, 5000, 5))
+    index = _CursorIndex({"common": common, "rare": rare, "multiples": multiples})
+
+    query = AndQuery([TermLiteral("common"), TermLiteral("rare")])
+    assert [posting.doc_id for posting in query.getPostings(index)] == [10, 500, 4998]
+
+    query = AndQuery([TermLiteral("rare"), NotQuery(TermLiteral("common")), TermLiteral("rare")])
+    assert [posting.doc_id for posting in query.getPostings(index)] == [3, 11, 5001]
+
+    query = AndQuery([TermLiteral("multiples"), TermLiteral("common"), NotQuery(TermLiteral("rare"))])
+    assert [posting.doc_id for posting in query.getPostings(index)] == [d for d in range(0, 5000, 10) if d not in (10, 500)]
+
+    assert AndQuery([TermLiteral("rare"), TermLiteral("missing")]).getPostings(index) == []
+
+
+def test_or_query_merges_cursors_in_doc_id_order():
+    rng = random.Random(5)
+    postings = {f"t{i}": sorted(rng.sample(range(3000), rng.randint(1, 400))) for i in range(40)}
+    index = _CursorIndex(postings)
+
+    query = OrQuery([TermLiteral(term) for term in postings] + [TermLiteral("missing")])
+    expected = sorted(set().union(*postings.values()))
+    assert [posting.doc_id for posting in query.getPostings(index)] == expected
+
+    # A union inside an AND query is advanced lazily, past the documents the rare term does not have
+    rare = [7, 900, 2999]
+    index = _CursorIndex({**postings, "rare": rare})
+    narrow = AndQuery([TermLiteral("rare"), OrQuery([TermLiteral("t0"), TermLiteral("t1"), TermLiteral("t2")])])
+    union = set(postings["t0"]) | set(postings["t1"]) | set(postings["t2"])
+    assert [posting.doc_id for posting in narrow.getPostings(index)] == [d for d in rare if d in union]
+
+    # The posting of a document comes from the first component that has it
+    first = [Posting(1, [4]), Posting(3, [2])]
+    second = [Posting(1, [9]), Posting(2, [5])]
+    memory_index = _memory_index([])
+    memory_index.index.update({"first": first, "second": second})
+    merged = OrQuery([TermLiteral("second"), TermLiteral("first")]).getPostings(memory_index)
+    assert [(posting.doc_id, posting.positions) for posting in merged] == [(1, [9]), (2, [5]), (3, [2])]
+
+
+def _random_documents(seed):
+    rng = random.Random(seed)
+    vocabulary = ["the", "the", "the", "of", "of", "new", "york", "city", "park"]
+    return [[rng.choice(vocabulary) for _ in range(rng.randint(1, 60))] for _ in range(300)]
+
+
+def _memory_index(documents):
+    index = PositionalInvertedIndex()
+    for doc_id, tokens in enumerate(documents):
+        for position, token in enumerate(tokens):
+            index.addTerm(token, doc_id, position)
+    return index
+
+
+class _PositionalCursorIndex:
+    """An index over encoded records with positions, so phrase queries run on disk cursors."""
+
+    def __init__(self, documents):
+        self.codec = get_codec("vbyte")
+        positions = {}
+        for doc_id, tokens in enumerate(documents):
+            for position, token in enumerate(tokens):
+                positions.setdefault(token, {}).setdefault(doc_id, []).append(position)
+        self.records = {
+            term: SPIMI._encode_postings(
+                term, [{"doc_id": d, "positions": p} for d, p in sorted(postings.items())], self.codec
+            )
+            for term, postings in positions.items()
+        }
+
+    def getCursor(self, term):
+        return DiskPostingsCursor([self.records[term]] if term in self.records else [], self.codec, with_positions=True)
+
+
+def test_phrase_intersects_all_terms_at_once():
+    documents = _random_documents(7)
+    memory_index = _memory_index(documents)
+    disk_index = _PositionalCursorIndex(documents)
+
+    for phrase in (["new", "york"], ["the", "of", "the"], ["of", "new", "york", "city"], ["park", "missing"], ["city"]):
+        expected = []
+        for doc_id, tokens in enumerate(documents):
+            ends = [
+                start + len(phrase) - 1
+                for start in range(len(tokens) - len(phrase) + 1)
+                if tokens[start : start + len(phrase)] == phrase
+            ]
+            if ends:
+                expected.append((doc_id, ends))
+
+        query = PhraseLiteral([TermLiteral(term) for term in phrase])
+        for index in (memory_index, disk_index):
+            assert [(posting.doc_id, posting.positions) for posting in query.getPostings(index)] == expected
+
+    first = [Posting(1, [0, 4, 9]), Posting(2, [3]), Posting(5, [1, 2])]
+    second = [Posting(1, [1, 5, 7]), Posting(5, [0, 3, 8])]
+    assert [(p.doc_id, p.positions) for p in PhraseLiteral.positional_intersect(first, second)] == [(1, [1, 5]), (5, [3])]
+
+
+def test_near_query_matches_within_k_positions():
+    documents = _random_documents(11)
+    indexes = (_memory_index(documents), _PositionalCursorIndex(documents))
+
+    for left, right, k in (("new", "york", 1), ("york", "new", 3), ("city", "park", 5), ("the", "the", 1), ("park", "missing", 4)):
+        expected = []
+        for doc_id, tokens in enumerate(documents):
+            window = lambda position: tokens[max(0, position - k) : position] + tokens[position + 1 : position + k + 1]
+            positions = [position for position, token in enumerate(tokens) if token == right and left in window(position)]
+            if positions:
+                expected.append((doc_id, positions))
+
+        query = NearLiteral(TermLiteral(left), TermLiteral(right), k)
+        for index in indexes:
+            assert [(posting.doc_id, posting.positions) for posting in query.getPostings(index)] == expected
+
+    near = NearLiteral(TermLiteral("city"), TermLiteral("park"), 2)
+    near_doc_ids = {posting.doc_id for posting in near.getPostings(indexes[1])}
+    york_doc_ids = {doc_id for doc_id, tokens in enumerate(documents) if "york" in tokens}
+    for index in indexes:
+        with_york = AndQuery([near, TermLiteral("york")]).getPostings(index)
+        assert [posting.doc_id for posting in with_york] == sorted(near_doc_ids & york_doc_ids)
+        without_york = AndQuery([near, NotQuery(TermLiteral("york"))]).getPostings(index)
+        assert [posting.doc_id for posting in without_york] == sorted(near_doc_ids - york_doc_ids)
+        new_york = NearLiteral(TermLiteral("new"), TermLiteral("york"), 1)
+        either = OrQuery([near, new_york]).getPostings(index)
+        new_york_doc_ids = {posting.doc_id for posting in new_york.getPostings(index)}
+        assert sorted(posting.doc_id for posting in either) == sorted(near_doc_ids | new_york_doc_ids)
+
+
+def test_query_planner_orders_conjuncts_and_short_circuits():
+    documents = _random_documents(3)
+    index = _memory_index(documents)
+    planner = QueryPlanner(index)
+    df = {term: len(index.getPostings(term)) for term in ("the", "of", "new", "york", "city", "park")}
+    assert df["park"] < df["the"]
+
+    query = AndQuery([TermLiteral("the"), AndQuery([TermLiteral("park"), NotQuery(TermLiteral("york"))]), TermLiteral("of")])
+    plan = planner.plan(query)
+    assert isinstance(plan, AndQuery)
+    terms = [str(component) for component in plan.components]
+    assert terms[:3] == sorted(["the", "park", "of"], key=df.get) and terms[3] == "NOT (york)"
+    assert [p.doc_id for p in plan.getPostings(index)] == [p.doc_id for p in query.getPostings(index)]
+
+    # A leading NOT becomes a filter behind the positive terms
+    leading_not = planner.plan(AndQuery([NotQuery(TermLiteral("york")), TermLiteral("park")]))
+    assert [str(component) for component in leading_not.components] == ["park", "NOT (york)"]
+
+    # Missing terms empty the AND queries that need them, and drop out of OR queries and NOT filters
+    missing = AndQuery([TermLiteral("the"), PhraseLiteral([TermLiteral("new"), TermLiteral("missing")])])
+    assert isinstance(planner.plan(missing), EmptyQuery)
+    assert planner.plan(missing).getPostings(index) == []
+    either = planner.plan(OrQuery([TermLiteral("missing"), OrQuery([TermLiteral("city"), TermLiteral("park")])]))
+    assert isinstance(either, OrQuery) and [str(c) for c in either.components] == ["city", "park"]
+    assert str(planner.plan(AndQuery([TermLiteral("city"), NotQuery(TermLiteral("missing"))]))) == "city"
+
+    # NOT queries on their own are estimated from the documents they leave
+    documents = len(documents)
+    assert planner.cost(NotQuery(TermLiteral("york"))) == documents - df["york"]
+    only_nots = AndQuery([NotQuery(TermLiteral("york")), NotQuery(TermLiteral("park"))])
+    assert planner.cost(only_nots) == documents - max(df["york"], df["park"])
+    assert planner.cost(only_nots) >= len(only_nots.getPostings(index))
+
+    explained = planner.explain(query)
+    assert explained.splitlines()[0] == f"AND (est. {df['park']} postings)"
+    assert f"  NOT filter (est. {df['york']} postings)" in explained
+
+
+def test_paged_results_pull_only_the_pages_read():
+    rng = random.Random(11)
+    postings = {f"t{i}": sorted(rng.sample(range(20000), 4000)) for i in range(3)}
+    index = _CursorIndex(postings)
+    query = AndQuery([OrQuery([TermLiteral("t0"), TermLiteral("t1")]), NotQuery(TermLiteral("t2"))])
+    expected = [(posting.doc_id, 0) for posting in query.getPostings(index)]
+
+    results = PagedResults(query.getCursor(index))
+    assert results
+    assert results[:15] == expected[:15]
+    assert len(results.doc_ids) == 15 and not results.exhausted
+    # The cursor has only moved past the first page of the union
+    assert results.cursor.doc_id <= expected[15][0]
+
+    assert results[15:30] == expected[15:30]
+    assert results[29] == expected[29]
+    assert results[len(expected) - 5 : len(expected) + 15] == expected[-5:]
+    assert results.exhausted and len(results) == len(expected)
+
+    assert not PagedResults(AndQuery([TermLiteral("t0"), TermLiteral("missing")]).getCursor(index))
+
+
+def test_wildcard_query_parses_and_expands():
+    query_component = BooleanQueryParser.parse_query("Comput* *tion + c*t -ne*", preprocessor)
+    assert isinstance(query_component, OrQuery)
+    first, second = query_component.components
+    assert [component.pattern for component in first.components] == ["comput*", "*tion"]
+    assert isinstance(second.components[0], WildcardLiteral) and second.components[0].pattern == "c*t"
+    assert isinstance(second.components[1], NotQuery) and second.components[1].component.pattern == "ne*"
+
+    with pytest.raises(ValueError):
+        BooleanQueryParser.parse_query("cat **", preprocessor)
+
+    documents = _random_documents(4)
+    index = _memory_index(documents)
+    planner = QueryPlanner(index)
+    wildcard = WildcardLiteral("*e*")
+    assert wildcard.terms(index) == ["new", "the"]
+    expected = sorted({doc_id for doc_id, tokens in enumerate(documents) if {"new", "the"} & set(tokens)})
+    assert [p.doc_id for p in wildcard.getPostings(index)] == expected
+    assert planner.cost(wildcard) == len(index.getPostings("new")) + len(index.getPostings("the"))
+    assert WildcardLiteral("*e*", max_terms=1).terms(index) == ["the"]
+    assert isinstance(planner.plan(AndQuery([TermLiteral("park"), WildcardLiteral("zz*")])), EmptyQuery)
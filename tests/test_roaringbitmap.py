@@ -0,0 +1,28 @@
+from engine.indexing.roaringbitmap import ARRAY_MAX_CARDINALITY, RoaringBitmap
+import random
+
+
+def test_bitmap_operators_match_set_operations():
+    rng = random.Random(23)
+    for size in (0, 50, ARRAY_MAX_CARDINALITY, 20_000, 120_000):
+        first = sorted(rng.sample(range(200_000), size))
+        second = sorted(rng.sample(range(200_000), rng.randint(0, 120_000)))
+        a, b = RoaringBitmap.from_sorted(first), RoaringBitmap.from_sorted(second)
+        assert list(a) == first and len(a) == size
+        assert list(a & b) == sorted(set(first) & set(second))
+        assert list(a | b) == sorted(set(first) | set(second))
+        assert list(a - b) == sorted(set(first) - set(second))
+        assert list(b - a) == sorted(set(second) - set(first))
+        for doc_id in rng.sample(range(200_000), 100):
+            assert (doc_id in a) == (doc_id in set(first))
+
+
+def test_bitmap_roundtrips_and_builds_ranges():
+    doc_ids = list(range(0, 70_000, 3)) + [100_000, 131_071, 131_072]
+    bitmap = RoaringBitmap.from_sorted(doc_ids)
+    data = b"head" + bitmap.to_bytes()
+    assert list(RoaringBitmap.from_bytes(data, 4)) == doc_ids
+    assert list(RoaringBitmap.from_bytes(RoaringBitmap().to_bytes())) == []
+
+    for start, stop in ((0, 0), (0, 1), (7, 65_536), (65_530, 200_000)):
+        assert list(RoaringBitmap.from_range(start, stop)) == list(range(start, stop))
@@ -0,0 +1,697 @@
+from engine.documents import DirectoryCorpus
+from engine.indexing import spimi as spimi_module
+from engine.indexing import SPIMI, DiskPositionalIndex
+from engine.indexing.livedocs import LiveDocs, live_docs_path
+from engine.indexing.postingsfile import RecordReader
+from engine.indexing.postingscursor import DiskPostingsCursor
+from engine.querying import AndQuery, NearLiteral, NotQuery, OrQuery, PhraseLiteral, RankedQuery, TermLiteral, WildcardLiteral
+from pathlib import Path
+import math
+import random
+import re
+import sqlite3
+import threading
+import pytest
+import config
+
+config.LANGUAGE = "english"
+
+documents = [
+    "The quick brown fox jumps over the lazy dog.",
+    "A lazy afternoon in the national park, watching the dog sleep.",
+    "Foxes and dogs are both mammals; the fox is quicker than the dog.",
+    "Hewlett-Packard computing parks its servers near the quick river.",
+    "Nothing about animals here, just national parks and rivers.",
+    "The dog, the fox and the park: a quick summary of a lazy story.",
+    "Rivers run quick through the park while the fox watches.",
+]
+
+
+def use_data_dir(root: Path, monkeypatch):
+    """Points SPIMI at a data directory under root."""
+    (root / "db").mkdir(parents=True, exist_ok=True)
+    monkeypatch.setattr(spimi_module, "DB_PATH", str(root / "db" / "index.db"))
+    monkeypatch.setattr(spimi_module, "SEGMENTS_DIR", str(root / "segments"))
+    monkeypatch.setattr(spimi_module, "BUCKET_DIR", str(root / "bucket"))
+    monkeypatch.setattr(spimi_module, "INDEX_BATCH_SIZE", 2)
+
+
+def build_index(root: Path, corpus_dir: Path, monkeypatch, num_workers, codec_name="vbyte", memory_budget=1 << 20, **options):
+    """Builds an index of corpus_dir into its own data directory under root."""
+    use_data_dir(root, monkeypatch)
+    spimi = SPIMI(DirectoryCorpus(corpus_dir), codec_name=codec_name, memory_budget=memory_budget, **options)
+    spimi.spimi_index(num_workers=num_workers)
+    spimi.db_conn.close()
+    return root
+
+
+def segment_file(root: Path, name: str, segment_id=0) -> Path:
+    return root / "segments" / f"segment_{segment_id}" / name
+
+
+def postings_entries(path: Path):
+    """Reads the records of a segment without their skip entries, which depend on how buckets were split."""
+    entries = []
+    reader = RecordReader(str(path), str(path.with_name("positions.bin")))
+    record = reader.read_record()
+    while record:
+        entries.append(record._replace(skips=b""))
+        record = reader.read_record()
+    reader.close()
+    return entries
+
+
+def open_index(root: Path) -> DiskPositionalIndex:
+    return DiskPositionalIndex(str(root / "db" / "index.db"))
+
+
+@pytest.fixture
+def merged_buckets(monkeypatch):
+    """Records the number of buckets each merge_files call merges."""
+    counts = []
+    merge_files = SPIMI.merge_files
+
+    def counting_merge_files(self, *args, **kwargs):
+        counts.append(len(self.bucket_paths))
+        return merge_files(self, *args, **kwargs)
+
+    monkeypatch.setattr(SPIMI, "merge_files", counting_merge_files)
+    return counts
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    directory = tmp_path / "corpus"
+    directory.mkdir()
+    for i, text in enumerate(documents):
+        (directory / f"doc{i}.txt").write_text(text)
+    return directory
+
+
+def read_table(db_path, query):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(query).fetchall()
+    conn.close()
+    return rows
+
+
+def test_parallel_build_matches_serial(tmp_path, corpus_dir, monkeypatch):
+    serial = build_index(tmp_path / "serial", corpus_dir, monkeypatch, num_workers=1)
+    parallel = build_index(tmp_path / "parallel", corpus_dir, monkeypatch, num_workers=3)
+
+    metadata_query = "SELECT doc_id, title, doc_length FROM document_metadata ORDER BY doc_id"
+    assert read_table(serial / "db" / "index.db", metadata_query) == read_table(
+        parallel / "db" / "index.db", metadata_query
+    )
+    stats_query = "SELECT stat_name, value FROM corpus_stats"
+    assert read_table(serial / "db" / "index.db", stats_query) == read_table(
+        parallel / "db" / "index.db", stats_query
+    )
+    assert segment_file(serial, "docStats.bin").read_bytes() == segment_file(parallel, "docStats.bin").read_bytes()
+    assert segment_file(serial, "documents.bin").read_bytes() == segment_file(parallel, "documents.bin").read_bytes()
+    assert postings_entries(segment_file(serial, "postings.bin")) == postings_entries(segment_file(parallel, "postings.bin"))
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_empty_corpus_registers_no_segment(tmp_path, monkeypatch, num_workers):
+    empty_dir = tmp_path / "empty"
+    empty_dir.mkdir()
+    root = build_index(tmp_path / "index", empty_dir, monkeypatch, num_workers=num_workers)
+
+    assert read_table(root / "db" / "index.db", "SELECT * FROM segments") == []
+    assert list((root / "segments").iterdir()) == []
+
+
+def test_parallel_build_writes_one_bucket_per_batch(tmp_path, corpus_dir, monkeypatch, merged_buckets):
+    parallel = build_index(tmp_path / "parallel", corpus_dir, monkeypatch, num_workers=2)
+    assert merged_buckets == [(len(documents) + 1) // 2]
+    assert list((parallel / "bucket").iterdir()) == []
+
+
+def test_memory_budget_flushes_buckets_between_documents(tmp_path, corpus_dir, monkeypatch, merged_buckets):
+    unbounded = build_index(tmp_path / "unbounded", corpus_dir, monkeypatch, num_workers=1)
+    bounded = build_index(tmp_path / "bounded", corpus_dir, monkeypatch, num_workers=1, memory_budget=2000)
+
+    assert merged_buckets[0] == 1
+    assert merged_buckets[1] > 1
+    assert postings_entries(segment_file(bounded, "postings.bin")) == postings_entries(segment_file(unbounded, "postings.bin"))
+
+
+@pytest.mark.parametrize("codec_name", ["vbyte", "group_varint"])
+def test_compressed_postings_match_raw(tmp_path, corpus_dir, monkeypatch, codec_name):
+    raw = build_index(tmp_path / "raw", corpus_dir, monkeypatch, 1, codec_name="raw")
+    compressed = build_index(tmp_path / codec_name, corpus_dir, monkeypatch, 1, codec_name=codec_name)
+    raw_index = open_index(raw)
+    compressed_index = open_index(compressed)
+
+    assert compressed_index.codec.name == codec_name
+    assert compressed_index.getVocabulary() == raw_index.getVocabulary()
+    for term in raw_index.getVocabulary():
+        expected = [(p.doc_id, p.positions) for p in raw_index.positionPostings(term)]
+        assert [(p.doc_id, p.positions) for p in compressed_index.positionPostings(term)] == expected
+        assert [p.doc_id for p in compressed_index.skipPostings(term)] == [doc_id for doc_id, _ in expected]
+        for doc_id, positions in expected:
+            assert compressed_index.get_term_frequency(term, doc_id) == len(positions)
+    assert segment_file(compressed, "postings.bin").stat().st_size < segment_file(raw, "postings.bin").stat().st_size
+
+
+@pytest.mark.parametrize("codec_name", ["raw", "vbyte", "group_varint"])
+def test_merge_records_splices_like_reencoding(tmp_path, monkeypatch, codec_name):
+    use_data_dir(tmp_path, monkeypatch)
+    spimi = SPIMI(None, codec_name=codec_name)
+    chunks = [
+        [{"doc_id": 0, "positions": [1, 5]}, {"doc_id": 3, "positions": [2]}],
+        [{"doc_id": 4, "positions": [7, 300, 70000]}],
+        [{"doc_id": 9, "positions": [1]}, {"doc_id": 200, "positions": [4, 6]}],
+    ]
+    records = [SPIMI._encode_postings("fox", chunk, spimi.codec) for chunk in chunks]
+    spliced = spimi.merge_records(records)
+    reencoded = spimi._reencode_records(records)
+    assert spliced._replace(skips=b"") == reencoded._replace(skips=b"")
+    assert spliced.skip_entries()[0] == [3, 4]
+    for target in range(202):
+        cursor = DiskPostingsCursor([spliced], spimi.codec, with_positions=True)
+        expected = next(((p["doc_id"], p["positions"]) for chunk in chunks for p in chunk if p["doc_id"] >= target), None)
+        assert cursor.advance(target) == (expected and expected[0])
+        if expected:
+            assert cursor.positions() == expected[1]
+
+    # A document split across two buckets cannot be spliced and is merged posting by posting
+    split = [records[0], SPIMI._encode_postings("fox", [{"doc_id": 3, "positions": [8]}], spimi.codec)]
+    merged = spimi._decode_postings(spimi.merge_records(split))
+    assert [(doc_id, positions) for _, doc_id, _, positions in merged] == [(0, [1, 5]), (3, [2, 8])]
+    spimi.db_conn.close()
+
+
+def test_appended_segments_match_full_build(tmp_path, corpus_dir, monkeypatch):
+    full = build_index(tmp_path / "full", corpus_dir, monkeypatch, num_workers=1)
+
+    # Index the first document, then append the others one folder at a time, in the full build's order
+    folders = []
+    for i, document in enumerate(DirectoryCorpus(corpus_dir).load_documents_generator()):
+        folders.append(tmp_path / f"part{i}")
+        folders[-1].mkdir()
+        (folders[-1] / document.path.name).write_text(document.path.read_text())
+    incremental = build_index(tmp_path / "incremental", folders[0], monkeypatch, num_workers=1)
+    for directory in folders[1:]:
+        spimi = SPIMI(None)
+        assert spimi.append_documents(DirectoryCorpus(directory).load_documents_generator()) == 1
+        spimi.db_conn.close()
+
+    full_index, incremental_index = open_index(full), open_index(incremental)
+    assert len(incremental_index.segments) == len(documents)
+    assert incremental_index.get_total_documents() == full_index.get_total_documents()
+    assert incremental_index.calculate_average_doc_length() == full_index.calculate_average_doc_length()
+    assert incremental_index.get_doc_weights() == full_index.get_doc_weights()
+    assert incremental_index.getVocabulary() == full_index.getVocabulary()
+    for term in full_index.getVocabulary():
+        expected = [(p.doc_id, p.positions) for p in full_index.positionPostings(term)]
+        assert [(p.doc_id, p.positions) for p in incremental_index.positionPostings(term)] == expected
+        assert incremental_index.get_document_frequency(term) == full_index.get_document_frequency(term) == len(expected)
+        for doc_id, positions in expected:
+            assert incremental_index.get_term_frequency(term, doc_id) == len(positions)
+
+    # Compaction merges the segments back into a single one identical to the full build
+    reloaded = []
+    connections = []
+    compact_segments = SPIMI.compact_segments
+    monkeypatch.setattr(
+        SPIMI, "compact_segments", lambda self, **kwargs: connections.append(self.db_conn) or compact_segments(self, **kwargs)
+    )
+    spimi = SPIMI(None)
+    state = incremental_index.state
+    # The compaction thread reloads the index over its own connection, never the one queries use
+    with monkeypatch.context() as patch:
+        patch.setattr(incremental_index, "db_cursor", None)
+        spimi.compact_in_background(on_swap=lambda: reloaded.append(incremental_index.reload())).join()
+    assert incremental_index.state is not state
+    assert spimi.segment_count() == 1
+    spimi.db_conn.close()
+    assert reloaded and len(incremental_index.segments) == 1
+    # The background thread compacted over its own connection, closed once it was done
+    assert connections[0] is not spimi.db_conn
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute("SELECT 1")
+    segment_id = incremental_index.segments[0].segment_id
+    assert postings_entries(segment_file(incremental, "postings.bin", segment_id)) == postings_entries(segment_file(full, "postings.bin"))
+    assert segment_file(incremental, "docStats.bin", segment_id).read_bytes() == segment_file(full, "docStats.bin").read_bytes()
+    doc_ids = range(len(documents))
+    assert incremental_index.get_document_titles(doc_ids) == full_index.get_document_titles(doc_ids)
+    assert [Path(document.path).name for document in incremental_index.get_documents(doc_ids)] == [
+        Path(document.path).name for document in full_index.get_documents(doc_ids)
+    ]
+    assert sorted(path.name for path in (incremental / "segments").iterdir()) == [f"segment_{segment_id}"]
+
+
+def test_deleted_documents_are_filtered_and_purged(tmp_path, corpus_dir, monkeypatch):
+    order = [document.path.name for document in DirectoryCorpus(corpus_dir).load_documents_generator()]
+    deleted = [1, 4]
+    remaining_dir = tmp_path / "remaining"
+    remaining_dir.mkdir()
+    for doc_id, name in enumerate(order):
+        if doc_id not in deleted:
+            (remaining_dir / name).write_text((corpus_dir / name).read_text())
+    remaining = open_index(build_index(tmp_path / "rebuilt", remaining_dir, monkeypatch, num_workers=1))
+    full = build_index(tmp_path / "full", corpus_dir, monkeypatch, num_workers=1)
+
+    # Deleting documents does not load the preprocessing pipeline
+    with monkeypatch.context() as patch:
+        patch.setattr(spimi_module, "Preprocessing", None)
+        spimi = SPIMI(None)
+        assert spimi.delete_documents(deleted + [deleted[0], 99]) == len(deleted)
+    index = open_index(full)
+    survivors = [doc_id for doc_id in range(len(order)) if doc_id not in deleted]
+    renumber = {doc_id: new_id for new_id, doc_id in enumerate(survivors)}
+
+    def query_results(query):
+        index.set_phrase_query(isinstance(query, PhraseLiteral))
+        remaining.set_phrase_query(isinstance(query, PhraseLiteral))
+        found = [renumber[posting.doc_id] for posting in query.getPostings(index)]
+        assert found == [posting.doc_id for posting in query.getPostings(remaining)]
+        return found
+
+    def check_queries():
+        assert index.get_total_documents() == remaining.get_total_documents()
+        assert index.calculate_average_doc_length() == remaining.calculate_average_doc_length()
+        assert sorted(index.get_doc_weights()) == survivors
+        assert query_results(TermLiteral("park"))
+        query_results(AndQuery([TermLiteral("lazi"), TermLiteral("dog")]))
+        query_results(OrQuery([TermLiteral("fox"), TermLiteral("river")]))
+        query_results(PhraseLiteral([TermLiteral("nation"), TermLiteral("park")]))
+        for use_okapi in (False, True):
+            ranked = RankedQuery(index).rank_documents("quick park dog", use_okapi)
+            expected = RankedQuery(remaining).rank_documents("quick park dog", use_okapi)
+            assert [(renumber[doc_id], pytest.approx(score)) for doc_id, score in ranked] == expected
+            # The object-based path scores like the NumPy one, when NumPy is available
+            scalar = RankedQuery(index, vectorized=False).rank_documents("quick park dog", use_okapi)
+            assert dict(scalar) == pytest.approx(dict(ranked))
+            assert RankedQuery(index).rank_documents("quick park dog", use_okapi, top_k=2) == ranked[:2]
+
+    check_queries()
+
+    # Compaction purges the deleted postings from the single segment, then has nothing left to do
+    assert spimi.compact_segments()
+    assert not spimi.compact_segments()
+    index.reload()
+    check_queries()
+    segment = index.segments[0]
+    reader = RecordReader(segment.postings_file_path, segment.positions_file_path)
+    record = reader.read_record()
+    while record:
+        assert not set(doc_id for _, doc_id, _, _ in spimi._decode_postings(record)) & set(deleted)
+        record = reader.read_record()
+    reader.close()
+
+    live_docs = LiveDocs(live_docs_path(spimi_module.DB_PATH))
+    assert live_docs.deleted_doc_ids() == deleted and live_docs.pending_doc_ids() == []
+
+    # With every deletion purged, document frequencies come from the term dictionaries again
+    with monkeypatch.context() as patch:
+        patch.setattr(index, "skipPostings", None)
+        assert index.get_document_frequency("park") == len(remaining.skipPostings("park"))
+
+    # Updated documents get a new doc ID after the last one, even if that one was deleted
+    assert spimi.delete_documents([len(order) - 1]) == 1
+    live_docs.reload()
+    assert live_docs.pending_doc_ids() == [len(order) - 1]
+    updated = next(iter(DirectoryCorpus(corpus_dir).load_documents_generator()))
+    assert spimi.update_document(0, updated) == len(order)
+    spimi.db_conn.close()
+    index.reload()
+    assert sorted(index.get_doc_weights()) == survivors[1:-1] + [len(order)]
+
+    # The next compaction only purges the deletions made since the last one, so terms whose postings span an
+    # already purged doc ID are spliced rather than re-encoded
+    purge_sets = []
+    merge_files = SPIMI.merge_files
+    monkeypatch.setattr(
+        SPIMI, "merge_files", lambda self, *args, **kwargs: purge_sets.append(self.purged_doc_ids) or merge_files(self, *args, **kwargs)
+    )
+    spimi = SPIMI(None)
+    assert spimi.compact_segments()
+    spimi.db_conn.close()
+    assert purge_sets == [[0, len(order) - 1]]
+    live_docs.reload()
+    assert live_docs.pending_doc_ids() == [] and live_docs.deleted_count == len(deleted) + 2
+
+
+def test_streamed_doc_weights_match_postings(tmp_path, corpus_dir, monkeypatch):
+    index = open_index(build_index(tmp_path / "index", corpus_dir, monkeypatch, num_workers=1))
+    term_frequencies = {}
+    for term in index.getVocabulary():
+        for posting in index.positionPostings(term):
+            term_frequencies.setdefault(posting.doc_id, {})[term] = len(posting.positions)
+
+    expected = {doc_id: spimi_module.document_weight(terms) for doc_id, terms in term_frequencies.items()}
+    assert index.get_doc_weights() == pytest.approx(expected)
+    lengths = [index.get_document_length(doc_id) for doc_id in range(len(documents))]
+    assert lengths == [sum(term_frequencies[doc_id].values()) for doc_id in range(len(documents))]
+
+
+def test_mapped_postings_serve_concurrent_readers_across_reloads(tmp_path, corpus_dir, monkeypatch):
+    index = open_index(build_index(tmp_path / "index", corpus_dir, monkeypatch, num_workers=1))
+    expected = {term: [(p.doc_id, p.positions) for p in index.positionPostings(term)] for term in index.getVocabulary()}
+    record = index.segments[0].read_postings_record("quick", with_positions=True)
+    assert isinstance(record.payload, memoryview) and isinstance(record.positions, memoryview)
+
+    errors = []
+
+    def read_postings():
+        try:
+            for _ in range(20):
+                for term, postings in expected.items():
+                    assert [(p.doc_id, p.positions) for p in index.positionPostings(term)] == postings
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read_postings) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    while any(reader.is_alive() for reader in readers):
+        index.reload()
+    for reader in readers:
+        reader.join()
+    assert errors == []
+    index.close()
+
+
+def test_disk_index_caches_decoded_postings(tmp_path, corpus_dir, monkeypatch):
+    root = build_index(tmp_path / "index", corpus_dir, monkeypatch, num_workers=1)
+    index = open_index(root)
+    expected = [(p.doc_id, p.positions) for p in index.positionPostings("park")]
+    assert (index.cache.hits, index.cache.misses) == (0, 1)
+
+    # Positional and non-positional postings are cached separately, and callers cannot alter the cached lists
+    index.positionPostings("park").clear()
+    assert [(p.doc_id, p.positions) for p in index.positionPostings("park")] == expected
+    assert [p.doc_id for p in index.skipPostings("park")] == [doc_id for doc_id, _ in expected]
+    assert (index.cache.hits, index.cache.misses) == (2, 2)
+
+    # Deleting a document and reloading drops the cached postings
+    spimi = SPIMI(None)
+    spimi.delete_documents([expected[0][0]])
+    spimi.db_conn.close()
+    index.reload()
+    assert len(index.cache) == 0
+    assert [(p.doc_id, p.positions) for p in index.positionPostings("park")] == expected[1:]
+
+    # A cache too small for any list decodes every time
+    small = DiskPositionalIndex(str(root / "db" / "index.db"), cache_bytes=10)
+    small.skipPostings("park")
+    small.skipPostings("park")
+    assert (small.cache.hits, small.cache.misses, len(small.cache)) == (0, 2, 0)
+
+
+def test_ranking_scores_from_doc_stats_without_lookups(tmp_path, corpus_dir, monkeypatch):
+    index = open_index(build_index(tmp_path / "index", corpus_dir, monkeypatch, num_workers=1))
+    lengths = read_table(tmp_path / "index" / "db" / "index.db", "SELECT doc_id, doc_length FROM document_metadata")
+    assert index.get_document_lengths() == dict(lengths)
+    for term in index.getVocabulary():
+        for posting in index.skipPostings(term):
+            assert posting.tf == index.get_term_frequency(term, posting.doc_id)
+
+    # The scores of the previous per-posting lookups
+    ranking = RankedQuery(index, vectorized=False)
+    expected = {}
+    for use_okapi in (False, True):
+        scores = {}
+        for term in ("quick", "park", "dog"):
+            wqt = ranking.calculate_wqt(term, use_okapi)
+            for posting in index.skipPostings(term):
+                L_d = 1 if use_okapi else index.get_doc_weights()[posting.doc_id]
+                wdt = ranking.calculate_wdt(term, posting.doc_id, use_okapi)
+                scores[posting.doc_id] = scores.get(posting.doc_id, 0) + wqt * wdt / L_d
+        expected[use_okapi] = scores
+
+    def no_lookups(*args):
+        raise AssertionError("ranking looked up a posting or a document")
+
+    monkeypatch.setattr(index, "get_term_frequency", no_lookups)
+    monkeypatch.setattr(index, "get_document_length", no_lookups)
+    for vectorized in (False, True):
+        for use_okapi in (False, True):
+            ranked = RankedQuery(index, vectorized=vectorized).rank_documents("quick park dog", use_okapi)
+            assert dict(ranked) == pytest.approx(expected[use_okapi])
+
+
+def test_document_store_serves_titles_paths_and_lengths(tmp_path, corpus_dir, monkeypatch):
+    root = build_index(tmp_path, corpus_dir, monkeypatch, num_workers=1)
+    index = open_index(root)
+    corpus = list(DirectoryCorpus(corpus_dir).load_documents_generator())
+    metadata = read_table(root / "db" / "index.db", "SELECT doc_id, title, doc_length FROM document_metadata ORDER BY doc_id")
+
+    doc_ids = [doc_id for doc_id, _, _ in reversed(metadata)]
+    assert index.get_document_titles(doc_ids) == [title for _, title, _ in reversed(metadata)]
+    assert index.get_documents(doc_ids) == [
+        (doc_id, title, str(corpus[doc_id].path), doc_length) for doc_id, title, doc_length in reversed(metadata)
+    ]
+
+    # Deleted and unknown documents have no entry
+    spimi = SPIMI(None)
+    spimi.delete_documents([2])
+    spimi.db_conn.close()
+    index.reload()
+    assert index.get_document_titles([3, 2, len(metadata), -1]) == [metadata[3][1], None, None, None]
+    assert index.get_documents(iter([2, 1]))[0] is None
+    index.close()
+
+
+@pytest.fixture
+def skewed_corpus_dir(tmp_path):
+    """150 documents over a skewed vocabulary, so some terms are in most documents and others in a few."""
+    rng = random.Random(16)
+    words = [f"{syllable}{ending}" for syllable in ("bor", "kel", "mun", "tav", "zir") for ending in ("ak", "ep", "ix", "od")]
+    directory = tmp_path / "skewed"
+    directory.mkdir()
+    for i in range(150):
+        text = " ".join(words[min(int(rng.expovariate(0.25)), len(words) - 1)] for _ in range(rng.randint(3, 60)))
+        (directory / f"doc{i:03d}.txt").write_text(text)
+    return directory
+
+
+def test_max_score_top_k_matches_exhaustive_scoring(tmp_path, skewed_corpus_dir, monkeypatch):
+    rng = random.Random(16)
+    index = open_index(build_index(tmp_path / "index", skewed_corpus_dir, monkeypatch, num_workers=1))
+    vocabulary = index.getVocabulary()
+
+    # The stored bounds hold for every posting
+    for term in vocabulary:
+        max_tf, max_weight, min_length_ratio = index.get_score_bounds(term)
+        for posting in index.skipPostings(term):
+            assert posting.tf <= max_tf
+            assert (1 + math.log(posting.tf)) / index.doc_stats.weights[posting.doc_id] <= max_weight
+            assert index.doc_stats.lengths[posting.doc_id] / posting.tf >= min_length_ratio
+
+    exhaustive = RankedQuery(index, vectorized=False, pruned=False)
+    pruned = RankedQuery(index, vectorized=False, pruned=True)
+    scored, total = 0, 0
+    for _ in range(30):
+        query = " ".join(rng.sample(vocabulary, rng.randint(1, 4)))
+        for use_okapi in (False, True):
+            ranked = sorted(exhaustive.rank_documents(query, use_okapi), key=lambda item: (-item[1], item[0]))
+            for top_k in (1000, 10, 1, 3):
+                assert pruned.rank_documents(query, use_okapi, top_k) == ranked[:top_k]
+                assert exhaustive.rank_documents(query, use_okapi, top_k) == ranked[:top_k]
+            # MaxScore skips postings of documents that cannot make the top 3
+            scored += pruned.scored_postings
+            total += sum(index.get_document_frequency(term) for term in query.split())
+    assert pruned.rank_documents(vocabulary[0], False, 0) == []
+    assert scored < total
+
+
+def test_impact_ordered_ranking_approximates_exhaustive_scoring(tmp_path, skewed_corpus_dir, monkeypatch):
+    rng = random.Random(17)
+    index = open_index(build_index(tmp_path / "index", skewed_corpus_dir, monkeypatch, num_workers=1))
+    vocabulary = index.getVocabulary()
+    for term in vocabulary[:5]:
+        for use_okapi in (False, True):
+            blocks = index.get_impact_blocks(term, use_okapi)
+            assert [block.impact for block in blocks] == sorted({block.impact for block in blocks}, reverse=True)
+            doc_ids = sorted(doc_id for block in blocks for doc_id in block.doc_ids())
+            assert doc_ids == [posting.doc_id for posting in index.skipPostings(term)]
+
+    exhaustive = RankedQuery(index, vectorized=False, pruned=False)
+    impact_ordered = RankedQuery(index, impact_ordered=True)
+    for _ in range(20):
+        query = " ".join(rng.sample(vocabulary, rng.randint(1, 4)))
+        for use_okapi in (False, True):
+            # Each term adds at most half a quantization step of error
+            scale = 2.2 if use_okapi else 1.0
+            tolerance = sum(exhaustive.calculate_wqt(term, use_okapi) for term in query.split()) * scale / 255
+            expected = dict(exhaustive.rank_documents(query, use_okapi))
+            ranked = impact_ordered.rank_documents(query, use_okapi)
+            assert dict(ranked).keys() == expected.keys()
+            for doc_id, score in ranked:
+                assert abs(score - expected[doc_id]) <= tolerance
+
+            # Stopping once the top k is stable gives the same documents as processing every block
+            for top_k in (1, 5):
+                assert {doc_id for doc_id, _ in impact_ordered.rank_documents(query, use_okapi, top_k)} == {
+                    doc_id for doc_id, _ in ranked[:top_k]
+                }
+
+    # A budget bounds the postings scored
+    budgeted = RankedQuery(index, impact_ordered=True, postings_budget=40)
+    assert len(budgeted.rank_documents(" ".join(vocabulary[:4]), True)) <= 40
+    assert budgeted.scored_postings == 40
+    assert budgeted.rank_documents(vocabulary[0], False, 0) == []
+
+
+def test_impact_ordered_postings_are_optional(tmp_path, corpus_dir, monkeypatch):
+    use_data_dir(tmp_path, monkeypatch)
+    spimi = SPIMI(DirectoryCorpus(corpus_dir), impact_index=False)
+    spimi.spimi_index()
+    spimi.db_conn.close()
+
+    # Appends keep the choice of the full build
+    spimi = SPIMI(None, impact_index=True)
+    spimi.append_documents(DirectoryCorpus(corpus_dir).load_documents_generator())
+    spimi.db_conn.close()
+    index = open_index(tmp_path)
+    assert not index.has_impacts()
+    assert not segment_file(tmp_path, "impacts.bin", 1).exists()
+    with pytest.raises(ValueError):
+        RankedQuery(index, impact_ordered=True)
+
+
+def test_champion_lists_score_candidates_exactly(tmp_path, skewed_corpus_dir, monkeypatch):
+    rng = random.Random(18)
+    index = open_index(build_index(tmp_path / "index", skewed_corpus_dir, monkeypatch, num_workers=1, champion_list_size=5))
+    vocabulary = index.getVocabulary()
+    for term in vocabulary:
+        champions = index.get_champion_doc_ids(term)
+        postings = index.skipPostings(term)
+        assert champions == sorted(champions) and len(champions) == min(5, len(postings))
+        # The champions have the highest (1 + log tf) / L_d of the term's postings
+        weights = {p.doc_id: (1 + math.log(p.tf)) / index.doc_stats.weights[p.doc_id] for p in postings}
+        assert min(weights[doc_id] for doc_id in champions) >= max(
+            (weight for doc_id, weight in weights.items() if doc_id not in champions), default=0
+        )
+
+    exhaustive = RankedQuery(index, vectorized=False, pruned=False)
+    champions = RankedQuery(index, champions=True)
+    for _ in range(20):
+        query = " ".join(rng.sample(vocabulary, rng.randint(1, 4)))
+        candidates = {doc_id for term in query.split() for doc_id in index.get_champion_doc_ids(term)}
+        for use_okapi in (False, True):
+            expected = exhaustive.rank_documents(query, use_okapi)
+            scores = dict(expected)
+            for top_k in (1, 5):
+                ranked = champions.rank_documents(query, use_okapi, top_k)
+                assert len(ranked) == top_k
+                assert {doc_id for doc_id, _ in ranked} <= candidates
+                assert [score for _, score in ranked] == sorted((score for _, score in ranked), reverse=True)
+                assert all(score == scores[doc_id] for doc_id, score in ranked)
+            # With fewer candidates than k, the full lists are scored
+            assert dict(champions.rank_documents(query, use_okapi, 1000)) == pytest.approx(scores)
+
+    with pytest.raises(ValueError):
+        RankedQuery(open_index(build_index(tmp_path / "plain", skewed_corpus_dir, monkeypatch, 1, champion_list_size=0)), champions=True)
+
+
+def test_bitmap_boolean_operators_match_list_merging(tmp_path, corpus_dir, monkeypatch):
+    lists = open_index(build_index(tmp_path / "lists", corpus_dir, monkeypatch, num_workers=1, bitmap_min_df=0))
+    bitmaps = open_index(build_index(tmp_path / "bitmaps", corpus_dir, monkeypatch, num_workers=1, bitmap_min_df=4))
+    assert lists.get_bitmap("dog") is None and bitmaps.get_bitmap("river") is None
+    assert list(bitmaps.get_bitmap("dog")) == [posting.doc_id for posting in lists.skipPostings("dog")]
+
+    dog, fox, park, river = (TermLiteral(term) for term in ("dog", "fox", "park", "river"))
+    queries = [
+        AndQuery([dog, fox]),
+        AndQuery([dog, NotQuery(fox)]),
+        AndQuery([river, dog]),
+        AndQuery([fox, NotQuery(river)]),
+        AndQuery([river, NotQuery(park)]),
+        OrQuery([dog, park]),
+        OrQuery([AndQuery([dog, fox]), river]),
+        AndQuery([OrQuery([dog, park]), NotQuery(fox)]),
+        OrQuery([river, NotQuery(park)]),
+        AndQuery([NotQuery(dog), NotQuery(river)]),
+        AndQuery([NotQuery(river), NotQuery(park), NotQuery(fox)]),
+    ]
+
+    def doc_ids(query, index):
+        return [posting.doc_id for posting in query.getPostings(index)]
+
+    def check_queries():
+        for query in queries:
+            assert doc_ids(query, bitmaps) == doc_ids(query, lists), str(query)
+        # A NOT query on its own is the complement of its component among the live documents
+        live = [doc_id for doc_id in range(len(documents)) if lists.live_docs.is_live(doc_id)]
+        for query in (NotQuery(dog), NotQuery(river), NotQuery(OrQuery([dog, river]))):
+            expected = [doc_id for doc_id in live if doc_id not in doc_ids(query.component, lists)]
+            assert doc_ids(query, bitmaps) == doc_ids(query, lists) == expected
+        # So is an AND of NOT filters without a positive term
+        excluded = set(doc_ids(dog, lists)) | set(doc_ids(river, lists))
+        expected = [doc_id for doc_id in live if doc_id not in excluded]
+        assert doc_ids(AndQuery([NotQuery(dog), NotQuery(river)]), lists) == expected
+
+    check_queries()
+
+    # Deleted documents drop out of the bitmaps and of the complements
+    for root in ("lists", "bitmaps"):
+        use_data_dir(tmp_path / root, monkeypatch)
+        spimi = SPIMI(None)
+        spimi.delete_documents([0, 5])
+        spimi.db_conn.close()
+    lists.reload()
+    bitmaps.reload()
+    check_queries()
+
+
+def test_wildcards_expand_through_the_kgram_index(tmp_path, corpus_dir, monkeypatch):
+    root = build_index(tmp_path / "index", corpus_dir, monkeypatch, num_workers=1)
+    assert segment_file(root, "kgrams.bin").exists() and segment_file(root, "kgramTerms.bin").exists()
+    index = open_index(root)
+    vocabulary = index.getVocabulary()
+
+    for pattern in ("qu*", "*x", "p*k", "la*i", "*iv*", "m*m*l", "*e", "quick*", "z*"):
+        regex = re.compile(pattern.replace("*", ".*"))
+        expected = [term for term in vocabulary if regex.fullmatch(term)]
+        assert expected or pattern == "z*"
+        assert index.expand_wildcard(pattern) == expected, pattern
+
+        # A wildcard matches the documents of any of its terms
+        query = WildcardLiteral(pattern)
+        union = sorted({posting.doc_id for term in expected for posting in index.skipPostings(term)})
+        assert [posting.doc_id for posting in query.getPostings(index)] == union
+
+    # The cap keeps the most frequent matching terms
+    terms = index.expand_wildcard("*")
+    assert terms == vocabulary
+    capped = WildcardLiteral("*", max_terms=3).terms(index)
+    frequencies = sorted((index.get_document_frequency(term) for term in terms), reverse=True)
+    assert len(capped) == 3 and sorted(index.get_document_frequency(term) for term in capped) == sorted(frequencies[:3])
+
+    # Appended segments get their own k-gram index, and compaction builds one for the merged vocabulary
+    extra = tmp_path / "extra"
+    extra.mkdir()
+    (extra / "zebra.txt").write_text("A zebra and a quokka crossed the river.")
+    spimi = SPIMI(None)
+    spimi.append_documents(DirectoryCorpus(extra).load_documents_generator())
+    spimi.db_conn.close()
+    index.reload()
+    assert index.expand_wildcard("z*") == ["zebra"]
+    assert index.expand_wildcard("qu*") == ["quick", "quicker", "quokka"]
+    spimi = SPIMI(None)
+    spimi.compact_segments()
+    spimi.db_conn.close()
+    index.reload()
+    assert len(index.segments) == 1 and index.segments[0].kgrams
+    assert index.expand_wildcard("qu*") == ["quick", "quicker", "quokka"]
+
+
+def test_wildcard_near_operands_keep_positions_with_bitmaps(tmp_path, corpus_dir, monkeypatch):
+    index = open_index(build_index(tmp_path / "index", corpus_dir, monkeypatch, num_workers=1, bitmap_min_df=2))
+    assert index.get_bitmap("quick") is not None
+    index.set_phrase_query(True)
+
+    fox, dog = TermLiteral("fox"), TermLiteral("dog")
+    cases = [
+        (NearLiteral(WildcardLiteral("qu*"), fox, 3), [NearLiteral(TermLiteral(t), fox, 3) for t in ("quick", "quicker")]),
+        (NearLiteral(dog, WildcardLiteral("la*"), 5), [NearLiteral(dog, TermLiteral("lazi"), 5)]),
+    ]
+    for query, expansion in cases:
+        expected = sorted({posting.doc_id for near in expansion for posting in near.getPostings(index)})
+        assert expected
+        assert [posting.doc_id for posting in query.getPostings(index)] == expected
@@ -0,0 +1,67 @@
+from engine.indexing.termdictionary import BLOCK_TERMS, TermDictionary, TermDictionaryWriter, TermEntry
+from engine.indexing.spimi import SPIMI
+from engine.indexing import get_codec
+import random
+
+
+def write_dictionary(path, terms):
+    entries = {term: TermEntry(i * 100, i * 300, i % 17 + 1, i % 17 + 1 + i % 5) for i, term in enumerate(terms)}
+    with TermDictionaryWriter(str(path)) as writer:
+        for term in terms:
+            writer.add(term, entries[term])
+    return entries
+
+
+def test_dictionary_roundtrips_prefix_sharing_terms(tmp_path):
+    rng = random.Random(3)
+    stems = ["park", "parking", "parks", "quick", "quickly", "quicker", "fox", "foxes", "a", "zebra", "été"]
+    terms = sorted({rng.choice(stems) + str(rng.randrange(500)) for _ in range(700)} | set(stems))
+    entries = write_dictionary(tmp_path / "terms.bin", terms)
+
+    dictionary = TermDictionary(str(tmp_path / "terms.bin"))
+    assert len(dictionary) == len(terms)
+    assert dictionary.block_count == (len(terms) + BLOCK_TERMS - 1) // BLOCK_TERMS
+    assert list(dictionary.terms()) == terms
+    assert dict(dictionary.items()) == entries
+    for term in terms:
+        assert dictionary.lookup(term) == entries[term]
+    dictionary.close()
+
+
+def test_dictionary_lookup_misses(tmp_path):
+    terms = [f"term{i:04d}" for i in range(0, 200, 2)]
+    write_dictionary(tmp_path / "terms.bin", terms)
+
+    dictionary = TermDictionary(str(tmp_path / "terms.bin"))
+    # Before the first term, between terms, inside a block, past the last term and prefixes of terms
+    for missing in ["", "a", "term", "term0001", "term0033", "term01", "term00990", "term9999", "zzz"]:
+        assert dictionary.lookup(missing) is None
+    dictionary.close()
+
+    write_dictionary(tmp_path / "empty.bin", [])
+    empty = TermDictionary(str(tmp_path / "empty.bin"))
+    assert len(empty) == 0
+    assert empty.lookup("term") is None
+    assert list(empty.terms()) == []
+    empty.close()
+
+
+def test_dictionary_entries_carry_record_statistics():
+    codec = get_codec("vbyte")
+    postings = [{"doc_id": doc_id, "positions": list(range(1, doc_id % 4 + 2))} for doc_id in range(0, 90, 3)]
+    record = SPIMI._encode_postings("term", postings, codec)
+    assert record.df == len(postings)
+    assert record.cf == sum(len(posting["positions"]) for posting in postings)
+
+
+def test_dictionary_rounds_score_bounds_outwards(tmp_path):
+    entry = TermEntry(0, 0, 3, 7, 4, 0.123456789, 41.987654321)
+    with TermDictionaryWriter(str(tmp_path / "terms.bin")) as writer:
+        writer.add("term", entry)
+
+    dictionary = TermDictionary(str(tmp_path / "terms.bin"))
+    stored = dictionary.lookup("term")
+    assert stored[:5] == entry[:5]
+    assert entry.max_weight <= stored.max_weight < entry.max_weight + 1e-4
+    assert entry.min_length_ratio - 1e-4 < stored.min_length_ratio <= entry.min_length_ratio
+    dictionary.close()